@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from hotel_app.models import RoomType, RoomPriceHistory, Room, Client, Reservation, EmployeePosition, EmploymentContract, \
-    Employee, CleaningSchedule
+    Employee, CleaningSchedule, Job
 
 admin.site.register(RoomType)
 admin.site.register(RoomPriceHistory)
@@ -12,3 +12,4 @@ admin.site.register(EmployeePosition)
 admin.site.register(EmploymentContract)
 admin.site.register(Employee)
 admin.site.register(CleaningSchedule)
+admin.site.register(Job)
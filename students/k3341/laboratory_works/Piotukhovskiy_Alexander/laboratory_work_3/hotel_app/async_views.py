@@ -0,0 +1,163 @@
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from hotel_drf_app.renderers import FastJSONRenderer
+from .models import Client, Reservation, Room
+from .reports import cached_report
+from .serializers import ClientSerializer, RoomSerializer, ClientStayOverlapSerializer, CleaningEmployeeSerializer, \
+    ClientRoomCleaningSerializer, QuarterlyReportSerializer
+from .stays import client_stays, clients_overlapping_stays, merge_stay_intervals
+from .views import ClientsListView, RoomsByStatusView, ClientRoomCleaningView, QuarterlyReportView
+
+
+class AsyncAPIView(View):
+    # Асинхронные версии представлений только для чтения. Запросы к базе выполняются через асинхронный API ORM,
+    # поэтому при запуске через ASGI ожидание базы не занимает поток, а долгий отчёт не мешает быстрым запросам.
+    # DRF не поддерживает async-представления, поэтому аутентификация и права проверяются здесь теми же классами.
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+    renderer = FastJSONRenderer()
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(request, authenticators=[authentication() for authentication in self.authentication_classes])
+        denied = await sync_to_async(self.check_permissions)(request)
+        if denied is not None:
+            return denied
+        return await super().dispatch(request, *args, **kwargs)
+
+    def check_permissions(self, request):
+        try:
+            for permission in (permission_class() for permission_class in self.permission_classes):
+                if not permission.has_permission(request, self):
+                    if request.authenticators and not request.successful_authenticator:
+                        raise exceptions.NotAuthenticated()
+                    raise exceptions.PermissionDenied()
+        except (exceptions.NotAuthenticated, exceptions.AuthenticationFailed) as exc:
+            response = self.respond({"detail": exc.detail}, status=401)
+            response['WWW-Authenticate'] = request.authenticators[0].authenticate_header(request)
+            return response
+        except exceptions.APIException as exc:
+            return self.respond({"detail": exc.detail}, status=exc.status_code)
+        return None
+
+    def respond(self, data, status=200):
+        return HttpResponse(self.renderer.render(data), status=status, content_type='application/json')
+
+
+class AsyncClientsListView(AsyncAPIView):
+    async def get(self, request, *args, **kwargs):
+        queryset = ClientsListView.filter_clients(request.query_params)
+        clients = [client async for client in queryset]
+
+        if clients:
+            return self.respond({
+                "count": len(clients),
+                "clients": ClientSerializer(clients, many=True).data
+            })
+        return self.respond({
+            "detail": "Не найдено ни одного клиента по заданным фильтрам.",
+            "count": 0,
+            "clients": []
+        }, status=404)
+
+
+class AsyncRoomsByStatusView(AsyncAPIView):
+    async def get(self, request, *args, **kwargs):
+        statuses = request.query_params.get('status', None)
+        rooms_queryset = RoomSerializer.setup_eager_loading(Room.objects.all())
+        if statuses:
+            status_list, error = RoomsByStatusView.parse_statuses(statuses)
+            if error:
+                return self.respond({"detail": error}, status=422)
+            rooms_queryset = rooms_queryset.filter(status__in=status_list)
+
+        # prefetch_related выполняется при асинхронной итерации, сериализатор дальше не обращается к базе.
+        rooms_data = RoomSerializer([room async for room in rooms_queryset], many=True).data
+
+        return self.respond({
+            "count": len(rooms_data),
+            "rooms": rooms_data
+        })
+
+
+class AsyncClientStayOverlapView(AsyncAPIView):
+    async def get(self, request, *args, **kwargs):
+        overlap_serializer = ClientStayOverlapSerializer(data=request.query_params)
+        if not overlap_serializer.is_valid():
+            return self.respond(overlap_serializer.errors, status=422)
+
+        validated_data = overlap_serializer.validated_data
+        client_id = validated_data['client_id']
+
+        try:
+            target_client = await Client.objects.aget(id=client_id)
+        except Client.DoesNotExist:
+            return self.respond({"detail": f"Клиент с id {client_id} не найден."}, status=404)
+
+        stays = client_stays(target_client, validated_data.get('start_date', None), validated_data.get('end_date', None))
+        merged_stays = merge_stay_intervals([stay async for stay in stays])
+        overlapping_clients = [client async for client in clients_overlapping_stays(target_client, merged_stays)]
+        clients_data = ClientSerializer(overlapping_clients, many=True).data
+
+        return self.respond({
+            "count": len(clients_data),
+            "clients": clients_data
+        })
+
+
+class AsyncClientRoomCleaningView(AsyncAPIView):
+    async def get(self, request, *args, **kwargs):
+        cleaning_serializer = ClientRoomCleaningSerializer(data=request.query_params)
+        if not cleaning_serializer.is_valid():
+            return self.respond(cleaning_serializer.errors, status=422)
+
+        validated_data = cleaning_serializer.validated_data
+        client_id = validated_data['client_id']
+
+        cleaners = ClientRoomCleaningView.get_cleaners(
+            client_id, ClientRoomCleaningView.get_day_number(validated_data['day_of_week'])
+        )
+        employees = [employee async for employee in cleaners]
+        if not employees:
+            if not await Client.objects.filter(id=client_id).aexists():
+                return self.respond({"detail": f"Клиент с id {client_id} не найден."}, status=404)
+            if not await Reservation.objects.filter(client_id=client_id).aexists():
+                return self.respond(
+                    {"detail": f"Нет активных или завершённых бронирований для клиента с id {client_id}."},
+                    status=404
+                )
+
+        return self.respond({
+            "count": len(employees),
+            "employees": CleaningEmployeeSerializer(employees, many=True).data
+        })
+
+
+def build_cached_report(*args):
+    # Выполняется в отдельном потоке, а не в общем потоке async ORM, чтобы долгое построение отчёта
+    # не задерживало запросы к базе из других async-представлений.
+    try:
+        return cached_report(*args)
+    finally:
+        close_old_connections()
+
+
+class AsyncQuarterlyReportView(AsyncAPIView):
+    async def get(self, request, *args, **kwargs):
+        serializer = QuarterlyReportSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return self.respond(serializer.errors, status=422)
+
+        quarter = serializer.validated_data['quarter']
+        year = serializer.validated_data['year']
+
+        start_date, end_date = QuarterlyReportView.get_quarter_date_range(quarter, year)
+        report = await sync_to_async(build_cached_report, thread_sensitive=False)(
+            'quarterly', year, quarter, start_date, end_date)
+
+        return self.respond(report)
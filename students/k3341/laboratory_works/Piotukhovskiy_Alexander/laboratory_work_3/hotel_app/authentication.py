@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+STREAM_COOKIE = 'hotel_room_stream'
+STREAM_COOKIE_SALT = 'hotel_app.room_stream'
+
+
+def set_stream_cookie(response, user, path):
+    # Браузерный EventSource не умеет передавать заголовок Authorization. Токен в адресе попал бы в логи сервера
+    # и прокси, поэтому поток авторизуется подписанной cookie с ограниченным сроком, выданной по обычному токену.
+    response.set_signed_cookie(
+        STREAM_COOKIE, str(user.pk), salt=STREAM_COOKIE_SALT, max_age=settings.HOTEL_ROOM_BOARD_STREAM_COOKIE_AGE,
+        path=path, httponly=True, samesite='Strict', secure=not settings.DEBUG,
+    )
+
+
+class StreamCookieAuthentication(BaseAuthentication):
+    def authenticate(self, request):
+        if STREAM_COOKIE not in request.COOKIES:
+            return None
+        user_id = request._request.get_signed_cookie(
+            STREAM_COOKIE, default=None, salt=STREAM_COOKIE_SALT, max_age=settings.HOTEL_ROOM_BOARD_STREAM_COOKIE_AGE
+        )
+        user = get_user_model().objects.filter(pk=user_id, is_active=True).first() if user_id else None
+        if user is None:
+            raise AuthenticationFailed("Cookie потока недействительна или истекла, запросите новую.")
+        return user, None
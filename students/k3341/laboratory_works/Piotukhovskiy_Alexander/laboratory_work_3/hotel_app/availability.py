@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+
+from django.conf import settings
+
+from .models import Reservation, Room
+from .table_versions import table_versions
+
+# Бронирования в этих статусах занимают номер на свои ночи.
+BLOCKING_STATUSES = ('BOOKED', 'CONFIRMED', 'CHECKED_IN')
+
+# Таблицы, из которых строится индекс: изменение их версий в любом процессе означает, что индекс устарел.
+INDEX_MODELS = (Room, Reservation)
+
+
+class AvailabilityIndex:
+    # Для каждой комнаты хранится целое число, бит i которого означает, что ночь origin + i занята.
+    # Проверка свободы номера на период - одна операция AND с маской этого периода.
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._versions = None
+        self.origin = None
+        self.rooms = {}
+        self.rooms_by_type = defaultdict(set)
+        self.booked = defaultdict(int)
+
+    def get_ttl(self):
+        if self.ttl is not None:
+            return self.ttl
+        return getattr(settings, 'HOTEL_AVAILABILITY_TTL', 300)
+
+    def _night_mask(self, start_date, end_date):
+        # Маска ночей [start_date, end_date); ночи раньше origin не бронировались, поэтому отбрасываются.
+        first = max((start_date - self.origin).days, 0)
+        last = (end_date - self.origin).days
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+    def _shift_origin(self, day):
+        if day >= self.origin:
+            return
+        shift = (self.origin - day).days
+        for room_id in self.booked:
+            self.booked[room_id] <<= shift
+        self.origin = day
+
+    def _book(self, room_id, arrival_date, departure_date):
+        if departure_date <= arrival_date:
+            return
+        self._shift_origin(arrival_date)
+        self.booked[room_id] |= self._night_mask(arrival_date, departure_date)
+
+    def _load_bookings(self, reservations):
+        for room_id, arrival_date, departure_date in reservations.values_list(
+                'room_id', 'arrival_date', 'departure_date'):
+            self._book(room_id, arrival_date, departure_date)
+
+    def rebuild(self, versions=None):
+        with self._lock:
+            # Версии читаются до данных: запись, зафиксированная между этими чтениями, вызовет ещё одну
+            # пересборку, но индекс никогда не будет считаться свежее данных, из которых построен.
+            self._versions = table_versions(INDEX_MODELS) if versions is None else versions
+            self.rooms = {}
+            self.rooms_by_type = defaultdict(set)
+            self.booked = defaultdict(int)
+            self.origin = date.today()
+
+            for room_id, number, type_id in Room.objects.values_list('id', 'number', 'type_id'):
+                self._add_room(room_id, number, type_id)
+            self._load_bookings(Reservation.objects.filter(status__in=BLOCKING_STATUSES))
+            self._built_at = time.monotonic()
+
+    def ensure_fresh(self):
+        # Бронирования и комнаты меняются и в других процессах, поэтому при каждом запросе сверяются версии
+        # таблиц (один запрос к TableVersion): любое сохранение увеличивает их после фиксации транзакции.
+        # TTL подхватывает изменения, сделанные в обход сигналов и bump_table_versions.
+        versions = table_versions(INDEX_MODELS)
+        with self._lock:
+            if self._built_at is None or versions != self._versions \
+                    or time.monotonic() - self._built_at > self.get_ttl():
+                self.rebuild(versions)
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def _add_room(self, room_id, number, type_id):
+        self.rooms[room_id] = (number, type_id)
+        self.rooms_by_type[type_id].add(room_id)
+
+    def free_rooms(self, start_date, end_date, type_id=None):
+        self.ensure_fresh()
+        with self._lock:
+            mask = self._night_mask(start_date, end_date)
+            room_ids = self.rooms if type_id is None else self.rooms_by_type.get(type_id, ())
+            booked = self.booked
+            return sorted(self.rooms[room_id][0] for room_id in room_ids if not booked.get(room_id, 0) & mask)
+
+
+availability_index = AvailabilityIndex()
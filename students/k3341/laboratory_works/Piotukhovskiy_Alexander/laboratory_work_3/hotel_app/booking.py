@@ -0,0 +1,77 @@
+import random
+import time
+
+from django.db import OperationalError, transaction
+from django.db.models import F
+
+from .availability import BLOCKING_STATUSES
+from .models import Reservation, Room
+from .table_versions import bump_table_versions
+
+BOOKING_ATTEMPTS = 5
+
+
+class BookingConflict(Exception):
+    pass
+
+
+def overlapping_reservations(room_id, arrival_date, departure_date):
+    return Reservation.objects.filter(
+        room_id=room_id,
+        status__in=BLOCKING_STATUSES,
+        arrival_date__lt=departure_date,
+        departure_date__gt=arrival_date,
+    )
+
+
+def lock_room(room_id, expected_version=None, expected_status=None, **changes):
+    # Условный UPDATE по версии (и статусу) комнаты: блокирует строку до конца транзакции (в SQLite - запись в базу),
+    # поэтому проверка пересечений и вставка бронирования после него не пересекаются с другими бронированиями комнаты.
+    rooms = Room.objects.filter(id=room_id)
+    if expected_version is not None:
+        rooms = rooms.filter(version=expected_version)
+    if expected_status is not None:
+        rooms = rooms.filter(status=expected_status)
+    locked = rooms.update(version=F('version') + 1, **changes) == 1
+    if locked and changes:
+        bump_table_versions(Room)
+    return locked
+
+
+def ensure_room_free(room_id, arrival_date, departure_date, exclude_reservation_id=None):
+    # Вызывается внутри транзакции.
+    lock_room(room_id)
+    overlapping = overlapping_reservations(room_id, arrival_date, departure_date)
+    if exclude_reservation_id is not None:
+        overlapping = overlapping.exclude(id=exclude_reservation_id)
+    if overlapping.exists():
+        raise BookingConflict("Комната уже забронирована на эти даты.")
+
+
+def book_room(room, arrival_date, departure_date, create_reservation, attempts=BOOKING_ATTEMPTS):
+    # Оптимистичная блокировка: комната захватывается, только если её версия не изменилась с момента чтения.
+    # Если за это время комнату изменил кто-то другой, версия перечитывается и попытка повторяется.
+    # Статус комнаты проверяется тем же UPDATE: проверка сериализатора выполняется без блокировки,
+    # и параллельный запрос мог успеть занять комнату.
+    version = room.version
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                if lock_room(room.id, version, expected_status='AVAILABLE', status='OCCUPIED'):
+                    if overlapping_reservations(room.id, arrival_date, departure_date).exists():
+                        raise BookingConflict("Комната уже забронирована на эти даты.")
+                    return create_reservation()
+        except OperationalError:
+            # SQLite отвечает "database is locked", если не дождался блокировки за timeout.
+            if attempt == attempts - 1:
+                raise
+
+        time.sleep(random.uniform(0, 0.005 * 2 ** attempt))
+        current = Room.objects.filter(id=room.id).values_list('version', 'status').first()
+        if current is None:
+            raise BookingConflict("Комната удалена.")
+        version, status = current
+        if status != 'AVAILABLE':
+            raise BookingConflict("Комната недоступна для заселения.")
+
+    raise BookingConflict("Не удалось забронировать комнату: она слишком часто изменяется. Повторите запрос.")
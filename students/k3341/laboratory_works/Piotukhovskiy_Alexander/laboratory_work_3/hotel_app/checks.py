@@ -0,0 +1,41 @@
+from collections import defaultdict
+
+from django.core.checks import Tags, Warning, register
+from django.db import DatabaseError
+
+from .models import RoomPriceHistory, RoomType
+from .pricing import price_period_problems
+
+
+@register(Tags.database)
+def check_price_histories(app_configs, databases=None, **kwargs):
+    # Выполняется только с python manage.py check --database default: проверяет данные, а не код.
+    # Для типа номера с пропусками или пересечениями в истории цен создание и изменение бронирований
+    # и расчёт стоимости на затронутые ночи отклоняются с ответом 422, пока история не исправлена.
+    if not databases or 'default' not in databases:
+        return []
+
+    periods = defaultdict(list)
+    try:
+        rows = list(
+            RoomPriceHistory.objects.order_by('room_type_id', 'start_date', 'id')
+            .values_list('room_type_id', 'start_date', 'end_date', 'price')
+        )
+        names = dict(RoomType.objects.values_list('id', 'name'))
+    except DatabaseError:
+        # Миграции ещё не применены.
+        return []
+    for room_type_id, start_date, end_date, price in rows:
+        periods[room_type_id].append((start_date, end_date, price))
+
+    warnings = []
+    for room_type_id, room_type_periods in periods.items():
+        problems = price_period_problems(room_type_periods)
+        if problems:
+            warnings.append(Warning(
+                f"История цен типа номера «{names.get(room_type_id)}» (ID {room_type_id}) содержит ошибки: "
+                + "; ".join(problems) + ".",
+                hint="Исправьте периоды RoomPriceHistory. До этого бронирования на затронутые даты отклоняются с ответом 422.",
+                id='hotel_app.W001',
+            ))
+    return warnings
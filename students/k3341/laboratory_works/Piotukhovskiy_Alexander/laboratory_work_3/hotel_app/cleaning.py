@@ -0,0 +1,135 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+
+from .models import CleaningSchedule, EmploymentContract, Room
+from .table_versions import bump_table_versions
+
+SCHEDULE_BATCH_SIZE = 2000
+
+
+def active_contracts_for(employee_ids):
+    # Уборки привязаны к контракту, а не к сотруднику, поэтому сотрудники переводятся в их активные контракты.
+    return dict(
+        EmploymentContract.objects.filter(employee_id__in=employee_ids, is_active=True)
+        .order_by('employee_id', 'id')
+        .values_list('employee_id', 'id')
+    )
+
+
+def select_rooms(floors=None, type_ids=None, statuses=None):
+    rooms = Room.objects.order_by('number')
+    if floors:
+        rooms = rooms.filter(floor__in=floors)
+    if type_ids:
+        rooms = rooms.filter(type_id__in=type_ids)
+    if statuses:
+        rooms = rooms.filter(status__in=statuses)
+    return list(rooms.values_list('id', flat=True))
+
+
+def date_range(start_date, end_date):
+    return [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+
+
+def balance_rooms(room_ids, contract_ids):
+    # Комнаты (по возрастанию номера) делятся между уборщиками на почти равные непрерывные участки:
+    # соседние номера достаются одному уборщику, а повторный запуск с теми же данными даёт то же распределение.
+    assignment = {}
+    count = len(contract_ids)
+    for index, room_id in enumerate(room_ids):
+        assignment[room_id] = contract_ids[index * count // len(room_ids)]
+    return assignment
+
+
+def generate_schedule(room_ids, contract_ids, start_date, end_date, batch_size=SCHEDULE_BATCH_SIZE, dry_run=False):
+    assignment = balance_rooms(room_ids, contract_ids)
+    dates = date_range(start_date, end_date)
+    stats = {'created': 0, 'reassigned': 0, 'unchanged': 0, 'removed': 0, 'kept': 0}
+
+    with transaction.atomic():
+        existing = (
+            CleaningSchedule.objects.filter(room_id__in=room_ids, cleaning_date__gte=start_date,
+                                            cleaning_date__lte=end_date)
+            .order_by('id')
+            .values_list('id', 'room_id', 'cleaning_date', 'cleaner_id', 'status')
+        )
+
+        # Сравниваем план с тем, что уже есть: совпадающие строки не трогаем, у ожидающих уборок меняем уборщика,
+        # начатые и завершённые уборки оставляем как есть. Дубликаты (несколько строк на комнату и день)
+        # сначала группируются: если среди них есть начатая или завершённая уборка, остаются только такие строки,
+        # иначе остаётся одна ожидающая (по возможности уже назначенная нужному уборщику); остальные удаляются.
+        groups = defaultdict(list)
+        for schedule_id, room_id, cleaning_date, cleaner_id, status in existing.iterator(chunk_size=batch_size):
+            groups[(room_id, cleaning_date)].append((schedule_id, cleaner_id, status))
+
+        to_update = defaultdict(list)
+        to_delete = []
+        for (room_id, cleaning_date), rows in groups.items():
+            pending = [row for row in rows if row[2] == 'PENDING']
+            if len(pending) < len(rows):
+                stats['kept'] += len(rows) - len(pending)
+                to_delete.extend(schedule_id for schedule_id, _, _ in pending)
+                continue
+
+            contract_id = assignment[room_id]
+            keep = next((row for row in pending if row[1] == contract_id), pending[0])
+            to_delete.extend(schedule_id for schedule_id, _, _ in pending if schedule_id != keep[0])
+            if keep[1] == contract_id:
+                stats['unchanged'] += 1
+            else:
+                to_update[contract_id].append(keep[0])
+
+        to_create = [
+            CleaningSchedule(room_id=room_id, cleaner_id=contract_id, cleaning_date=cleaning_date,
+                             weekday=CleaningSchedule.weekday_for_date(cleaning_date))
+            for room_id, contract_id in assignment.items()
+            for cleaning_date in dates
+            if (room_id, cleaning_date) not in groups
+        ]
+
+        stats.update(created=len(to_create), reassigned=sum(map(len, to_update.values())), removed=len(to_delete))
+        if dry_run:
+            return stats, assignment
+
+        for offset in range(0, len(to_delete), batch_size):
+            CleaningSchedule.objects.filter(id__in=to_delete[offset:offset + batch_size]).delete()
+        # Один UPDATE на уборщика вместо CASE по каждой строке, как делает bulk_update.
+        for contract_id, schedule_ids in to_update.items():
+            for offset in range(0, len(schedule_ids), batch_size):
+                CleaningSchedule.objects.filter(id__in=schedule_ids[offset:offset + batch_size]).update(
+                    cleaner_id=contract_id)
+        CleaningSchedule.objects.bulk_create(to_create, batch_size=batch_size)
+        bump_table_versions(CleaningSchedule)
+
+    return stats, assignment
+
+
+def generate_schedule_summary(validated_data):
+    # Данные GenerateCleaningScheduleSerializer -> ответ POST /cleaning-schedules/generate.
+    # None, если по условиям не найдено ни одной комнаты.
+    room_ids = select_rooms(
+        floors=validated_data.get('floors'),
+        type_ids=validated_data.get('room_type_ids'),
+        statuses=validated_data.get('room_statuses'),
+    )
+    if not room_ids:
+        return None
+
+    stats, assignment = generate_schedule(
+        room_ids, validated_data['contract_ids'], validated_data['start_date'], validated_data['end_date'],
+        dry_run=validated_data['dry_run']
+    )
+
+    rooms_per_contract = Counter(assignment.values())
+    return {
+        "rooms": len(room_ids),
+        "days": (validated_data['end_date'] - validated_data['start_date']).days + 1,
+        **stats,
+        "dry_run": validated_data['dry_run'],
+        "cleaners": [
+            {"employee_id": employee_id, "rooms": rooms_per_contract[contract_id]}
+            for employee_id, contract_id in zip(validated_data['cleaner_ids'], validated_data['contract_ids'])
+        ],
+    }
@@ -0,0 +1,155 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, Q, Value, When
+
+from .models import Client, ClientSearchToken
+
+SEARCH_BATCH_SIZE = 5000
+
+# Совпадение в фамилии важнее совпадения в имени и т.д.; совпадение слова целиком весит вдвое больше, чем по началу.
+FIELD_WEIGHTS = {
+    ClientSearchToken.PASSPORT: 5,
+    ClientSearchToken.LAST_NAME: 4,
+    ClientSearchToken.FIRST_NAME: 3,
+    ClientSearchToken.MIDDLE_NAME: 2,
+    ClientSearchToken.CITY: 1,
+}
+TEXT_FIELDS = (ClientSearchToken.LAST_NAME, ClientSearchToken.FIRST_NAME, ClientSearchToken.MIDDLE_NAME,
+               ClientSearchToken.PASSPORT)
+
+# Все слова, начинающиеся с prefix, лежат в диапазоне [prefix, prefix + PREFIX_END) - это просмотр диапазона индекса.
+PREFIX_END = '\U0010ffff'
+
+
+def search_words(value):
+    return Client.normalize_search_text(value).split()
+
+
+def client_tokens(client):
+    fields = (
+        (ClientSearchToken.LAST_NAME, client.last_name),
+        (ClientSearchToken.FIRST_NAME, client.first_name),
+        (ClientSearchToken.MIDDLE_NAME, client.middle_name),
+        (ClientSearchToken.CITY, client.city_from),
+        (ClientSearchToken.PASSPORT, client.passport_number),
+    )
+    return [
+        ClientSearchToken(client_id=client.id, field=field, token=token)
+        for field, value in fields
+        for token in dict.fromkeys(search_words(value))
+    ]
+
+
+def index_clients(clients, batch_size=SEARCH_BATCH_SIZE):
+    # Поля поиска (search_name, search_city) у клиентов уже должны быть заполнены: save() делает это сам.
+    clients = list(clients)
+    with transaction.atomic():
+        ClientSearchToken.objects.filter(client_id__in=[client.id for client in clients]).delete()
+        ClientSearchToken.objects.bulk_create(
+            [token for client in clients for token in client_tokens(client)],
+            batch_size=batch_size
+        )
+
+
+def rebuild_search_index(batch_size=SEARCH_BATCH_SIZE):
+    created = 0
+    with transaction.atomic():
+        ClientSearchToken.objects.all().delete()
+
+        batch = []
+        for client in Client.objects.order_by('id').iterator(chunk_size=batch_size):
+            client.fill_search_fields()
+            batch.append(client)
+            if len(batch) >= batch_size:
+                created += _index_batch(batch, batch_size)
+                batch = []
+        created += _index_batch(batch, batch_size)
+    return created
+
+
+def _index_batch(clients, batch_size):
+    Client.objects.bulk_update(clients, ['search_name', 'search_city'], batch_size=batch_size)
+    tokens = [token for client in clients for token in client_tokens(client)]
+    ClientSearchToken.objects.bulk_create(tokens, batch_size=batch_size)
+    return len(tokens)
+
+
+def prefix_q(word, path=''):
+    return Q(**{f'{path}token__gte': word, f'{path}token__lt': word + PREFIX_END})
+
+
+def filter_by_words(queryset, value, fields, path='search_tokens__'):
+    # Каждое слово запроса должно совпасть с началом какого-нибудь слова в указанных полях.
+    # Каждый вызов filter() добавляет отдельное соединение с таблицей слов, без вложенных списков IN.
+    words = search_words(value)
+    if not words:
+        return queryset.none()
+    for word in words:
+        queryset = queryset.filter(prefix_q(word, path), **{f'{path}field__in': fields})
+    return queryset
+
+
+def filter_by_stays(queryset, path='', room_number=None, start_date=None, end_date=None):
+    # Условия на номер и даты относятся к одному и тому же бронированию: "жил в номере 101 в январе".
+    conditions = {}
+    if room_number is not None:
+        conditions[f'{path}reservation__room__number'] = room_number
+    if start_date:
+        conditions[f'{path}reservation__departure_date__gte'] = start_date
+    if end_date:
+        conditions[f'{path}reservation__arrival_date__lte'] = end_date
+    return queryset.filter(**conditions) if conditions else queryset
+
+
+def search_clients(query=None, city=None, room_number=None, start_date=None, end_date=None, limit=20):
+    # Возвращает список (клиент, релевантность). Без текстового запроса клиенты упорядочены по ФИО.
+    words = search_words(query)
+    if query and not words:
+        # Запрос из одних знаков препинания ни с чем не совпадает, как и такой же фильтр по городу.
+        return []
+    if not words:
+        clients = filter_by_stays(Client.objects.all(), '', room_number, start_date, end_date)
+        if city:
+            clients = filter_by_words(clients, city, [ClientSearchToken.CITY])
+        return [(client, None) for client in clients.distinct().order_by('search_name', 'id')[:limit]]
+
+    # Клиенты, у которых каждое слово запроса совпало с началом какого-нибудь слова, находятся цепочкой соединений
+    # по индексу. Остальные условия (город, номер, даты) проверяются здесь же, один раз на клиента.
+    candidates = filter_by_words(Client.objects.all(), query, TEXT_FIELDS)
+    candidates = filter_by_stays(candidates, '', room_number, start_date, end_date)
+    if city:
+        candidates = filter_by_words(candidates, city, [ClientSearchToken.CITY])
+
+    # Релевантность считается по словам кандидатов: одна строка на подходящее слово клиента,
+    # для каждого слова запроса берётся лучшее совпадение (Max).
+    matches = ClientSearchToken.objects.filter(
+        Q(*[prefix_q(word) for word in words], _connector=Q.OR),
+        field__in=TEXT_FIELDS,
+    )
+    if len(words) > 1 or room_number is not None or start_date or end_date or city:
+        matches = matches.filter(client_id__in=candidates.values('id'))
+
+    weight = Case(*[When(field=field, then=Value(value)) for field, value in FIELD_WEIGHTS.items()],
+                  output_field=IntegerField())
+    word_scores = {
+        f'word_{index}': Max(Case(
+            When(token=word, then=weight * 2),
+            When(prefix_q(word), then=weight),
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+        for index, word in enumerate(words)
+    }
+    # При равной релевантности порядок по id: сортировка по ФИО потребовала бы соединения с клиентами
+    # для каждой подходящей строки, а не только для найденных.
+    ranked = (
+        matches.values('client_id')
+        .annotate(**word_scores)
+        .filter(**{f'{name}__gt': 0 for name in word_scores})
+        .annotate(score=sum((F(name) for name in word_scores), Value(0)))
+        .order_by('-score', 'client_id')
+        .values_list('client_id', 'score')[:limit]
+    )
+
+    ranked = list(ranked)
+    clients = Client.objects.in_bulk([client_id for client_id, _ in ranked])
+    return [(clients[client_id], score) for client_id, score in ranked]
@@ -0,0 +1,91 @@
+import csv
+import json
+from datetime import date
+
+from asgiref.sync import sync_to_async
+
+from .models import Client, Reservation
+
+EXPORT_CHUNK_SIZE = 2000
+
+RESERVATION_EXPORT_FIELDS = (
+    'id', 'room_id', 'room__number', 'client_id', 'client__passport_number', 'client__last_name',
+    'client__first_name', 'admin_id', 'booking_date', 'arrival_date', 'departure_date', 'status',
+    'payment_status', 'price_at_booking', 'final_price', 'updated_by_id', 'last_updated_date',
+)
+CLIENT_EXPORT_FIELDS = ('id', 'passport_number', 'first_name', 'last_name', 'middle_name', 'city_from')
+
+EXPORTS = {
+    'reservations': (Reservation, RESERVATION_EXPORT_FIELDS),
+    'clients': (Client, CLIENT_EXPORT_FIELDS),
+}
+EXPORT_OUTPUTS = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+class _Line:
+    # csv.writer пишет в объект с методом write; здесь строка просто возвращается обратно.
+    def write(self, value):
+        return value
+
+
+def _plain(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def export_rows(name, chunk_size=EXPORT_CHUNK_SIZE):
+    # values_list + iterator: в памяти одновременно находится не больше chunk_size кортежей,
+    # модели и сериализаторы не создаются.
+    model, fields = EXPORTS[name]
+    return model.objects.order_by('id').values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+def stream_ndjson(rows, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(
+            dict(zip(fields, map(_plain, row))), ensure_ascii=False, separators=(',', ':')
+        ))
+        if len(lines) >= chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def stream_csv(rows, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    writer = csv.writer(_Line())
+    yield writer.writerow(fields)
+
+    lines = []
+    for row in rows:
+        lines.append(writer.writerow(map(_plain, row)))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def stream_export(name, output, chunk_size=EXPORT_CHUNK_SIZE):
+    fields = EXPORTS[name][1]
+    rows = export_rows(name, chunk_size)
+    if output == 'csv':
+        return stream_csv(rows, fields, chunk_size)
+    return stream_ndjson(rows, fields, chunk_size)
+
+
+async def aiter_export(chunks):
+    # Для ASGI: синхронный итератор StreamingHttpResponse прочитал бы целиком через sync_to_async(list),
+    # и вся выгрузка оказалась бы в памяти. Здесь в поток для синхронного кода уходит только получение
+    # очередной порции, поэтому в памяти по-прежнему не больше одной порции.
+    done = object()
+    try:
+        while (chunk := await sync_to_async(next)(chunks, done)) is not done:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .cleaning import generate_schedule_summary
+from .models import Job
+from .reports import build_occupancy_report, quarter_date_range
+from .serializers import BulkHireJobSerializer, GenerateCleaningScheduleSerializer, PeriodReportSerializer, \
+    QuarterlyReportSerializer
+from .staff_import import IMPORT_BATCH_SIZE, hire_employees
+
+logger = logging.getLogger(__name__)
+
+
+class JobFailed(Exception):
+    # Ошибка, которую повтор не исправит (например, неверные параметры): задача сразу завершается.
+    pass
+
+
+class JobLeaseLost(Exception):
+    # Аренда задачи истекла, и её мог взять другой обработчик: результат этого запуска не записывается.
+    pass
+
+
+class JobKind:
+    def __init__(self, run, serializer_class, priority=0, max_attempts=3):
+        self.run = run
+        self.serializer_class = serializer_class
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+
+def lease_deadline():
+    return timezone.now() + timedelta(seconds=getattr(settings, 'HOTEL_JOB_LEASE', 10 * 60))
+
+
+class JobProgress:
+    # Передаётся обработчику задачи. Каждый вызов записывает процент выполнения и продлевает аренду задачи,
+    # поэтому долгие задачи должны вызывать его хотя бы раз за HOTEL_JOB_LEASE секунд.
+    def __init__(self, job_id, token):
+        self.job_id = job_id
+        self.token = token
+
+    def __call__(self, done, total, message=''):
+        percent = min(100, done * 100 // total) if total else 100
+        updated = Job.objects.filter(id=self.job_id, status='RUNNING', locked_by=self.token).update(
+            progress=percent, progress_message=message[:255], locked_until=lease_deadline()
+        )
+        if not updated:
+            raise JobLeaseLost()
+
+
+def run_quarterly_report(data, progress):
+    # Отчёт строится по базе, а не берётся из cached_report: кэш в памяти процесса обработчика
+    # не узнаёт об изменениях бронирований, сделанных через сервер.
+    start_date, end_date = quarter_date_range(data['quarter'], data['year'])
+    return build_occupancy_report(start_date, end_date)
+
+
+def run_period_report(data, progress):
+    return build_occupancy_report(data['start_date'], data['end_date'])
+
+
+def run_cleaning_schedule(data, progress):
+    progress(0, 1, "Составление расписания.")
+    summary = generate_schedule_summary(data)
+    if summary is None:
+        raise JobFailed("Не найдено ни одной комнаты по указанным условиям.")
+    return summary
+
+
+def run_bulk_hire(data, progress):
+    # Каждая пачка принимается в своей транзакции, поэтому между пачками база не заблокирована на запись.
+    rows = data['employees']
+    results = []
+    for offset in range(0, len(rows), IMPORT_BATCH_SIZE):
+        results.extend(hire_employees(rows[offset:offset + IMPORT_BATCH_SIZE], first_row=offset + 1))
+        progress(len(results), len(rows), f"Обработано строк: {len(results)} из {len(rows)}.")
+
+    hired = sum(1 for result in results if result['ok'])
+    return {
+        "hired": hired,
+        "failed": len(results) - hired,
+        "results": results,
+    }
+
+
+JOB_KINDS = {
+    'quarterly_report': JobKind(run_quarterly_report, QuarterlyReportSerializer, priority=10),
+    'period_report': JobKind(run_period_report, PeriodReportSerializer, priority=10),
+    'generate_cleaning_schedule': JobKind(run_cleaning_schedule, GenerateCleaningScheduleSerializer),
+    # Повтор после сбоя посреди загрузки отклонил бы уже принятых сотрудников, поэтому попытка одна.
+    'bulk_hire': JobKind(run_bulk_hire, BulkHireJobSerializer, priority=-10, max_attempts=1),
+}
+
+
+def enqueue_job(kind, payload, priority=None, user=None):
+    job_kind = JOB_KINDS[kind]
+    return Job.objects.create(
+        kind=kind,
+        payload=payload,
+        priority=job_kind.priority if priority is None else priority,
+        max_attempts=job_kind.max_attempts,
+        created_by=user,
+    )
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'[:90]
+
+
+def release_expired_jobs(now=None):
+    # Задачи, аренда которых истекла (обработчик упал или был убит), возвращаются в очередь,
+    # а если попытки исчерпаны - завершаются ошибкой.
+    now = now or timezone.now()
+    expired = Job.objects.filter(status='RUNNING', locked_until__lt=now)
+    expired.filter(attempts__gte=F('max_attempts')).update(
+        status='FAILED', finished_at=now, locked_by=None, locked_until=None,
+        error="Обработчик задачи прекратил работу, попытки исчерпаны."
+    )
+    expired.update(
+        status='PENDING', run_after=now, locked_by=None, locked_until=None,
+        error="Обработчик задачи прекратил работу, задача возвращена в очередь."
+    )
+
+
+def claim_jobs(worker, limit):
+    now = timezone.now()
+    release_expired_jobs(now)
+
+    claimed = []
+    candidates = Job.objects.filter(status='PENDING', run_after__lte=now).order_by('-priority', 'id')
+    for job_id in candidates.values_list('id', flat=True)[:limit]:
+        token = f'{worker}:{uuid.uuid4().hex[:8]}'
+        # Как в lock_room: задача достаётся тому, чей условный UPDATE изменил строку, блокировки строк не нужны.
+        taken = Job.objects.filter(id=job_id, status='PENDING').update(
+            status='RUNNING', locked_by=token, locked_until=lease_deadline(), started_at=now,
+            attempts=F('attempts') + 1, progress=0, progress_message=''
+        )
+        if taken:
+            claimed.append((job_id, token))
+    return claimed
+
+
+def _finish_job(job_id, token, **changes):
+    return Job.objects.filter(id=job_id, status='RUNNING', locked_by=token).update(
+        locked_by=None, locked_until=None, **changes
+    )
+
+
+def _error_text(detail):
+    if isinstance(detail, (dict, list)):
+        return json.dumps(detail, ensure_ascii=False)
+    return str(detail)
+
+
+def run_job(job_id, token):
+    # Выполняется в потоке или процессе обработчика. Возвращает итоговый статус задачи.
+    close_old_connections()
+    try:
+        job = Job.objects.get(id=job_id)
+        job_kind = JOB_KINDS.get(job.kind)
+        try:
+            if job_kind is None:
+                raise JobFailed(f"Неизвестный тип задачи: {job.kind}.")
+            serializer = job_kind.serializer_class(data=job.payload)
+            if not serializer.is_valid():
+                raise JobFailed(serializer.errors)
+            result = job_kind.run(serializer.validated_data, JobProgress(job_id, token))
+        except JobLeaseLost:
+            logger.warning("Аренда задачи %s истекла во время выполнения.", job_id)
+            return 'LOST'
+        except JobFailed as error:
+            status = 'FAILED'
+            changes = dict(status=status, error=_error_text(error.args[0]), finished_at=timezone.now())
+        except Exception as error:
+            logger.exception("Задача %s (%s) завершилась ошибкой.", job_id, job.kind)
+            now = timezone.now()
+            if job.attempts < job.max_attempts:
+                # Повтор через HOTEL_JOB_RETRY_DELAY секунд, задержка удваивается с каждой попыткой.
+                delay = getattr(settings, 'HOTEL_JOB_RETRY_DELAY', 30) * 2 ** (job.attempts - 1)
+                status = 'PENDING'
+                changes = dict(status=status, run_after=now + timedelta(seconds=delay))
+            else:
+                status = 'FAILED'
+                changes = dict(status=status, finished_at=now)
+            changes['error'] = f'{type(error).__name__}: {error}'
+        else:
+            status = 'SUCCEEDED'
+            changes = dict(status=status, result=result, error=None, progress=100, finished_at=timezone.now())
+
+        if not _finish_job(job_id, token, **changes):
+            return 'LOST'
+        return status
+    finally:
+        close_old_connections()
+
+
+def purge_finished_jobs(days=None):
+    if days is None:
+        days = getattr(settings, 'HOTEL_JOB_KEEP_DAYS', 7)
+    deleted, _ = Job.objects.filter(
+        status__in=['SUCCEEDED', 'FAILED'], finished_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    return deleted
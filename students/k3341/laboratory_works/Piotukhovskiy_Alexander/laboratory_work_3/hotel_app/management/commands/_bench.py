@@ -0,0 +1,118 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+
+from hotel_app.client_search import index_clients
+from hotel_app.models import CleaningSchedule, Client, Employee, EmployeePosition, EmploymentContract, Reservation, \
+    Room, RoomType
+
+
+def measure(func, repeat=5):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, min(timings), sum(timings) / len(timings)
+
+
+@contextmanager
+def rolled_back():
+    # Тестовые данные бенчмарков не должны оставаться в базе.
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def seed_hotel(rooms=100, clients=1000, reservations=10000, first_day=date(2023, 1, 1), days=730,
+               batch_size=10000, seed=42, stdout=None):
+    rnd = random.Random(seed)
+
+    admin = User.objects.create(username=f'bench-admin-{seed}')
+    room_type = RoomType.objects.create(name=f'bench-type-{seed}', capacity=2)
+    # Номера комнат начинаются после уже существующих, чтобы не конфликтовать с реальными данными.
+    base_number = ((Room.objects.aggregate(Max('number'))['number__max'] or 0) // 100000 + 1) * 100000
+    room_objects = Room.objects.bulk_create(
+        [
+            Room(number=number, floor=Room.floor_for_number(number), type=room_type, phone='0')
+            for number in (base_number + 100 * (1 + index // 50) + index % 50 for index in range(rooms))
+        ],
+        batch_size=batch_size
+    )
+    client_objects = [
+        Client(passport_number=f'B{seed % 100:02d}{index:07d}', first_name=f'Имя{index}', last_name=f'Фамилия{index}',
+               city_from=rnd.choice(['Москва', 'Санкт-Петербург', 'Казань', 'Новосибирск', 'Екатеринбург']))
+        for index in range(clients)
+    ]
+    for client in client_objects:
+        client.fill_search_fields()
+    client_objects = Client.objects.bulk_create(client_objects, batch_size=batch_size)
+    index_clients(client_objects, batch_size=batch_size)
+
+    created = 0
+    while created < reservations:
+        batch = []
+        for _ in range(min(batch_size, reservations - created)):
+            arrival_date = first_day + timedelta(days=rnd.randrange(days))
+            nights = rnd.randint(1, 14)
+            batch.append(Reservation(
+                room_id=rnd.choice(room_objects).id,
+                client_id=rnd.choice(client_objects).id,
+                admin=admin,
+                booking_date=arrival_date,
+                arrival_date=arrival_date,
+                departure_date=arrival_date + timedelta(days=nights),
+                status=rnd.choice(['BOOKED', 'CONFIRMED', 'CHECKED_IN', 'CHECKED_OUT', 'CANCELLED']),
+                payment_status=rnd.choice(['PREPAID', 'PAID', 'UNPAID']),
+                price_at_booking=nights * 3000,
+                final_price=nights * 3000,
+            ))
+        Reservation.objects.bulk_create(batch)
+        created += len(batch)
+        if stdout is not None:
+            stdout.write(f"  бронирований создано: {created}", ending='\r')
+    if stdout is not None and reservations:
+        stdout.write('')
+
+    return admin, room_type, room_objects, client_objects
+
+
+def seed_staff(rooms, employees=50, schedules=1000, first_day=date(2023, 1, 1), days=90, batch_size=10000, seed=42):
+    rnd = random.Random(seed)
+
+    positions = EmployeePosition.objects.bulk_create([
+        EmployeePosition(name=f'bench-position-{seed}-{index}', salary=30000 + 5000 * index) for index in range(3)
+    ])
+    employee_objects = Employee.objects.bulk_create(
+        [
+            Employee(passport_number=f'E{seed % 100:02d}{index:07d}', first_name=f'Имя{index}',
+                     last_name=f'Фамилия{index}')
+            for index in range(employees)
+        ],
+        batch_size=batch_size
+    )
+    contracts = EmploymentContract.objects.bulk_create(
+        [
+            EmploymentContract(employee=employee, position=rnd.choice(positions), contract_type='PERMANENT',
+                               start_date=first_day)
+            for employee in employee_objects
+        ],
+        batch_size=batch_size
+    )
+    cleaning_dates = [first_day + timedelta(days=rnd.randrange(days)) for _ in range(schedules)]
+    CleaningSchedule.objects.bulk_create(
+        [
+            CleaningSchedule(cleaner=rnd.choice(contracts), room=rnd.choice(rooms), cleaning_date=cleaning_date,
+                             weekday=CleaningSchedule.weekday_for_date(cleaning_date))
+            for cleaning_date in cleaning_dates
+        ],
+        batch_size=batch_size
+    )
+
+    return positions, employee_objects, contracts
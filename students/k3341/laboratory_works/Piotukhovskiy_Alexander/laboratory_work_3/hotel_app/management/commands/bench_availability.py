@@ -0,0 +1,64 @@
+import random
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel_app.availability import BLOCKING_STATUSES, AvailabilityIndex
+from hotel_app.management.commands._bench import measure, rolled_back, seed_hotel
+from hotel_app.models import Reservation, Room
+
+
+def naive_free_rooms(type_id, start_date, end_date):
+    # Запрос к базе: комнаты типа без пересекающихся бронирований.
+    busy = Reservation.objects.filter(
+        status__in=BLOCKING_STATUSES, arrival_date__lt=end_date, departure_date__gt=start_date
+    ).values('room_id')
+    return sorted(Room.objects.filter(type_id=type_id).exclude(id__in=busy).values_list('number', flat=True))
+
+
+class Command(BaseCommand):
+    help = "Сравнить поиск свободных номеров на период: запрос к базе и индекс занятости в памяти."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=1000)
+        parser.add_argument('--reservations', type=int, default=100000)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        first_day = date(2024, 1, 1)
+        rnd = random.Random(7)
+
+        with rolled_back():
+            self.stdout.write("Генерация данных...")
+            _, room_type, _, _ = seed_hotel(
+                rooms=options['rooms'], clients=10000, reservations=options['reservations'],
+                first_day=first_day, days=options['days'], stdout=self.stdout
+            )
+
+            index = AvailabilityIndex(ttl=3600)
+            _, build_ms, _ = measure(index.rebuild, 1)
+            self.stdout.write(f"Построение индекса: {build_ms:.0f} мс")
+
+            periods = []
+            for _ in range(options['queries']):
+                start_date = first_day + timedelta(days=rnd.randrange(options['days']))
+                periods.append((start_date, start_date + timedelta(days=rnd.randint(1, 14))))
+
+            naive_total = index_total = 0.0
+            for start_date, end_date in periods:
+                expected, naive_ms, _ = measure(
+                    lambda: naive_free_rooms(room_type.id, start_date, end_date), options['repeat'])
+                actual, index_ms, _ = measure(
+                    lambda: index.free_rooms(start_date, end_date, room_type.id), options['repeat'])
+                if expected != actual:
+                    raise CommandError(f"Результаты для периода {start_date} - {end_date} не совпадают.")
+                naive_total += naive_ms
+                index_total += index_ms
+
+            count = len(periods)
+            self.stdout.write(
+                f"{options['rooms']} комнат, {count} запросов: база {naive_total / count:8.2f} мс, "
+                f"индекс {index_total / count:6.3f} мс в среднем"
+            )
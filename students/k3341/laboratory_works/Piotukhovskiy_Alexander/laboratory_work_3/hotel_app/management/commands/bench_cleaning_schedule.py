@@ -0,0 +1,78 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from hotel_app.cleaning import balance_rooms, date_range, generate_schedule
+from hotel_app.management.commands._bench import measure, rolled_back, seed_hotel, seed_staff
+from hotel_app.models import CleaningSchedule
+
+
+def legacy_schedule(room_ids, contract_ids, start_date, end_date):
+    # Как в PATCH /cleaning-schedules/manage: для каждого уборщика удалить его уборки и создать все заново.
+    assignment = balance_rooms(room_ids, contract_ids)
+    dates = date_range(start_date, end_date)
+    with transaction.atomic():
+        for contract_id in contract_ids:
+            rooms = [room_id for room_id, assigned in assignment.items() if assigned == contract_id]
+            CleaningSchedule.objects.filter(
+                cleaner_id=contract_id, cleaning_date__in=dates, room_id__in=rooms
+            ).delete()
+            CleaningSchedule.objects.bulk_create([
+                CleaningSchedule(cleaner_id=contract_id, room_id=room_id, cleaning_date=cleaning_date,
+                                 weekday=CleaningSchedule.weekday_for_date(cleaning_date))
+                for cleaning_date in dates
+                for room_id in rooms
+            ])
+
+
+class Command(BaseCommand):
+    help = "Сравнить составление расписания уборок: удаление и пересоздание против генератора с поиском отличий."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=500)
+        parser.add_argument('--days', type=int, default=90)
+        parser.add_argument('--cleaners', type=int, default=10)
+
+    def timed(self, label, func):
+        with CaptureQueriesContext(connection) as queries:
+            result, elapsed_ms, _ = measure(func, 1)
+        self.stdout.write(f"{label:<40} {elapsed_ms:9.0f} мс, {len(queries):6d} запросов")
+        return result
+
+    def handle(self, *args, **options):
+        start_date = date(2024, 1, 1)
+        end_date = start_date + timedelta(days=options['days'] - 1)
+
+        with rolled_back():
+            self.stdout.write("Генерация данных...")
+            _, _, rooms, _ = seed_hotel(rooms=options['rooms'], clients=1, reservations=0, stdout=self.stdout)
+            _, _, contracts = seed_staff(rooms, employees=options['cleaners'] + 1, schedules=0)
+            room_ids = [room.id for room in sorted(rooms, key=lambda room: room.number)]
+            contract_ids = [contract.id for contract in contracts[:-1]]
+            expected = len(room_ids) * options['days']
+
+            self.stdout.write(f"{len(room_ids)} комнат x {options['days']} дней = {expected} уборок")
+            self.timed("Удаление и пересоздание (первый раз)", lambda: legacy_schedule(
+                room_ids, contract_ids, start_date, end_date))
+            self.timed("Удаление и пересоздание (повторно)", lambda: legacy_schedule(
+                room_ids, contract_ids, start_date, end_date))
+            CleaningSchedule.objects.all().delete()
+
+            stats = self.timed("Генератор (первый раз)", lambda: generate_schedule(
+                room_ids, contract_ids, start_date, end_date)[0])
+            if stats['created'] != expected:
+                raise CommandError(f"Создано {stats['created']} уборок вместо {expected}.")
+
+            stats = self.timed("Генератор (повторно, без изменений)", lambda: generate_schedule(
+                room_ids, contract_ids, start_date, end_date)[0])
+            if stats['unchanged'] != expected:
+                raise CommandError(f"Повторный запуск изменил {expected - stats['unchanged']} уборок.")
+
+            stats = self.timed("Генератор (добавлен уборщик)", lambda: generate_schedule(
+                room_ids, [contract.id for contract in contracts], start_date, end_date)[0])
+            self.stdout.write(f"  переназначено {stats['reassigned']}, без изменений {stats['unchanged']}")
+
+            if CleaningSchedule.objects.count() != expected:
+                raise CommandError("Количество уборок в расписании не совпадает с ожидаемым.")
@@ -0,0 +1,151 @@
+import random
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from hotel_app.client_search import index_clients, search_clients
+from hotel_app.management.commands._bench import measure, rolled_back, seed_hotel
+from hotel_app.models import Client, Reservation
+from hotel_app.views import ClientsListView
+
+FIRST_DAY = date(2023, 1, 1)
+
+LAST_NAMES = ['Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Соколов', 'Михайлов',
+              'Новиков', 'Фёдоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов', 'Егоров', 'Павлов',
+              'Козлов', 'Степанов', 'Николаев', 'Орлов', 'Андреев', 'Макаров', 'Никитин', 'Захаров']
+LAST_NAME_SUFFIXES = ['', 'ич', 'ский', 'енко', 'цев', 'ин']
+FIRST_NAMES = ['Александр', 'Алексей', 'Андрей', 'Дмитрий', 'Иван', 'Михаил', 'Никита', 'Пётр', 'Сергей',
+               'Анна', 'Дарья', 'Екатерина', 'Мария', 'Ольга', 'Полина', 'Татьяна']
+MIDDLE_NAMES = ['Александрович', 'Иванович', 'Петрович', 'Сергеевич', 'Андреевна', 'Дмитриевна', 'Михайловна', None]
+CITIES = ['Москва', 'Санкт-Петербург', 'Казань', 'Новосибирск', 'Екатеринбург', 'Нижний Новгород', 'Самара',
+          'Ростов-на-Дону', 'Великий Новгород', 'Петрозаводск', 'Петропавловск-Камчатский', 'Тула', 'Омск', 'Пермь']
+
+
+def legacy_filter_clients(query_params):
+    # Прежняя реализация ClientsListView: вложенные списки id бронирований и icontains по городу.
+    queryset = Client.objects.all()
+
+    room_number = query_params.get('room', None)
+    if room_number:
+        client_ids = Reservation.objects.filter(room__number=room_number).values_list('client_id', flat=True)
+        queryset = queryset.filter(id__in=client_ids)
+
+    start_date = query_params.get('start_date', None)
+    end_date = query_params.get('end_date', None)
+    if start_date or end_date:
+        date_filter = Q()
+        if start_date:
+            date_filter &= Q(departure_date__gte=start_date)
+        if end_date:
+            date_filter &= Q(arrival_date__lte=end_date)
+        queryset = queryset.filter(id__in=Reservation.objects.filter(date_filter).values_list('client_id', flat=True))
+
+    city_name = query_params.get('city', None)
+    if city_name:
+        queryset = queryset.filter(city_from__icontains=city_name)
+
+    return queryset
+
+
+def legacy_search(query, city=None, limit=20):
+    # Поиск "в лоб": каждое слово ищется подстрокой в каждом поле, то есть полным просмотром таблицы.
+    queryset = Client.objects.all()
+    for word in query.split():
+        queryset = queryset.filter(
+            Q(last_name__icontains=word) | Q(first_name__icontains=word) | Q(middle_name__icontains=word)
+            | Q(passport_number__icontains=word)
+        )
+    if city:
+        queryset = queryset.filter(city_from__icontains=city)
+    return list(queryset.order_by('last_name', 'first_name', 'id')[:limit])
+
+
+class Command(BaseCommand):
+    help = "Сравнить поиск клиентов: icontains и вложенные списки id против индекса слов и соединений."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000000)
+        parser.add_argument('--reservations', type=int, default=200000)
+        parser.add_argument('--rooms', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.stdout.write("Генерация данных...")
+            client_ids = self.seed(options)
+            room_number = self.rooms[0].number
+
+            self.stdout.write(f"Клиентов: {len(client_ids)}, бронирований: {options['reservations']}")
+
+            # Поиск по ФИО не может работать с icontains иначе, чем полным просмотром таблицы. Кроме того, в SQLite
+            # icontains не различает регистр только для латиницы, поэтому запросы заданы с заглавной буквы.
+            for query, city in (('Иванов', None), ('Пётр Серг', None), ('Иванов Пётр Серг', None), ('Смирн Анна', 'Моск'),
+                                ('S0000123', None)):
+                legacy, legacy_best, _ = measure(lambda: legacy_search(query, city), options['repeat'])
+                found, new_best, _ = measure(lambda: search_clients(query, city), options['repeat'])
+                if legacy and not found:
+                    raise CommandError(f"Индекс не нашёл клиентов по запросу \"{query}\".")
+                self.stdout.write(
+                    f"q={query!r:<20} city={city!r:<8} icontains {legacy_best:9.1f} мс, "
+                    f"индекс {new_best:9.1f} мс, первые: {', '.join(client.last_name for client, _ in found[:3])}"
+                )
+
+            # Фильтры списка клиентов: результаты совпадают, если город задан началом слова.
+            for params in (
+                {'city': 'Казань'},
+                {'room': room_number},
+                {'room': room_number, 'start_date': FIRST_DAY, 'end_date': FIRST_DAY + timedelta(days=30)},
+                {'room': room_number, 'start_date': FIRST_DAY, 'city': 'Новосиб'},
+            ):
+                legacy_ids, legacy_best, _ = measure(
+                    lambda: set(legacy_filter_clients(params).values_list('id', flat=True)), options['repeat'])
+                new_ids, new_best, _ = measure(
+                    lambda: set(ClientsListView.filter_clients(params).values_list('id', flat=True)), options['repeat'])
+                if legacy_ids != new_ids:
+                    raise CommandError(f"Результаты фильтров {params} не совпадают.")
+                self.stdout.write(
+                    f"{', '.join(f'{key}={value}' for key, value in params.items()):<54} "
+                    f"IN {legacy_best:9.1f} мс, соединения {new_best:9.1f} мс, найдено {len(new_ids)}"
+                )
+
+    def seed(self, options):
+        rnd = random.Random(42)
+        batch_size = options['batch_size']
+        admin, _, self.rooms, _ = seed_hotel(rooms=options['rooms'], clients=0, reservations=0)
+
+        client_ids = []
+        while len(client_ids) < options['clients']:
+            batch = []
+            for index in range(len(client_ids), min(len(client_ids) + batch_size, options['clients'])):
+                client = Client(
+                    passport_number=f'S{index:09d}',
+                    last_name=rnd.choice(LAST_NAMES) + rnd.choice(LAST_NAME_SUFFIXES),
+                    first_name=rnd.choice(FIRST_NAMES),
+                    middle_name=rnd.choice(MIDDLE_NAMES),
+                    city_from=rnd.choice(CITIES),
+                )
+                client.fill_search_fields()
+                batch.append(client)
+            batch = Client.objects.bulk_create(batch)
+            index_clients(batch, batch_size=batch_size)
+            client_ids.extend(client.id for client in batch)
+            self.stdout.write(f"  клиентов создано: {len(client_ids)}", ending='\r')
+        self.stdout.write("")
+
+        created = 0
+        while created < options['reservations']:
+            batch = []
+            for _ in range(min(batch_size, options['reservations'] - created)):
+                arrival_date = FIRST_DAY + timedelta(days=rnd.randrange(365))
+                nights = rnd.randint(1, 14)
+                batch.append(Reservation(
+                    room_id=rnd.choice(self.rooms).id, client_id=rnd.choice(client_ids), admin=admin,
+                    booking_date=arrival_date, arrival_date=arrival_date,
+                    departure_date=arrival_date + timedelta(days=nights),
+                    price_at_booking=nights * 3000, final_price=nights * 3000,
+                ))
+            Reservation.objects.bulk_create(batch)
+            created += len(batch)
+        return client_ids
@@ -0,0 +1,65 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from hotel_app.management.commands._bench import measure, rolled_back, seed_hotel, seed_staff
+from hotel_app.models import Room
+from hotel_app.views import ClientViewSet, RoomViewSet, ReservationViewSet, CleaningScheduleViewSet
+
+ENDPOINTS = [
+    ('/api/clients/', ClientViewSet.as_view({'get': 'list'})),
+    ('/api/rooms/', RoomViewSet.as_view({'get': 'list'})),
+    ('/api/reservations/', ReservationViewSet.as_view({'get': 'list'})),
+    ('/api/cleaning-schedules/', CleaningScheduleViewSet.as_view({'get': 'list'})),
+]
+
+
+class Command(BaseCommand):
+    help = "Сравнить обычный GET и повторный GET с If-None-Match (ответ 304) для списков: " \
+           "время ответа и количество SQL-запросов."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservations', type=int, default=20000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def get(self, user, path, view, **headers):
+        request = APIRequestFactory().get(path, **headers)
+        force_authenticate(request, user=user)
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            response = view(request)
+            if response.status_code == 200:
+                response.render()
+        return response, queries[0]
+
+    def handle(self, *args, **options):
+        rows = options['reservations']
+        with rolled_back():
+            self.stdout.write("Генерация данных...")
+            user = User.objects.create(username='conditional-get', is_staff=True)
+            _, _, rooms, _ = seed_hotel(rooms=500, clients=rows // 2, reservations=rows, stdout=self.stdout)
+            seed_staff(rooms, employees=50, schedules=rows)
+            Room.objects.filter(id__in=[room.id for room in rooms[::3]]).update(status='OCCUPIED')
+            self.stdout.write("")
+
+            for path, view in ENDPOINTS:
+                (response, queries), full_best, _ = measure(lambda: self.get(user, path, view), options['repeat'])
+                if response.status_code != 200:
+                    raise CommandError(f"{path}: код ответа {response.status_code}")
+
+                etag = response['ETag']
+                (cached, cached_queries), cached_best, _ = measure(
+                    lambda: self.get(user, path, view, HTTP_IF_NONE_MATCH=etag), options['repeat'])
+                if cached.status_code != 304:
+                    raise CommandError(f"{path}: повторный запрос с If-None-Match вернул {cached.status_code}")
+
+                self.stdout.write(
+                    f"{path:<28} 200: {full_best:8.1f} мс, {queries:>3} запр., {len(response.content) / 1024:8.0f} КБ"
+                    f"   304: {cached_best:6.2f} мс, {cached_queries} запр."
+                )
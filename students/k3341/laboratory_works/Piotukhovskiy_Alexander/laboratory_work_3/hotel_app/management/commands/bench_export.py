@@ -0,0 +1,60 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from hotel_app.exports import stream_export
+from hotel_app.management.commands._bench import rolled_back, seed_hotel
+from hotel_app.models import Reservation
+from hotel_app.serializers import ReservationSerializer
+
+
+def traced(func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, (time.perf_counter() - started) * 1000, peak / 1024 / 1024
+
+
+def legacy_export(limit):
+    # Прежний путь через /api/reservations/: весь список сериализуется в память, затем рендерится целиком.
+    queryset = ReservationSerializer.setup_eager_loading(Reservation.objects.order_by('id'))[:limit]
+    return len(JSONRenderer().render(ReservationSerializer(queryset, many=True).data))
+
+
+def streamed_export(output):
+    return sum(len(chunk.encode('utf-8')) for chunk in stream_export('reservations', output))
+
+
+class Command(BaseCommand):
+    help = "Сравнить пиковое потребление памяти при выгрузке бронирований: сериализатор DRF и потоковый экспорт."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservations', type=int, default=1000000)
+        parser.add_argument('--legacy-rows', type=int, default=50000,
+                            help="Сколько бронирований выгрузить прежним способом (целиком он не помещается в память).")
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.stdout.write("Генерация данных...")
+            seed_hotel(clients=10000, reservations=options['reservations'], stdout=self.stdout)
+            total = Reservation.objects.count()
+
+            legacy_rows = min(options['legacy_rows'], total)
+            size, elapsed, peak = traced(lambda: legacy_export(legacy_rows))
+            self.stdout.write(
+                f"Сериализатор, {legacy_rows} строк: {elapsed:9.0f} мс, пик {peak:8.1f} МБ, ответ {size / 1024 / 1024:.1f} МБ "
+                f"(~{peak / legacy_rows * total:.0f} МБ на {total} строк)"
+            )
+
+            for output in ('ndjson', 'csv'):
+                size, elapsed, peak = traced(lambda: streamed_export(output))
+                self.stdout.write(
+                    f"Поток {output:>6}, {total} строк: {elapsed:9.0f} мс, пик {peak:8.1f} МБ, "
+                    f"ответ {size / 1024 / 1024:.1f} МБ"
+                )
@@ -0,0 +1,58 @@
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from hotel_app.management.commands._bench import measure, rolled_back, seed_hotel, seed_staff
+from hotel_app.models import CleaningSchedule, Reservation, Room
+from hotel_app.serializers import CleaningScheduleSerializer, ReservationSerializer
+from hotel_drf_app.renderers import FastJSONParser, FastJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    help = "Сравнить рендеринг и разбор JSON для ответов ReservationSerializer и CleaningScheduleSerializer: " \
+           "JSONRenderer/JSONParser из DRF (stdlib json) и FastJSONRenderer/FastJSONParser (orjson)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson не установлен: FastJSONRenderer использует stdlib json."))
+
+        rows = max(options['rows'])
+        with rolled_back():
+            self.stdout.write("Генерация данных...")
+            _, _, rooms, _ = seed_hotel(rooms=500, clients=rows // 10, reservations=rows, stdout=self.stdout)
+            seed_staff(rooms, employees=50, schedules=rows)
+            # У занятых комнат в ответе есть текущий клиент и дата последней уборки (date в SerializerMethodField).
+            Room.objects.filter(id__in=[room.id for room in rooms[::3]]).update(status='OCCUPIED')
+            self.stdout.write("")
+
+            for title, serializer_class, model in (
+                ("ReservationSerializer", ReservationSerializer, Reservation),
+                ("CleaningScheduleSerializer", CleaningScheduleSerializer, CleaningSchedule),
+            ):
+                queryset = serializer_class.setup_eager_loading(model.objects.order_by('id'))
+                for size in options['rows']:
+                    data = serializer_class(queryset[:size], many=True).data
+                    self.compare(f"{title} x {size}", data, options['repeat'])
+
+    def compare(self, title, data, repeat):
+        expected, stdlib_render, _ = measure(lambda: JSONRenderer().render(data), repeat)
+        result, fast_render, _ = measure(lambda: FastJSONRenderer().render(data), repeat)
+        if result != expected:
+            raise CommandError(f"{title}: FastJSONRenderer вернул другой JSON.")
+
+        parsed, stdlib_parse, _ = measure(lambda: JSONParser().parse(BytesIO(expected)), repeat)
+        fast_parsed, fast_parse, _ = measure(lambda: FastJSONParser().parse(BytesIO(expected)), repeat)
+        if fast_parsed != parsed:
+            raise CommandError(f"{title}: FastJSONParser разобрал JSON иначе.")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{title} ({len(expected) / 1024 / 1024:.1f} МБ)"))
+        self.stdout.write(f"  рендеринг: json {stdlib_render:8.1f} мс, orjson {fast_render:8.1f} мс, "
+                          f"x{stdlib_render / fast_render:.1f}")
+        self.stdout.write(f"  разбор:    json {stdlib_parse:8.1f} мс, orjson {fast_parse:8.1f} мс, "
+                          f"x{stdlib_parse / fast_parse:.1f}")
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from hotel_app.management.commands._bench import measure, rolled_back, seed_hotel, seed_staff
+from hotel_app.models import Client, Reservation, Room
+from hotel_app.serializers import ClientSerializer, ReservationSerializer
+from hotel_app.values_serializers import values_reader
+
+
+def drf_list(serializer_class, queryset, limit):
+    if hasattr(serializer_class, 'setup_eager_loading'):
+        queryset = serializer_class.setup_eager_loading(queryset)
+    return JSONRenderer().render(serializer_class(queryset[:limit], many=True).data)
+
+
+def fast_list(serializer_class, queryset, limit):
+    reader = values_reader(serializer_class)
+    return JSONRenderer().render(reader.render(queryset.values(*reader.columns)[:limit]))
+
+
+class Command(BaseCommand):
+    help = "Сравнить построение списков /api/clients/ и /api/reservations/ через ModelSerializer и через " \
+           "ValuesReader (строки values() без экземпляров моделей). Проверяет, что JSON совпадает побайтно."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        rows = max(options['sizes'])
+        with rolled_back():
+            self.stdout.write("Генерация данных...")
+            _, _, rooms, _ = seed_hotel(rooms=500, clients=rows, reservations=rows, stdout=self.stdout)
+            seed_staff(rooms, employees=50, schedules=50000)
+            # Часть комнат занята, чтобы в списке бронирований был текущий клиент комнаты.
+            Room.objects.filter(id__in=[room.id for room in rooms[::3]]).update(status='OCCUPIED')
+            self.stdout.write("")
+
+            for title, serializer_class, model in (
+                ("/api/clients/", ClientSerializer, Client),
+                ("/api/reservations/", ReservationSerializer, Reservation),
+            ):
+                queryset = model.objects.order_by('id')
+                for size in options['sizes']:
+                    expected, drf_best, _ = measure(
+                        lambda: drf_list(serializer_class, queryset, size), options['repeat'])
+                    result, fast_best, _ = measure(
+                        lambda: fast_list(serializer_class, queryset, size), options['repeat'])
+                    if result != expected:
+                        raise CommandError(f"{title}: JSON быстрого пути отличается от ModelSerializer.")
+                    self.stdout.write(
+                        f"{title:<20} {size:>7} строк: ModelSerializer {drf_best:8.0f} мс, "
+                        f"values() {fast_best:8.0f} мс, x{drf_best / fast_best:.1f}"
+                    )
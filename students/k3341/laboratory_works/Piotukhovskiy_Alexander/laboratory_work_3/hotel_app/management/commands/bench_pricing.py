@@ -0,0 +1,115 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel_app.management.commands._bench import measure, rolled_back
+from hotel_app.models import RoomPriceHistory, RoomType
+from hotel_app.pricing import RoomPriceCalendar, refresh_price_calendar, room_type_total
+
+
+def legacy_total_price(price_history, arrival_date, departure_date):
+    # Прежняя реализация ReservationManagementView.calculate_total_price: перебор ночей и периодов.
+    total_price = 0
+    current_date = arrival_date
+
+    while current_date < departure_date:
+        for price_period in price_history:
+            if price_period.start_date <= current_date and (
+                    price_period.end_date is None or price_period.end_date >= current_date):
+                total_price += price_period.price
+                break
+
+        current_date += timedelta(days=1)
+    return total_price
+
+
+class Command(BaseCommand):
+    help = "Сравнить расчёт стоимости проживания: прежний цикл по ночам, интервальный календарь цен " \
+           "и сумму по календарю цен по ночам в базе."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--periods', type=int, default=104, help="Количество ценовых периодов (по неделе).")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        first_day = date(2024, 1, 1)
+        price_history = [
+            SimpleNamespace(
+                start_date=first_day + timedelta(weeks=week),
+                end_date=first_day + timedelta(weeks=week + 1, days=-1),
+                price=3000 + (week % 7) * 250,
+            )
+            for week in range(options['periods'])
+        ]
+        price_history.append(SimpleNamespace(
+            start_date=first_day + timedelta(weeks=options['periods']),
+            end_date=None,
+            price=4500,
+        ))
+        periods = [(period.start_date, period.end_date, period.price) for period in price_history]
+
+        self.stdout.write(f"Ценовых периодов: {len(price_history)}")
+        for nights in (1, 30, 365):
+            arrival_date = first_day + timedelta(days=40)
+            departure_date = arrival_date + timedelta(days=nights)
+
+            legacy_total, legacy_best, _ = measure(
+                lambda: legacy_total_price(price_history, arrival_date, departure_date), options['repeat'])
+            calendar_total, calendar_best, _ = measure(
+                lambda: RoomPriceCalendar(periods).total(arrival_date, departure_date), options['repeat'])
+
+            if legacy_total != calendar_total:
+                raise CommandError(f"Расхождение для {nights} ночей: {legacy_total} != {calendar_total}")
+
+            self.stdout.write(
+                f"{nights:>4} ночей: цикл {legacy_best:9.3f} мс, календарь {calendar_best:7.3f} мс, "
+                f"итог {calendar_total}"
+            )
+
+        with rolled_back():
+            self.bench_database(price_history, first_day, options)
+
+    def bench_database(self, price_history, first_day, options):
+        # Те же периоды в базе: расчёт по периодам (запрос истории цен + календарь в памяти)
+        # против одного SUM по календарю цен по ночам.
+        room_type = RoomType.objects.create(name='bench-pricing', capacity=2)
+        RoomPriceHistory.objects.bulk_create([
+            RoomPriceHistory(room_type=room_type, start_date=period.start_date, end_date=period.end_date,
+                             price=period.price)
+            for period in price_history
+        ])
+        horizon = first_day + timedelta(weeks=len(price_history) + 52)
+        _, build_best, _ = measure(
+            lambda: refresh_price_calendar(room_type.id, full=True, horizon=horizon), options['repeat'])
+        self.stdout.write(
+            f"Календарь по ночам до {horizon}: построение {build_best:.1f} мс, "
+            f"ночей {room_type.nightly_prices.count()}"
+        )
+
+        period = RoomPriceHistory.objects.filter(room_type=room_type).order_by('start_date')[10]
+
+        def change_period():
+            period.price += 1
+            period.save()
+
+        _, change_best, _ = measure(change_period, options['repeat'])
+        self.stdout.write(f"Изменение одного периода с пересчётом его ночей: {change_best:.1f} мс")
+
+        for nights in (1, 30, 365):
+            arrival_date = first_day + timedelta(days=40)
+            departure_date = arrival_date + timedelta(days=nights)
+
+            periods_total, periods_best, _ = measure(
+                lambda: RoomPriceCalendar.for_room_type(room_type.id).total(arrival_date, departure_date),
+                options['repeat'])
+            sum_total, sum_best, _ = measure(
+                lambda: room_type_total(room_type.id, arrival_date, departure_date), options['repeat'])
+
+            if periods_total != sum_total:
+                raise CommandError(f"Расхождение для {nights} ночей: {periods_total} != {sum_total}")
+
+            self.stdout.write(
+                f"{nights:>4} ночей: периоды из базы {periods_best:7.3f} мс, SUM по ночам {sum_best:7.3f} мс, "
+                f"итог {sum_total}"
+            )
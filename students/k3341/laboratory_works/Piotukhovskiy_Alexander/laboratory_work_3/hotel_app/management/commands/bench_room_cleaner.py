@@ -0,0 +1,82 @@
+import random
+from collections import Counter
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from hotel_app.management.commands._bench import measure, rolled_back, seed_hotel, seed_staff
+from hotel_app.models import CleaningSchedule, Client, Reservation
+from hotel_app.views import ClientRoomCleaningView
+
+DAYS = ['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY']
+# Нумерация __week_day в Django: 1 - воскресенье, 2 - понедельник.
+LEGACY_DAY_NUMBERS = {day: (index + 1) % 7 + 1 for index, day in enumerate(DAYS)}
+
+
+def legacy_cleaners(client_id, day_of_week):
+    # Как было в GET /clients/room-cleaner: день недели вычисляется для каждой строки,
+    # уборщик и сотрудник загружаются отдельными запросами для каждой уборки.
+    client = Client.objects.get(id=client_id)
+    room = Reservation.objects.filter(client=client).latest('departure_date').room
+    schedules = CleaningSchedule.objects.filter(room=room, cleaning_date__week_day=LEGACY_DAY_NUMBERS[day_of_week])
+    return [schedule.cleaner.employee for schedule in schedules]
+
+
+class Command(BaseCommand):
+    help = "Сравнить поиск уборщиков номера клиента по дню недели: вычисление дня недели по дате против " \
+           "хранимого дня недели в индексе. Выводит число запросов и время ответа."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=500)
+        parser.add_argument('--schedules', type=int, default=1000000)
+        parser.add_argument('--clients', type=int, default=20, help="Сколько клиентов проверить.")
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.stdout.write("Генерация данных...")
+            admin, _, rooms, _ = seed_hotel(
+                rooms=options['rooms'], clients=10000, reservations=50000, first_day=date(2023, 1, 1), days=365,
+                stdout=self.stdout
+            )
+            seed_staff(rooms, employees=100, schedules=options['schedules'], first_day=date(2023, 1, 1), days=365)
+
+            rnd = random.Random(7)
+            client_ids = list(Reservation.objects.values_list('client_id', flat=True).distinct())
+            cases = [(client_id, rnd.choice(DAYS)) for client_id in rnd.sample(client_ids, options['clients'])]
+            self.stdout.write(f"{CleaningSchedule.objects.count()} уборок, {len(cases)} запросов")
+
+            view = ClientRoomCleaningView.as_view()
+            factory = APIRequestFactory()
+
+            def current(client_id, day_of_week):
+                request = factory.get('/clients/room-cleaner', {'client_id': client_id, 'day_of_week': day_of_week})
+                force_authenticate(request, user=admin)
+                response = view(request)
+                if response.status_code != 200:
+                    raise CommandError(f"Код ответа {response.status_code}: {response.data}")
+                return [employee['id'] for employee in response.data['employees']]
+
+            for client_id, day_of_week in cases:
+                expected = Counter(employee.id for employee in legacy_cleaners(client_id, day_of_week))
+                if Counter(current(client_id, day_of_week)) != expected:
+                    raise CommandError(f"Результаты для клиента {client_id} ({day_of_week}) не совпадают.")
+
+            self.timed("Вычисление дня недели", cases, lambda case: legacy_cleaners(*case), options['repeat'])
+            self.timed("Хранимый день недели", cases, lambda case: current(*case), options['repeat'])
+
+    def timed(self, label, cases, func, repeat):
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            # Журнал CaptureQueriesContext ограничен 9000 запросами, старому способу этого мало.
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            _, _, avg_ms = measure(lambda: [func(case) for case in cases], repeat)
+        per_request = avg_ms / len(cases)
+        query_count = len(queries) / (len(cases) * repeat)
+        self.stdout.write(f"{label:<25} {per_request:8.2f} мс на запрос, {query_count:6.1f} запросов к БД")
@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.db.models import Count, Q
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel_app.management.commands._bench import measure, rolled_back, seed_hotel
+from hotel_app.models import Client, Reservation
+from hotel_app.stays import find_overlapping_clients
+
+
+def legacy_overlapping_clients(target_client):
+    # Прежняя реализация ClientStayOverlapView: одно условие OR на каждое бронирование клиента.
+    overlapping_filter = Q()
+    for reservation in Reservation.objects.filter(client=target_client):
+        overlapping_filter |= Q(arrival_date__lt=reservation.departure_date) & Q(
+            departure_date__gt=reservation.arrival_date)
+
+    if not overlapping_filter:
+        return Client.objects.none()
+
+    overlapping_reservations = Reservation.objects.filter(overlapping_filter).exclude(client=target_client)
+    overlapping_clients_ids = overlapping_reservations.values_list('client_id', flat=True).distinct()
+    return Client.objects.filter(id__in=overlapping_clients_ids)
+
+
+class Command(BaseCommand):
+    help = "Сравнить поиск пересекающихся проживаний: цепочка OR и объединённые интервалы по индексу."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=10000)
+        parser.add_argument('--reservations', type=int, default=1000000)
+        parser.add_argument('--frequent-stays', type=int, default=300,
+                            help="Количество бронирований у частого гостя.")
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.stdout.write("Генерация данных...")
+            _, _, rooms, clients = seed_hotel(
+                clients=options['clients'], reservations=options['reservations'], stdout=self.stdout
+            )
+
+            guest = clients[0]
+            first_stay = Reservation.objects.filter(client=guest).order_by('arrival_date').first()
+            Reservation.objects.bulk_create([
+                Reservation(
+                    room=rooms[index % len(rooms)], client=guest, admin_id=first_stay.admin_id,
+                    arrival_date=first_stay.arrival_date + timedelta(days=2 * index),
+                    departure_date=first_stay.arrival_date + timedelta(days=2 * index + 3),
+                    price_at_booking=0, final_price=0,
+                )
+                for index in range(options['frequent_stays'])
+            ])
+
+            targets = [guest] + list(
+                Client.objects.annotate(stays=Count('reservation')).filter(stays__gt=0).order_by('stays')[:1]
+            )
+            for target in targets:
+                stays = Reservation.objects.filter(client=target).count()
+                legacy_ids, legacy_best, _ = measure(
+                    lambda: set(legacy_overlapping_clients(target).values_list('id', flat=True)), options['repeat'])
+                new_ids, new_best, _ = measure(
+                    lambda: set(find_overlapping_clients(target).values_list('id', flat=True)), options['repeat'])
+
+                if legacy_ids != new_ids:
+                    raise CommandError(f"Результаты для клиента {target.id} не совпадают.")
+
+                self.stdout.write(
+                    f"Клиент {target.id} ({stays} бронирований): OR {legacy_best:9.1f} мс, "
+                    f"интервалы {new_best:9.1f} мс, найдено клиентов {len(new_ids)}"
+                )
@@ -0,0 +1,65 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from hotel_app.management.commands._bench import rolled_back, seed_hotel, seed_staff
+from hotel_app.views import ClientViewSet, RoomViewSet, ReservationViewSet, EmployeeViewSet, \
+    EmploymentContractViewSet, EmployeePositionsViewSet, CleaningScheduleViewSet, RoomsByStatusView
+
+LIST_ENDPOINTS = [
+    ('/api/clients/', ClientViewSet.as_view({'get': 'list'})),
+    ('/api/rooms/', RoomViewSet.as_view({'get': 'list'})),
+    ('/api/reservations/', ReservationViewSet.as_view({'get': 'list'})),
+    ('/api/employees/', EmployeeViewSet.as_view({'get': 'list'})),
+    ('/api/employment-contracts/', EmploymentContractViewSet.as_view({'get': 'list'})),
+    ('/api/positions/', EmployeePositionsViewSet.as_view({'get': 'list'})),
+    ('/api/cleaning-schedules/', CleaningScheduleViewSet.as_view({'get': 'list'})),
+    ('/rooms', RoomsByStatusView.as_view()),
+]
+
+
+class Command(BaseCommand):
+    help = "Проверить, что количество SQL-запросов в списочных эндпоинтах не зависит от количества строк."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=10, help="Во сколько раз увеличить данные во втором замере.")
+
+    def count_queries(self, user):
+        factory = APIRequestFactory()
+        counts = {}
+        for path, view in LIST_ENDPOINTS:
+            request = factory.get(path)
+            force_authenticate(request, user=user)
+            with CaptureQueriesContext(connection) as context:
+                response = view(request)
+                response.render()
+            if response.status_code != 200:
+                raise CommandError(f"{path}: код ответа {response.status_code}")
+            counts[path] = len(context)
+        return counts
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        with rolled_back():
+            user = User.objects.create(username='query-check', is_staff=True)
+
+            admin, _, rooms, _ = seed_hotel(rooms=20, clients=20, reservations=50, seed=1)
+            seed_staff(rooms, employees=10, schedules=50, seed=1)
+            small = self.count_queries(user)
+
+            seed_hotel(rooms=20 * scale, clients=20 * scale, reservations=50 * scale, seed=2)
+            seed_staff(rooms, employees=10 * scale, schedules=50 * scale, seed=2)
+            large = self.count_queries(user)
+
+        failed = []
+        for path, _ in LIST_ENDPOINTS:
+            marker = 'ok' if small[path] == large[path] else 'РАСТЁТ'
+            self.stdout.write(f"{path:<28} {small[path]:>4} -> {large[path]:>4} запросов  {marker}")
+            if small[path] != large[path]:
+                failed.append(path)
+
+        if failed:
+            raise CommandError(f"Количество запросов зависит от объёма данных: {', '.join(failed)}")
+        self.stdout.write(self.style.SUCCESS("Количество запросов постоянно для всех эндпоинтов."))
@@ -0,0 +1,157 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from hotel_app.management.commands._bench import rolled_back, seed_hotel, seed_staff
+from hotel_app.models import CleaningSchedule, EmploymentContract, Reservation
+from hotel_app.views import ClientsListView, ClientRoomCleaningView, RoomsByStatusView, RoomViewSet, \
+    EmployeeViewSet, EmployeeManagementView, ReservationManagementView, CleaningScheduleGenerateView
+
+FIRST_DAY = date(2023, 1, 1)
+
+# Индексы и ограничения миграции 0008 и одиночные индексы внешних ключей, которые они заменили.
+NEW_INDEXES = [
+    (Reservation, 'reservation_room_status_idx'),
+    (CleaningSchedule, 'cleaning_room_date_idx'),
+    (EmploymentContract, 'one_active_contract_per_employee'),
+]
+PREVIOUS_INDEXES = [
+    (Reservation, models.Index(fields=['room'], name='explain_reservation_room_idx')),
+    (Reservation, models.Index(fields=['client'], name='explain_reservation_client_idx')),
+    (CleaningSchedule, models.Index(fields=['room'], name='explain_cleaning_room_idx')),
+]
+
+
+class Command(BaseCommand):
+    help = "Показать планы запросов (EXPLAIN) и время ответа эндпоинтов, которые используют индексы " \
+           "бронирований, уборок и контрактов, с прежним набором индексов и с текущим. Данные и изменения " \
+           "схемы выполняются в откатываемой транзакции."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=500)
+        parser.add_argument('--reservations', type=int, default=300000)
+        parser.add_argument('--schedules', type=int, default=200000)
+        parser.add_argument('--employees', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.stdout.write("Генерация данных...")
+            admin, _, rooms, clients = seed_hotel(
+                rooms=options['rooms'], clients=options['reservations'] // 10, reservations=options['reservations'],
+                first_day=FIRST_DAY, days=365, stdout=self.stdout
+            )
+            _, employees, contracts = seed_staff(
+                rooms, employees=options['employees'], schedules=options['schedules'], first_day=FIRST_DAY, days=365
+            )
+            admin.is_staff = True
+            admin.save()
+
+            endpoints = self.endpoints(rooms, clients, employees, contracts)
+            current = self.profile(endpoints, admin, options['repeat'])
+            self.swap_indexes()
+            previous = self.profile(endpoints, admin, options['repeat'])
+
+        for title, *_ in endpoints:
+            self.report(title, previous[title], current[title])
+
+    def endpoints(self, rooms, clients, employees, contracts):
+        booked = Reservation.objects.filter(status='CONFIRMED').order_by('id').first()
+        guest = Reservation.objects.order_by('id').values_list('client_id', flat=True).first()
+        employee = employees[0]
+        return [
+            ("GET /rooms?status=OCCUPIED,REQUIRES_CLEANING", RoomsByStatusView.as_view(), 'get', '/rooms',
+             {'status': 'OCCUPIED,REQUIRES_CLEANING'}),
+            ("GET /api/rooms/", RoomViewSet.as_view({'get': 'list'}), 'get', '/api/rooms/', {}),
+            ("GET /clients?room=...", ClientsListView.as_view(), 'get', '/clients', {'room': rooms[0].number}),
+            ("GET /clients/room-cleaner", ClientRoomCleaningView.as_view(), 'get', '/clients/room-cleaner',
+             {'client_id': guest, 'day_of_week': 'MONDAY'}),
+            ("GET /api/employees/", EmployeeViewSet.as_view({'get': 'list'}), 'get', '/api/employees/', {}),
+            ("POST /employees/manage (уже нанят)", EmployeeManagementView.as_view(), 'post', '/employees/manage', {
+                'passport_number': employee.passport_number, 'first_name': employee.first_name,
+                'last_name': employee.last_name, 'position_id': contracts[0].position_id,
+                'contract_type': 'PERMANENT', 'start_date': FIRST_DAY.isoformat(),
+            }),
+            ("POST /reservation (номер занят)", ReservationManagementView.as_view(), 'post', '/reservation', {
+                'passport_number': 'X000000001', 'first_name': 'Иван', 'last_name': 'Иванов', 'city_from': 'Москва',
+                'room_number': booked.room.number, 'arrival_date': booked.arrival_date.isoformat(),
+                'departure_date': (booked.arrival_date + timedelta(days=1)).isoformat(),
+            }),
+            ("POST /cleaning-schedules/generate (dry_run)", CleaningScheduleGenerateView.as_view(), 'post',
+             '/cleaning-schedules/generate', {
+                 'floors': [rooms[0].floor], 'cleaner_ids': [employee.id for employee in employees[:5]],
+                 'start_date': FIRST_DAY.isoformat(), 'end_date': (FIRST_DAY + timedelta(days=30)).isoformat(),
+                 'dry_run': True,
+             }),
+        ]
+
+    def profile(self, endpoints, user, repeat):
+        factory = APIRequestFactory()
+        results = {}
+        for title, view, method, path, data in endpoints:
+            timings = []
+            for _ in range(repeat):
+                if method == 'get':
+                    request = factory.get(path, data)
+                else:
+                    request = factory.post(path, data, format='json')
+                force_authenticate(request, user=user)
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    response = view(request)
+                    if hasattr(response, 'render'):
+                        response.render()
+                    timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code >= 500:
+                    raise CommandError(f"{title}: код ответа {response.status_code}")
+
+            plans = [
+                self.explain(query['sql']) for query in context.captured_queries
+                if query['sql'].lstrip().upper().startswith('SELECT')
+            ]
+            results[title] = (min(timings), plans)
+        return results
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+            rows = cursor.fetchall()
+        if connection.vendor == 'sqlite':
+            # (id, parent, notused, detail): отступ по вложенности, как в консоли sqlite3.
+            return [row[3] for row in rows]
+        return [' '.join(str(value) for value in row) for row in rows]
+
+    def swap_indexes(self):
+        # DDL в SQLite и PostgreSQL транзакционный: после отката транзакции индексы вернутся.
+        editor = connection.schema_editor()
+        statements = []
+        for model, name in NEW_INDEXES:
+            # Частичный UniqueConstraint в SQLite и PostgreSQL - тоже индекс.
+            statements.append(editor.sql_delete_index % {
+                'table': editor.quote_name(model._meta.db_table), 'name': editor.quote_name(name),
+            })
+        for model, index in PREVIOUS_INDEXES:
+            statements.append(index.create_sql(model, editor))
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(str(statement))
+
+    def report(self, title, previous, current):
+        previous_time, previous_plans = previous
+        current_time, current_plans = current
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{title}: было {previous_time:.1f} мс, стало {current_time:.1f} мс"
+        ))
+        changed = False
+        for before, after in zip(previous_plans, current_plans):
+            if before == after:
+                continue
+            changed = True
+            self.stdout.write("  было:  " + "\n          ".join(before))
+            self.stdout.write("  стало: " + "\n          ".join(after))
+        if not changed:
+            self.stdout.write("  планы запросов не изменились")
@@ -0,0 +1,56 @@
+import json
+import os
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel_app.staff_import import IMPORT_BATCH_SIZE, hire_employees, read_staff_rows
+
+
+class Command(BaseCommand):
+    help = "Импортировать сотрудников и их контракты из файла CSV или NDJSON. " \
+           "Колонки совпадают с полями найма сотрудника: passport_number, first_name, last_name, middle_name, " \
+           "position_id, contract_type, start_date, end_date."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', dest='file_format', choices=['csv', 'ndjson'],
+                            help="Формат файла. По умолчанию определяется по расширению.")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        file_format = options['file_format']
+        if file_format is None:
+            extension = os.path.splitext(options['path'])[1].lower()
+            file_format = 'csv' if extension == '.csv' else 'ndjson' if extension in ('.ndjson', '.jsonl') else None
+        if file_format is None:
+            raise CommandError("Не удалось определить формат файла, укажите --format.")
+
+        batch_size = options['batch_size']
+        hired = failed = 0
+        try:
+            stream = open(options['path'], encoding='utf-8-sig', newline='')
+        except OSError as error:
+            raise CommandError(f"Не удалось открыть файл: {error}")
+
+        with stream:
+            rows = read_staff_rows(stream, file_format)
+            first_row = 1
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+
+                # Каждая пачка импортируется в своей транзакции: уже загруженные пачки не откатываются.
+                for result in hire_employees(batch, first_row=first_row, batch_size=batch_size):
+                    if result['ok']:
+                        hired += 1
+                    else:
+                        failed += 1
+                        self.stderr.write(
+                            f"Запись {result['row']} ({result['passport_number']}): "
+                            f"{json.dumps(result['errors'], ensure_ascii=False)}"
+                        )
+                first_row += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Принято сотрудников: {hired}, строк с ошибками: {failed}."))
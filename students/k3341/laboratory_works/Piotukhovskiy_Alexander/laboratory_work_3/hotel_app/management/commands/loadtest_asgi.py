@@ -0,0 +1,204 @@
+import asyncio
+import io
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from hotel_app.management.commands._bench import seed_hotel, seed_staff
+from hotel_app.models import Client, Employee, EmployeePosition, RoomType
+from hotel_app.reports import invalidate_all_reports
+
+FIRST_DAY = date(2023, 1, 1)
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[round(share * (len(values) - 1))] if values else 0.0
+
+
+class Command(BaseCommand):
+    help = "Нагрузочный тест представлений только для чтения: смешанный поток запросов через WSGI " \
+           "(синхронные представления, пул потоков) и через ASGI (async-представления /hotel/async/...). " \
+           "Выводит p50/p99 по видам запросов и число запросов в секунду. Созданные данные удаляются."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=32, help="Одновременных клиентов.")
+        parser.add_argument('--workers', type=int, default=4, help="Потоков WSGI-сервера.")
+        parser.add_argument('--report-share', type=float, default=0.05,
+                            help="Доля запросов квартального отчёта; отчёт каждый раз строится заново.")
+        parser.add_argument('--rooms', type=int, default=200)
+        parser.add_argument('--reservations', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        # Оба сервера работают в этом же процессе с настоящими обработчиками Django и всеми middleware,
+        # поэтому данные создаются в базе по-настоящему (а не в откатываемой транзакции) и удаляются в конце.
+        from hotel_drf_app.asgi import application as asgi_application
+        from hotel_drf_app.wsgi import application as wsgi_application
+
+        seed = random.randrange(100, 10000)
+        self.stdout.write("Генерация данных...")
+        admin, room_type, rooms, clients = seed_hotel(
+            rooms=options['rooms'], clients=options['reservations'] // 10, reservations=options['reservations'],
+            first_day=FIRST_DAY, days=365, seed=seed, stdout=self.stdout
+        )
+        positions, employees, _ = seed_staff(rooms, schedules=options['rooms'] * 30, first_day=FIRST_DAY, seed=seed)
+        try:
+            call_command('rebuild_room_day_facts', stdout=io.StringIO())
+            token = Token.objects.create(user=admin).key
+            plan = self.make_plan(options, clients)
+
+            # Под нагрузкой бюджеты запросов превышаются намеренно, а 404 - обычные ответы: не засоряем вывод.
+            loggers = [logging.getLogger(name) for name in ('hotel_drf_app.middleware', 'django.request')]
+            levels = [logger.level for logger in loggers]
+            for logger in loggers:
+                logger.setLevel(logging.ERROR)
+            try:
+                wsgi = self.run_wsgi(wsgi_application, plan, token, options)
+                asgi = asyncio.run(self.run_asgi(asgi_application, plan, token, options))
+            finally:
+                for logger, level in zip(loggers, levels):
+                    logger.setLevel(level)
+            self.report(wsgi, asgi, options)
+        finally:
+            RoomType.objects.filter(id=room_type.id).delete()
+            Client.objects.filter(id__in=[client.id for client in clients]).delete()
+            EmployeePosition.objects.filter(id__in=[position.id for position in positions]).delete()
+            Employee.objects.filter(id__in=[employee.id for employee in employees]).delete()
+            User.objects.filter(id=admin.id).delete()
+
+    def make_plan(self, options, clients):
+        rnd = random.Random(1)
+        cheap = [
+            ('clients', lambda: ('clients', {'city': rnd.choice(['Москва', 'Казань', 'Тула'])})),
+            ('rooms', lambda: ('rooms', {'status': 'OCCUPIED,REQUIRES_CLEANING'})),
+            ('stay-overlap', lambda: ('clients/stay-overlap', {'client_id': rnd.choice(clients).id})),
+            ('room-cleaner', lambda: ('clients/room-cleaner', {
+                'client_id': rnd.choice(clients).id, 'day_of_week': rnd.choice(['MONDAY', 'FRIDAY'])})),
+        ]
+        plan = []
+        for _ in range(options['requests']):
+            if rnd.random() < options['report_share']:
+                plan.append(('report', 'reports/quarterly', {'quarter': rnd.randint(1, 4), 'year': FIRST_DAY.year}))
+            else:
+                kind, make = rnd.choice(cheap)
+                plan.append((kind, *make()))
+        return plan
+
+    def run_wsgi(self, application, plan, token, options):
+        # Запросы обрабатывает пул из workers потоков с очередью FIFO, как настоящий WSGI-сервер.
+        # Время ожидания в очереди входит в задержку.
+        workers = ThreadPoolExecutor(options['workers'])
+        position = iter(range(len(plan)))
+        lock = threading.Lock()
+        latencies = []
+
+        def call(kind, path, params):
+            if kind == 'report':
+                invalidate_all_reports()
+            environ = {
+                'PATH_INFO': f'/hotel/{path}',
+                'QUERY_STRING': urlencode(params),
+                'HTTP_AUTHORIZATION': f'Token {token}',
+                'HTTP_ACCEPT': 'application/json',
+            }
+            setup_testing_defaults(environ)
+            status = []
+            body = b''.join(application(environ, lambda code, headers, exc_info=None: status.append(code)))
+            return int(status[0].split()[0]), body
+
+        def user():
+            while True:
+                with lock:
+                    index = next(position, None)
+                if index is None:
+                    return
+                kind, path, params = plan[index]
+                started = time.perf_counter()
+                status, _ = workers.submit(call, kind, path, params).result()
+                latencies.append((kind, status, time.perf_counter() - started))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['users']) as executor:
+            for future in [executor.submit(user) for _ in range(options['users'])]:
+                future.result()
+        workers.shutdown()
+        return latencies, time.perf_counter() - started
+
+    async def run_asgi(self, application, plan, token, options):
+        # Один цикл событий обслуживает всех клиентов, как один процесс ASGI-сервера.
+        position = iter(range(len(plan)))
+        latencies = []
+
+        async def call(path, params):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': f'/hotel/async/{path}', 'raw_path': f'/hotel/async/{path}'.encode(),
+                'query_string': urlencode(params).encode(), 'root_path': '',
+                'headers': [(b'host', b'127.0.0.1'), (b'authorization', f'Token {token}'.encode())],
+                'server': ('127.0.0.1', 80), 'client': ('127.0.0.1', 50000),
+            }
+            messages = []
+            requests = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+            disconnected = asyncio.Event()
+
+            async def receive():
+                # После тела запроса Django ждёт отключения клиента, пока формируется ответ.
+                if requests:
+                    return requests.pop()
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                messages.append(message)
+
+            await application(scope, receive, send)
+            return messages[0]['status'], b''.join(message.get('body', b'') for message in messages[1:])
+
+        async def user():
+            for index in position:
+                kind, path, params = plan[index]
+                started = time.perf_counter()
+                if kind == 'report':
+                    # Версии отчётов хранятся в базе, а из цикла событий к ней обращаются через sync_to_async.
+                    await sync_to_async(invalidate_all_reports)()
+                status, _ = await call(path, params)
+                latencies.append((kind, status, time.perf_counter() - started))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(options['users'])))
+        return latencies, time.perf_counter() - started
+
+    def report(self, wsgi, asgi, options):
+        # 404 - обычный ответ (например, у клиента нет бронирований), ошибкой считаются только ответы 5xx.
+        for name, (latencies, _) in (('WSGI', wsgi), ('ASGI', asgi)):
+            failed = [status for _, status, _ in latencies if status >= 500]
+            if failed:
+                raise CommandError(f"{name}: {len(failed)} запросов завершились ошибкой (например, {failed[0]}).")
+
+        self.stdout.write(
+            f"{options['requests']} запросов, {options['users']} клиентов, WSGI: {options['workers']} потоков, "
+            f"ASGI: один цикл событий"
+        )
+        self.stdout.write(f"{'запрос':<14}{'WSGI p50':>10}{'WSGI p99':>10}{'ASGI p50':>10}{'ASGI p99':>10}  мс")
+        kinds = sorted({kind for kind, _, _ in wsgi[0]})
+        for kind in kinds + [None]:
+            row = f"{kind or 'все':<14}"
+            for latencies, _ in (wsgi, asgi):
+                values = [elapsed * 1000 for request_kind, _, elapsed in latencies if kind in (None, request_kind)]
+                row += f"{percentile(values, 0.5):10.1f}{percentile(values, 0.99):10.1f}"
+            self.stdout.write(row)
+        self.stdout.write(
+            f"Запросов в секунду: WSGI {len(wsgi[0]) / wsgi[1]:.0f}, ASGI {len(asgi[0]) / asgi[1]:.0f}"
+        )
@@ -0,0 +1,132 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.db.models import Count, F, Max
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from hotel_app.availability import BLOCKING_STATUSES
+from hotel_app.management.commands._bench import seed_hotel
+from hotel_app.models import Client, Reservation, Room, RoomType
+from hotel_app.views import ReservationManagementView
+
+def find_overlaps(room_ids):
+    overlaps = []
+    last_departure = {}
+    reservations = (
+        Reservation.objects.filter(room_id__in=room_ids, status__in=BLOCKING_STATUSES)
+        .order_by('room_id', 'arrival_date')
+        .values_list('id', 'room_id', 'arrival_date', 'departure_date')
+    )
+    for reservation_id, room_id, arrival_date, departure_date in reservations:
+        previous = last_departure.get(room_id)
+        if previous is not None and previous[1] > arrival_date:
+            overlaps.append((previous[0], reservation_id))
+        if previous is None or departure_date > previous[1]:
+            last_departure[room_id] = (reservation_id, departure_date)
+    return overlaps
+
+
+class Command(BaseCommand):
+    help = "Нагрузочный тест бронирования: параллельные POST /reservation на одни и те же комнаты из нескольких " \
+           "потоков (через представление и сериализатор). Проверяет, что свободная комната достаётся одному " \
+           "бронированию и брони не пересекаются, и удаляет созданные данные."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=5)
+        parser.add_argument('--bookings', type=int, default=500)
+        parser.add_argument('--rounds', type=int, default=20,
+                            help="После каждого раунда комнаты снова освобождаются (как после выезда и уборки).")
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--days', type=int, default=60, help="Горизонт дат, на который распределяются брони.")
+
+    def handle(self, *args, **options):
+        # Потоки работают со своими соединениями, поэтому данные создаются в базе по-настоящему,
+        # а не в откатываемой транзакции, и удаляются в конце.
+        seed = random.randrange(100, 10000)
+        admin, room_type, rooms, clients = seed_hotel(
+            rooms=options['rooms'], clients=0, reservations=0, seed=seed
+        )
+        client_ids = []
+        try:
+            self.run(options, admin, rooms, client_ids)
+        finally:
+            Reservation.objects.filter(room__in=rooms).delete()
+            Room.objects.filter(id__in=[room.id for room in rooms]).delete()
+            Client.objects.filter(id__in=client_ids).delete()
+            RoomType.objects.filter(id=room_type.id).delete()
+            User.objects.filter(id=admin.id).delete()
+
+    def run(self, options, admin, rooms, client_ids):
+        first_day = date(2030, 1, 1)
+        view = ReservationManagementView.as_view()
+        outcomes = {'booked': 0, 'rejected': 0, 'locked': 0}
+        outcomes_lock = threading.Lock()
+        room_ids = [room.id for room in rooms]
+        passport_prefix = f'L{random.randrange(100):02d}'
+
+        def attempt(index):
+            rnd = random.Random(index)
+            arrival_date = first_day + timedelta(days=rnd.randrange(options['days']))
+            request = APIRequestFactory().post('/reservation', {
+                "passport_number": f'{passport_prefix}{index:07d}',
+                "first_name": f'Имя{index}',
+                "last_name": f'Фамилия{index}',
+                "city_from": 'Москва',
+                "room_number": rnd.choice(rooms).number,
+                "arrival_date": arrival_date.isoformat(),
+                "departure_date": (arrival_date + timedelta(days=rnd.randint(1, 7))).isoformat(),
+                "status": 'CONFIRMED',
+            }, format='json')
+            force_authenticate(request, user=admin)
+
+            try:
+                response = view(request)
+                outcome = 'booked' if response.status_code == 201 else 'rejected'
+            except OperationalError:
+                outcome = 'locked'
+            finally:
+                connections.close_all()
+
+            with outcomes_lock:
+                outcomes[outcome] += 1
+                if outcome == 'booked':
+                    client_ids.append(response.data['client_id'])
+
+        rounds = max(1, min(options['rounds'], options['bookings']))
+        double_booked = []
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            for number in range(rounds):
+                last_id = Reservation.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+                indexes = range(number * options['bookings'] // rounds, (number + 1) * options['bookings'] // rounds)
+                list(executor.map(attempt, indexes))
+
+                # Пока комната занята, сериализатор и lock_room пропускают только одно бронирование за раунд.
+                double_booked.extend(
+                    Reservation.objects.filter(room_id__in=room_ids, id__gt=last_id)
+                    .values('room_id').annotate(count=Count('id')).filter(count__gt=1)
+                    .values_list('room_id', flat=True)
+                )
+                Room.objects.filter(id__in=room_ids).update(status='AVAILABLE', version=F('version') + 1)
+        elapsed = time.perf_counter() - started
+
+        overlaps = find_overlaps(room_ids)
+        self.stdout.write(
+            f"Запросов: {options['bookings']} в {options['threads']} потоках, раундов: {rounds}, "
+            f"за {elapsed:.2f} с ({options['bookings'] / elapsed:.0f} в секунду)"
+        )
+        self.stdout.write(
+            f"Забронировано: {outcomes['booked']}, отклонено (комната занята или даты пересекаются): "
+            f"{outcomes['rejected']}, не дождались блокировки: {outcomes['locked']}"
+        )
+        if double_booked:
+            raise CommandError(f"Занятая комната забронирована повторно: {sorted(set(double_booked))[:10]}")
+        if overlaps:
+            raise CommandError(f"Найдены пересекающиеся бронирования: {overlaps[:10]}")
+        self.stdout.write(self.style.SUCCESS("Повторных бронирований занятых комнат и пересечений нет."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from hotel_app.client_search import SEARCH_BATCH_SIZE, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Пересобрать нормализованные поля поиска клиентов и таблицу слов (ClientSearchToken)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SEARCH_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        created = rebuild_search_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Создано слов: {created}."))
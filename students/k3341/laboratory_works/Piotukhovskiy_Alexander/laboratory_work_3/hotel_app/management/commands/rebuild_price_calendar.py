@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from hotel_app.models import RoomType
+from hotel_app.pricing import PRICE_CALENDAR_BATCH_SIZE, price_calendar_horizon, refresh_price_calendar
+
+
+class Command(BaseCommand):
+    help = "Построить календарь цен по ночам (RoomTypeNightlyPrice) до горизонта HOTEL_PRICE_CALENDAR_DAYS. " \
+           "Без --full достраиваются только ночи, на которые сдвинулся горизонт; запускайте раз в сутки."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Пересчитать календарь целиком.")
+        parser.add_argument('--batch-size', type=int, default=PRICE_CALENDAR_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        horizon = price_calendar_horizon()
+        failed = 0
+
+        for room_type in RoomType.objects.order_by('id'):
+            problems = refresh_price_calendar(
+                room_type.id, full=options['full'], horizon=horizon, batch_size=options['batch_size']
+            )
+            if problems:
+                failed += 1
+                self.stderr.write(f"{room_type.name}: {'; '.join(problems)}.")
+
+        message = f"Календарь цен построен до {horizon}."
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{message} Типов номеров с ошибками в истории цен: {failed}."))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
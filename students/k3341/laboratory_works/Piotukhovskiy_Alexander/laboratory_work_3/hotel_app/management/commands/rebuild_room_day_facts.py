@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from hotel_app.models import Reservation, RoomDayFact
+from hotel_app.reports import build_reservation_facts, invalidate_all_reports
+from hotel_app.table_versions import bump_table_versions
+
+
+class Command(BaseCommand):
+    help = "Пересобрать таблицу посуточной загрузки и дохода номеров (RoomDayFact) по всем бронированиям."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        created = 0
+
+        with transaction.atomic():
+            RoomDayFact.objects.all().delete()
+
+            facts = []
+            reservations = Reservation.objects.only(
+                'id', 'room_id', 'client_id', 'arrival_date', 'departure_date',
+                'status', 'payment_status', 'price_at_booking'
+            ).iterator(chunk_size=batch_size)
+            for reservation in reservations:
+                facts.extend(build_reservation_facts(reservation))
+                if len(facts) >= batch_size:
+                    RoomDayFact.objects.bulk_create(facts, batch_size=batch_size)
+                    created += len(facts)
+                    facts = []
+            RoomDayFact.objects.bulk_create(facts, batch_size=batch_size)
+            created += len(facts)
+            bump_table_versions(RoomDayFact)
+
+        invalidate_all_reports()
+        self.stdout.write(self.style.SUCCESS(f"Создано записей: {created}."))
@@ -0,0 +1,99 @@
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from hotel_app.jobs import claim_jobs, purge_finished_jobs, run_job, worker_name
+
+PURGE_INTERVAL = 60 * 60
+
+
+def ignore_stop_signals():
+    # Процессы пула останавливает родитель: он перестаёт брать задачи и дожидается запущенных.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+class Command(BaseCommand):
+    help = "Выполнять фоновые задачи из очереди Job (отчёты, массовый найм, составление расписания уборок). " \
+           "Задачи выполняются параллельно в пуле потоков или процессов; брокер сообщений не нужен."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help="Сколько задач выполнять одновременно.")
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread',
+                            help="Пул потоков (по умолчанию) или процессов. Процессы не делят GIL, "
+                                 "но доступны только там, где есть fork.")
+        parser.add_argument('--poll-interval', type=float, default=getattr(settings, 'HOTEL_JOB_POLL_INTERVAL', 1.0),
+                            help="Как часто в секундах проверять очередь.")
+        parser.add_argument('--burst', action='store_true', help="Выполнить задачи из очереди и завершиться.")
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        poll_interval = options['poll_interval']
+        if concurrency < 1:
+            raise CommandError("--concurrency должно быть не меньше 1.")
+
+        fork = options['pool'] == 'process'
+        if fork:
+            if 'fork' not in multiprocessing.get_all_start_methods():
+                raise CommandError("Пул процессов требует fork, используйте --pool thread.")
+            # Дочерние процессы получают уже настроенный Django. Соединения с базой не должны переходить
+            # в дочерний процесс, поэтому перед каждым запуском задачи они закрываются.
+            executor = ProcessPoolExecutor(max_workers=concurrency, mp_context=multiprocessing.get_context('fork'),
+                                           initializer=ignore_stop_signals)
+        else:
+            executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='hotel-job')
+
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+
+        worker = worker_name()
+        self.stdout.write(f"Обработчик {worker}: {options['pool']} x {concurrency}.")
+        running = {}
+        purged_at = 0
+        try:
+            while not stop.is_set():
+                if time.monotonic() - purged_at > PURGE_INTERVAL:
+                    purged = purge_finished_jobs()
+                    if purged:
+                        self.stdout.write(f"Удалено завершённых задач: {purged}.")
+                    purged_at = time.monotonic()
+
+                free = concurrency - len(running)
+                claimed = claim_jobs(worker, free) if free else []
+                if fork and claimed:
+                    connections.close_all()
+                for job_id, token in claimed:
+                    running[executor.submit(run_job, job_id, token)] = job_id
+                    self.stdout.write(f"Задача {job_id} запущена.")
+
+                if not running:
+                    if options['burst']:
+                        break
+                    stop.wait(poll_interval)
+                    continue
+
+                done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.report(running.pop(future), future)
+        finally:
+            if running:
+                self.stdout.write(f"Ожидание запущенных задач: {len(running)}.")
+            for future in wait(running).done:
+                self.report(running.pop(future), future)
+            executor.shutdown()
+
+    def report(self, job_id, future):
+        try:
+            status = future.result()
+        except Exception as error:
+            # Например, процесс пула был убит: задача вернётся в очередь, когда истечёт её аренда.
+            self.stderr.write(f"Задача {job_id}: обработчик завершился аварийно ({error}).")
+            return
+        self.stdout.write(f"Задача {job_id}: {status}.")
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 09:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['arrival_date', 'departure_date'], name='reservation_stay_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['client', 'departure_date'], name='reservation_client_stay_idx'),
+        ),
+    ]
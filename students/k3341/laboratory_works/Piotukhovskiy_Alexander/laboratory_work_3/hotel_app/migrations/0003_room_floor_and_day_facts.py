@@ -0,0 +1,45 @@
+# Generated by Django 5.1.3 on 2026-10-18 09:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_room_floors(apps, schema_editor):
+    Room = apps.get_model('hotel_app', 'Room')
+    rooms = list(Room.objects.all())
+    for room in rooms:
+        room.floor = room.number // 100
+    Room.objects.bulk_update(rooms, ['floor'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0002_reservation_stay_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='floor',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Этаж'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_room_floors, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='RoomDayFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('occupied', models.BooleanField(verbose_name='Номер занят')),
+                ('revenue', models.PositiveIntegerField(default=0, verbose_name='Доля дохода за сутки')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_facts', to='hotel_app.client', verbose_name='Клиент')),
+                ('reservation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_facts', to='hotel_app.reservation', verbose_name='Бронирование')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_facts', to='hotel_app.room', verbose_name='Комната')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'room'], name='room_day_fact_date_room_idx')],
+                'constraints': [models.UniqueConstraint(fields=('reservation', 'date'), name='room_day_fact_reservation_date_uniq')],
+            },
+        ),
+    ]
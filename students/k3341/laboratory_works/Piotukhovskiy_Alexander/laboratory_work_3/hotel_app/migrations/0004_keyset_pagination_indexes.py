@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 09:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0003_room_floor_and_day_facts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cleaningschedule',
+            index=models.Index(fields=['cleaning_date', 'id'], name='cleaning_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['arrival_date', 'id'], name='reservation_arrival_id_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.3 on 2026-10-18 10:02
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normalize(value):
+    return ' '.join(re.findall(r'\w+', (value or '').casefold().replace('ё', 'е')))
+
+
+def fill_client_search(apps, schema_editor):
+    Client = apps.get_model('hotel_app', 'Client')
+    ClientSearchToken = apps.get_model('hotel_app', 'ClientSearchToken')
+
+    clients = list(Client.objects.all())
+    tokens = []
+    for client in clients:
+        client.search_name = normalize(f'{client.last_name} {client.first_name} {client.middle_name or ""}')
+        client.search_city = normalize(client.city_from)
+        for field, value in ((1, client.last_name), (2, client.first_name), (3, client.middle_name),
+                             (4, client.city_from), (5, client.passport_number)):
+            for token in dict.fromkeys(normalize(value).split()):
+                tokens.append(ClientSearchToken(client_id=client.id, field=field, token=token))
+    Client.objects.bulk_update(clients, ['search_name', 'search_city'], batch_size=500)
+    ClientSearchToken.objects.bulk_create(tokens, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0005_room_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='search_city',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=50, verbose_name='Город для поиска'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=152, verbose_name='ФИО для поиска'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='ClientSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.PositiveSmallIntegerField(choices=[(1, 'Фамилия'), (2, 'Имя'), (3, 'Отчество'), (4, 'Город'), (5, 'Номер паспорта')], verbose_name='Поле')),
+                ('token', models.CharField(max_length=50, verbose_name='Слово')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='hotel_app.client', verbose_name='Клиент')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'field', 'client'], name='client_search_token_idx')],
+            },
+        ),
+        migrations.RunPython(fill_client_search, migrations.RunPython.noop),
+    ]
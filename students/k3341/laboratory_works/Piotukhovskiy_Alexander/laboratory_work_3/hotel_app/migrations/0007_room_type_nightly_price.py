@@ -0,0 +1,36 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0006_client_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roomtype',
+            name='price_calendar_end',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Конец календаря цен'),
+        ),
+        migrations.AddField(
+            model_name='roomtype',
+            name='price_calendar_start',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Начало календаря цен'),
+        ),
+        migrations.CreateModel(
+            name='RoomTypeNightlyPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('price', models.PositiveIntegerField(verbose_name='Стоимость за сутки')),
+                ('room_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nightly_prices', to='hotel_app.roomtype', verbose_name='Тип номера')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('room_type', 'date'), name='nightly_price_room_type_date_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def deactivate_duplicate_contracts(apps, schema_editor):
+    # До появления ограничения у сотрудника могло остаться несколько активных контрактов.
+    # Активным остаётся самый поздний, остальные считаются расторгнутыми в день его начала.
+    EmploymentContract = apps.get_model('hotel_app', 'EmploymentContract')
+    latest = {}
+    duplicates = []
+    for contract in EmploymentContract.objects.filter(is_active=True).order_by('employee_id', '-start_date', '-id'):
+        if contract.employee_id in latest:
+            contract.is_active = False
+            contract.termination_date = contract.termination_date or latest[contract.employee_id].start_date
+            duplicates.append(contract)
+        else:
+            latest[contract.employee_id] = contract
+    EmploymentContract.objects.bulk_update(duplicates, ['is_active', 'termination_date'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0007_room_type_nightly_price'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['room', 'status', 'arrival_date'], name='reservation_room_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cleaningschedule',
+            index=models.Index(fields=['room', 'cleaning_date'], name='cleaning_room_date_idx'),
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='room',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='hotel_app.room', verbose_name='Комната'),
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='client',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='hotel_app.client', verbose_name='Клиент'),
+        ),
+        migrations.AlterField(
+            model_name='cleaningschedule',
+            name='room',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='hotel_app.room', verbose_name='Комната'),
+        ),
+        migrations.RunPython(deactivate_duplicate_contracts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='employmentcontract',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('employee',), name='one_active_contract_per_employee'),
+        ),
+    ]
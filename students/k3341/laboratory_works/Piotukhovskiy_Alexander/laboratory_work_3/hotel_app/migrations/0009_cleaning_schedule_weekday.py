@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+def fill_cleaning_weekdays(apps, schema_editor):
+    CleaningSchedule = apps.get_model('hotel_app', 'CleaningSchedule')
+    # Один UPDATE на день недели вместо загрузки всех уборок в память.
+    for weekday in range(1, 8):
+        CleaningSchedule.objects.filter(cleaning_date__iso_week_day=weekday).update(weekday=weekday)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0008_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cleaningschedule',
+            name='weekday',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='День недели'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_cleaning_weekdays, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='cleaningschedule',
+            index=models.Index(fields=['room', 'weekday', 'cleaning_date', 'cleaner'], name='cleaning_room_weekday_idx'),
+        ),
+    ]
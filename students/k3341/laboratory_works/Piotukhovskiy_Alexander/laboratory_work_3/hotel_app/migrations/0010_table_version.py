@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-18 15:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+VERSIONED_TABLES = [
+    'hotel_app.client', 'hotel_app.room', 'hotel_app.roomtype', 'hotel_app.reservation', 'hotel_app.roomdayfact',
+    'hotel_app.employee', 'hotel_app.employmentcontract', 'hotel_app.employeeposition', 'hotel_app.cleaningschedule',
+]
+
+
+def create_table_versions(apps, schema_editor):
+    TableVersion = apps.get_model('hotel_app', 'TableVersion')
+    TableVersion.objects.bulk_create([TableVersion(table=table) for table in VERSIONED_TABLES], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0009_cleaning_schedule_weekday'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('table', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Таблица')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Версия')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Последнее изменение')),
+            ],
+        ),
+        migrations.RunPython(create_table_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.3 on 2026-10-18 15:20
+
+from datetime import timedelta
+
+from django.db import migrations
+
+from hotel_app.pricing import price_calendar_horizon, price_period_problems
+
+
+def fill_nightly_prices(apps, schema_editor):
+    # Календарь цен строится для типов номеров, у которых его ещё нет: после 0007 он пуст, и каждая стоимость
+    # считалась бы по периодам истории цен, пока не запущен rebuild_price_calendar.
+    # Типы с пересекающимися периодами или пропусками остаются без календаря; их показывает
+    # python manage.py check --database default.
+    RoomType = apps.get_model('hotel_app', 'RoomType')
+    RoomPriceHistory = apps.get_model('hotel_app', 'RoomPriceHistory')
+    RoomTypeNightlyPrice = apps.get_model('hotel_app', 'RoomTypeNightlyPrice')
+
+    horizon = price_calendar_horizon()
+    for room_type in RoomType.objects.filter(price_calendar_start__isnull=True).order_by('id'):
+        periods = list(
+            RoomPriceHistory.objects.filter(room_type_id=room_type.id)
+            .order_by('start_date', 'id')
+            .values_list('start_date', 'end_date', 'price')
+        )
+        if not periods or price_period_problems(periods):
+            continue
+
+        calendar_start = periods[0][0]
+        calendar_end = horizon if periods[-1][1] is None else min(periods[-1][1], horizon)
+        if calendar_end < calendar_start:
+            continue
+
+        nightly = []
+        for period_start, period_end, price in periods:
+            last_night = calendar_end if period_end is None else min(period_end, calendar_end)
+            nightly.extend(
+                RoomTypeNightlyPrice(room_type_id=room_type.id, date=period_start + timedelta(days=night), price=price)
+                for night in range((last_night - period_start).days + 1)
+            )
+        RoomTypeNightlyPrice.objects.filter(room_type_id=room_type.id).delete()
+        RoomTypeNightlyPrice.objects.bulk_create(nightly, batch_size=2000)
+        RoomType.objects.filter(id=room_type.id).update(
+            price_calendar_start=calendar_start, price_calendar_end=calendar_end
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0011_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_nightly_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.3 on 2026-10-18 16:05
+
+from datetime import timedelta
+
+from django.db import migrations
+
+OCCUPYING_STATUSES = ['BOOKED', 'CONFIRMED', 'CHECKED_IN', 'CHECKED_OUT']
+PAID_STATUSES = ['PREPAID', 'PAID']
+
+
+def fill_room_day_facts(apps, schema_editor):
+    # 0003 создала таблицу фактов пустой, а отчёты строятся только по ней: без заполнения они показывали бы нули,
+    # пока не запущен rebuild_room_day_facts. Факты создаются только для бронирований, у которых их ещё нет,
+    # поэтому базы, где команда уже запускалась, не меняются. Расчёт тот же, что в reports.build_reservation_facts.
+    Reservation = apps.get_model('hotel_app', 'Reservation')
+    RoomDayFact = apps.get_model('hotel_app', 'RoomDayFact')
+
+    facts = []
+    reservations = Reservation.objects.filter(day_facts__isnull=True).only(
+        'id', 'room_id', 'client_id', 'arrival_date', 'departure_date', 'status', 'payment_status', 'price_at_booking'
+    )
+    for reservation in reservations.iterator(chunk_size=2000):
+        nights = (reservation.departure_date - reservation.arrival_date).days
+        if nights <= 0:
+            continue
+        revenue = reservation.price_at_booking if reservation.payment_status in PAID_STATUSES else 0
+        share, remainder = divmod(revenue, nights)
+        facts.extend(
+            RoomDayFact(
+                reservation_id=reservation.id,
+                room_id=reservation.room_id,
+                client_id=reservation.client_id,
+                date=reservation.arrival_date + timedelta(days=night),
+                occupied=reservation.status in OCCUPYING_STATUSES,
+                revenue=share + (1 if night < remainder else 0),
+            )
+            for night in range(nights)
+        )
+        if len(facts) >= 2000:
+            RoomDayFact.objects.bulk_create(facts, batch_size=2000)
+            facts = []
+    RoomDayFact.objects.bulk_create(facts, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0012_fill_room_type_nightly_price'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_room_day_facts, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,12 @@
+import re
+
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from django.db import models
+from rest_framework.utils.encoders import JSONEncoder
 
 
 class RoomType(models.Model):
@@ -22,6 +25,10 @@ class RoomType(models.Model):
     has_bathrobe_slippers = models.BooleanField(default=False, verbose_name='Халат и тапочки')
     has_balcony = models.BooleanField(default=False, verbose_name='Балкон')
 
+    # Ночи, для которых построен календарь цен RoomTypeNightlyPrice (обе даты включительно).
+    price_calendar_start = models.DateField(null=True, blank=True, editable=False, verbose_name='Начало календаря цен')
+    price_calendar_end = models.DateField(null=True, blank=True, editable=False, verbose_name='Конец календаря цен')
+
 
 class RoomPriceHistory(models.Model):
     room_type = models.ForeignKey(RoomType, on_delete=models.CASCADE, verbose_name='Тип номера')
@@ -30,6 +37,17 @@ class RoomPriceHistory(models.Model):
     price = models.PositiveIntegerField(verbose_name='Стоимость за сутки')
 
 
+class RoomTypeNightlyPrice(models.Model):
+    room_type = models.ForeignKey(RoomType, on_delete=models.CASCADE, related_name='nightly_prices', verbose_name='Тип номера')
+    date = models.DateField(verbose_name='Дата')
+    price = models.PositiveIntegerField(verbose_name='Стоимость за сутки')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room_type', 'date'], name='nightly_price_room_type_date_uniq'),
+        ]
+
+
 class Room(models.Model):
     STATUS_CHOICES = [
         ('AVAILABLE', 'Свободен'),
@@ -43,6 +61,32 @@ class Room(models.Model):
     type = models.ForeignKey(RoomType, on_delete=models.CASCADE, verbose_name='Тип комнаты')
     status = models.CharField(max_length=len(max(STATUS_CHOICES, key=lambda x: len(x[0]))[0]), choices=STATUS_CHOICES, default='AVAILABLE', verbose_name='Статус комнаты')
     phone = models.CharField(max_length=11, verbose_name='Телефон в номере')
+    floor = models.PositiveIntegerField(db_index=True, editable=False, verbose_name='Этаж')
+    version = models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия')
+
+    @staticmethod
+    def floor_for_number(number):
+        return number // 100
+
+    def save(self, *args, **kwargs):
+        self.floor = self.floor_for_number(self.number)
+        if self._state.adding:
+            self.version = 1
+            super().save(*args, **kwargs)
+            return
+
+        # Версия увеличивается самим UPDATE, а не в памяти: экземпляр, прочитанный до чужого изменения комнаты,
+        # не запишет версию меньше текущей, и book_room заметит изменение. Новая версия перечитывается из базы.
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'floor', 'version'}
+        version, self.version = self.version, models.F('version') + 1
+        try:
+            super().save(*args, **kwargs)
+        except Exception:
+            self.version = version
+            raise
+        self.refresh_from_db(fields=['version'])
 
 
 class Client(models.Model):
@@ -51,6 +95,46 @@ class Client(models.Model):
     last_name = models.CharField(max_length=50, verbose_name="Фамилия")
     middle_name = models.CharField(max_length=50, blank=True, null=True, verbose_name="Отчество")
     city_from = models.CharField(max_length=50, verbose_name='Город')
+    search_name = models.CharField(max_length=152, db_index=True, editable=False, verbose_name='ФИО для поиска')
+    search_city = models.CharField(max_length=50, db_index=True, editable=False, verbose_name='Город для поиска')
+
+    @staticmethod
+    def normalize_search_text(value):
+        # Регистр, буква "ё" и знаки препинания не влияют на поиск: "Санкт-Петербург" -> "санкт петербург".
+        return ' '.join(re.findall(r'\w+', (value or '').casefold().replace('ё', 'е')))
+
+    def fill_search_fields(self):
+        self.search_name = self.normalize_search_text(f'{self.last_name} {self.first_name} {self.middle_name or ""}')
+        self.search_city = self.normalize_search_text(self.city_from)
+
+    def save(self, *args, **kwargs):
+        self.fill_search_fields()
+        super().save(*args, **kwargs)
+
+
+class ClientSearchToken(models.Model):
+    LAST_NAME = 1
+    FIRST_NAME = 2
+    MIDDLE_NAME = 3
+    CITY = 4
+    PASSPORT = 5
+    FIELD_CHOICES = [
+        (LAST_NAME, 'Фамилия'),
+        (FIRST_NAME, 'Имя'),
+        (MIDDLE_NAME, 'Отчество'),
+        (CITY, 'Город'),
+        (PASSPORT, 'Номер паспорта'),
+    ]
+
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='search_tokens', verbose_name='Клиент')
+    field = models.PositiveSmallIntegerField(choices=FIELD_CHOICES, verbose_name='Поле')
+    token = models.CharField(max_length=50, verbose_name='Слово')
+
+    class Meta:
+        indexes = [
+            # Поиск по началу слова - диапазон по token; field и client берутся из индекса без чтения таблицы.
+            models.Index(fields=['token', 'field', 'client'], name='client_search_token_idx'),
+        ]
 
 
 class Reservation(models.Model):
@@ -68,8 +152,9 @@ class Reservation(models.Model):
         ('REFUNDED', 'Возврат')
     ]
 
-    room = models.ForeignKey(Room, on_delete=models.CASCADE, verbose_name='Комната')
-    client = models.ForeignKey(Client, on_delete=models.CASCADE, verbose_name='Клиент')
+    # Отдельные индексы по room и client не нужны: их заменяют составные индексы ниже, начинающиеся с этих полей.
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, db_index=False, verbose_name='Комната')
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, db_index=False, verbose_name='Клиент')
     admin = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Администратор', related_name="reservations_created")
     booking_date = models.DateField(default=timezone.now, verbose_name='Дата бронирования')
     updated_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, verbose_name="Обновивший администратор", related_name="reservations_updated")
@@ -82,6 +167,33 @@ class Reservation(models.Model):
     price_at_booking = models.PositiveIntegerField(verbose_name='Стоимость при бронировании')
     final_price = models.PositiveIntegerField(verbose_name='Стоимость при бронировании')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['arrival_date', 'departure_date'], name='reservation_stay_idx'),
+            models.Index(fields=['client', 'departure_date'], name='reservation_client_stay_idx'),
+            models.Index(fields=['arrival_date', 'id'], name='reservation_arrival_id_idx'),
+            # Бронирования комнаты в блокирующих статусах: проверка пересечений при бронировании,
+            # текущий клиент комнаты (последнее по arrival_date), обновление индекса свободных номеров.
+            models.Index(fields=['room', 'status', 'arrival_date'], name='reservation_room_status_idx'),
+        ]
+
+
+class RoomDayFact(models.Model):
+    reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE, related_name='day_facts', verbose_name='Бронирование')
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='day_facts', verbose_name='Комната')
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='day_facts', verbose_name='Клиент')
+    date = models.DateField(verbose_name='Дата')
+    occupied = models.BooleanField(verbose_name='Номер занят')
+    revenue = models.PositiveIntegerField(default=0, verbose_name='Доля дохода за сутки')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['reservation', 'date'], name='room_day_fact_reservation_date_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'room'], name='room_day_fact_date_room_idx'),
+        ]
+
 
 class EmployeePosition(models.Model):
     name = models.CharField(max_length=50, unique=True, verbose_name='Название должности')
@@ -103,6 +215,12 @@ class EmploymentContract(models.Model):
     termination_date = models.DateField(null=True, blank=True, verbose_name='Дата расторжения')
     is_active = models.BooleanField(default=True, verbose_name='Активный контракт')
 
+    class Meta:
+        constraints = [
+            # Частичный уникальный индекс: он же ищет активный контракт сотрудника.
+            models.UniqueConstraint(fields=['employee'], condition=models.Q(is_active=True),
+                                    name='one_active_contract_per_employee'),
+        ]
 
     def terminate_contract(self, termination_date=None):
         if termination_date is None:
@@ -129,6 +247,69 @@ class CleaningSchedule(models.Model):
     ]
 
     cleaner = models.ForeignKey(EmploymentContract, on_delete=models.CASCADE, verbose_name='Сотрудник')
-    room = models.ForeignKey(Room, on_delete=models.CASCADE, verbose_name='Комната')
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, db_index=False, verbose_name='Комната')
     cleaning_date = models.DateField(verbose_name='Дата уборки')
+    # День недели даты уборки (1 - понедельник, 7 - воскресенье). Хранится, чтобы поиск по дню недели шёл по индексу.
+    weekday = models.PositiveSmallIntegerField(editable=False, verbose_name='День недели')
     status = models.CharField(max_length=len(max(STATUS_CHOICES, key=lambda x: len(x[0]))[0]), choices=STATUS_CHOICES, default='PENDING', verbose_name='Статус уборки')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['cleaning_date', 'id'], name='cleaning_date_id_idx'),
+            # Уборки комнаты за период и последняя уборка комнаты (сортировка по дате).
+            models.Index(fields=['room', 'cleaning_date'], name='cleaning_room_date_idx'),
+            # Уборщики комнаты в день недели: cleaner в индексе, чтобы не читать строки таблицы.
+            models.Index(fields=['room', 'weekday', 'cleaning_date', 'cleaner'], name='cleaning_room_weekday_idx'),
+        ]
+
+    @staticmethod
+    def weekday_for_date(cleaning_date):
+        return cleaning_date.isoweekday()
+
+    def save(self, *args, **kwargs):
+        self.weekday = self.weekday_for_date(self.cleaning_date)
+        super().save(*args, **kwargs)
+
+
+class TableVersion(models.Model):
+    # Счётчик изменений таблицы: по нему строятся ETag и Last-Modified ответов, которые читают эту таблицу.
+    table = models.CharField(max_length=100, primary_key=True, verbose_name='Таблица')
+    version = models.PositiveBigIntegerField(default=0, verbose_name='Версия')
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name='Последнее изменение')
+
+
+class Job(models.Model):
+    # Фоновая задача для run_hotel_worker. Очередь хранится в базе, брокер не нужен.
+    STATUS_CHOICES = [
+        ('PENDING', 'В очереди'),
+        ('RUNNING', 'Выполняется'),
+        ('SUCCEEDED', 'Выполнена'),
+        ('FAILED', 'Ошибка'),
+    ]
+
+    kind = models.CharField(max_length=50, verbose_name='Тип задачи')
+    payload = models.JSONField(default=dict, verbose_name='Параметры')
+    status = models.CharField(max_length=len(max(STATUS_CHOICES, key=lambda x: len(x[0]))[0]), choices=STATUS_CHOICES, default='PENDING', verbose_name='Статус')
+    # Задачи с большим приоритетом берутся раньше, при равном приоритете - в порядке создания.
+    priority = models.SmallIntegerField(default=0, verbose_name='Приоритет')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name='Максимум попыток')
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name='Выполнено, %')
+    progress_message = models.CharField(max_length=255, blank=True, default='', verbose_name='Этап')
+    result = models.JSONField(null=True, blank=True, encoder=JSONEncoder, verbose_name='Результат')
+    error = models.TextField(null=True, blank=True, verbose_name='Ошибка')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name='Автор')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Создана')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='Не раньше')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Начата')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Завершена')
+    # Какой обработчик взял задачу и до какого времени. Если обработчик пропал, задача возвращается в очередь.
+    locked_by = models.CharField(max_length=100, null=True, blank=True, verbose_name='Обработчик')
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name='Занята до')
+
+    class Meta:
+        indexes = [
+            # Выбор следующей задачи: статус, приоритет по убыванию, порядок создания.
+            models.Index(fields=['status', '-priority', 'id'], name='job_queue_idx'),
+            models.Index(fields=['status', 'locked_until'], name='job_lease_idx'),
+        ]
@@ -0,0 +1,158 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    # Постраничная выдача по ключу: следующая страница начинается строго после последней записи
+    # предыдущей, поэтому глубокие страницы стоят столько же, сколько первая.
+    # Включается только если в запросе есть cursor или page_size, иначе список отдаётся целиком, как раньше.
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering_query_param = 'ordering'
+    count_query_param = 'with_count'
+    page_size = 100
+    max_page_size = 1000
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def is_requested(self, request):
+        return self.cursor_query_param in request.query_params or self.page_size_query_param in request.query_params
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_ordering(self, request, view):
+        # Последним полем всегда идёт id, чтобы порядок был строгим даже при совпадающих значениях.
+        allowed_fields = getattr(view, 'keyset_ordering_fields', ())
+        ordering = request.query_params.get(self.ordering_query_param, getattr(view, 'keyset_ordering', 'id'))
+        field = ordering.lstrip('-')
+        if field != 'id' and field not in allowed_fields:
+            ordering, field = 'id', 'id'
+
+        prefix = '-' if ordering.startswith('-') else ''
+        if field == 'id':
+            return (f'{prefix}id',)
+        return (f'{prefix}{field}', f'{prefix}id')
+
+    def encode_cursor(self, values, reverse):
+        payload = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        cursor = urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            values, reverse = payload['v'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def position_filter(self, values, reverse):
+        # Лексикографическое сравнение (a, id) > (x, y) в виде a > x OR (a = x AND id > y).
+        terms = []
+        for index, ordering in enumerate(self.ordering):
+            field = ordering.lstrip('-')
+            descending = ordering.startswith('-') != reverse
+            equal = {self.ordering[i].lstrip('-'): values[i] for i in range(index)}
+            terms.append(Q(**equal, **{f'{field}__{"lt" if descending else "gt"}': values[index]}))
+        return reduce(or_, terms)
+
+    def position_of(self, instance):
+        values = []
+        for ordering in self.ordering:
+            # Строки values() (быстрый путь списков) - словари, остальные страницы - экземпляры моделей.
+            field = ordering.lstrip('-')
+            value = instance[field] if isinstance(instance, dict) else getattr(instance, field)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return values
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.count_query_param)
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, view)
+        values, reverse = self.decode_cursor(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = queryset.count()
+
+        if reverse:
+            queryset = queryset.order_by(*(
+                ordering[1:] if ordering.startswith('-') else f'-{ordering}' for ordering in self.ordering
+            ))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if values is not None:
+            try:
+                queryset = queryset.filter(self.position_filter(values, reverse))
+            except (TypeError, ValueError, DjangoValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        has_following = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_following
+        else:
+            self.has_next, self.has_previous = has_following, values is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.position_of(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.position_of(self.page[0]), reverse=True)
+
+    def get_paginated_response(self, data):
+        payload = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer', 'description': 'Только при with_count=true'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {'name': self.cursor_query_param, 'required': False, 'in': 'query', 'schema': {'type': 'string'}},
+            {'name': self.page_size_query_param, 'required': False, 'in': 'query', 'schema': {'type': 'integer'}},
+            {'name': self.ordering_query_param, 'required': False, 'in': 'query', 'schema': {'type': 'string'}},
+            {'name': self.count_query_param, 'required': False, 'in': 'query', 'schema': {'type': 'boolean'}},
+        ]
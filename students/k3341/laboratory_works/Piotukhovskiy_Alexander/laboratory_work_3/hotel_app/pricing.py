@@ -0,0 +1,227 @@
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .models import RoomPriceHistory, RoomType, RoomTypeNightlyPrice
+
+PRICE_CALENDAR_BATCH_SIZE = 2000
+
+
+class PriceCalendarError(Exception):
+    pass
+
+
+def price_period_issues(periods):
+    # periods отсортированы по дате начала. Каждая ночь от начала первого периода должна быть покрыта
+    # ровно одним периодом: пересечения и пропуски означают ошибку в истории цен, а не цену 0 или "первый период".
+    # Возвращает (описание, первая ночь, последняя ночь или None - без конца) для каждой ошибки.
+    issues = []
+    covered_start = covered_until = None
+    for start_date, end_date, price in periods:
+        if end_date is not None and end_date < start_date:
+            issues.append((f"период цены с {start_date} заканчивается раньше, чем начинается", end_date, start_date))
+            continue
+
+        if covered_start is not None:
+            if covered_until is None or start_date <= covered_until:
+                overlap_end = end_date if covered_until is None else covered_until
+                if end_date is not None and overlap_end is not None:
+                    overlap_end = min(end_date, overlap_end)
+                issues.append(
+                    (f"период цены с {start_date} пересекается с периодом с {covered_start}", start_date, overlap_end)
+                )
+            elif start_date > covered_until + timedelta(days=1):
+                gap_start, gap_end = covered_until + timedelta(days=1), start_date - timedelta(days=1)
+                issues.append((f"нет цены с {gap_start} по {gap_end}", gap_start, gap_end))
+
+        # Дальше сравниваем с периодом, который заканчивается позже всех: вложенный период - тоже пересечение.
+        if covered_start is None or (covered_until is not None and (end_date is None or end_date > covered_until)):
+            covered_start, covered_until = start_date, end_date
+    return issues
+
+
+def price_period_problems(periods):
+    return [problem for problem, _, _ in price_period_issues(periods)]
+
+
+def price_calendar_error(problems):
+    return PriceCalendarError("История цен типа номера содержит ошибки: " + "; ".join(problems) + ".")
+
+
+class RoomPriceCalendar:
+    def __init__(self, periods):
+        # periods: (start_date, end_date, price), отсортированные так же, как в истории цен.
+        # Для каждой ночи действует первый по порядку период, поэтому каждый следующий период
+        # забирает себе только ночи, которые не покрыты предыдущими.
+        periods = list(periods)
+        self.issues = price_period_issues(periods)
+        self.starts = []
+        self.ends = []
+        self.prices = []
+        self.cumulative = [0]
+
+        covered_until = None
+        open_ended = False
+        for start_date, end_date, price in periods:
+            if open_ended:
+                break
+
+            segment_start = start_date
+            if covered_until is not None and covered_until > segment_start:
+                segment_start = covered_until
+
+            segment_end = end_date + timedelta(days=1) if end_date is not None else None
+            if segment_end is not None and segment_end <= segment_start:
+                continue
+
+            self.starts.append(segment_start)
+            self.ends.append(segment_end)
+            self.prices.append(price)
+            if segment_end is not None:
+                self.cumulative.append(self.cumulative[-1] + (segment_end - segment_start).days * price)
+                covered_until = segment_end
+            else:
+                open_ended = True
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        return cls(queryset.order_by('start_date', 'id').values_list('start_date', 'end_date', 'price'))
+
+    @classmethod
+    def for_room_type(cls, room_type_id):
+        return cls.from_queryset(RoomPriceHistory.objects.filter(room_type_id=room_type_id))
+
+    def cost_before(self, day):
+        # Стоимость всех ночей строго раньше day.
+        index = bisect_right(self.starts, day) - 1
+        if index < 0:
+            return 0
+
+        segment_end = self.ends[index]
+        if segment_end is not None and segment_end <= day:
+            return self.cumulative[index + 1]
+
+        return self.cumulative[index] + (day - self.starts[index]).days * self.prices[index]
+
+    def total(self, arrival_date, departure_date):
+        if departure_date <= arrival_date:
+            return 0
+        # Отклоняется только проживание, которое задевает ночи с ошибкой в истории цен: остальные ночи
+        # покрыты ровно одним периодом, и их стоимость считается верно.
+        problems = [
+            problem for problem, first_night, last_night in self.issues
+            if first_night < departure_date and (last_night is None or last_night >= arrival_date)
+        ]
+        if problems:
+            raise price_calendar_error(problems)
+        return self.cost_before(departure_date) - self.cost_before(arrival_date)
+
+
+def load_price_calendars(room_type_ids):
+    periods = defaultdict(list)
+    rows = (
+        RoomPriceHistory.objects.filter(room_type_id__in=set(room_type_ids))
+        .order_by('room_type_id', 'start_date', 'id')
+        .values_list('room_type_id', 'start_date', 'end_date', 'price')
+    )
+    for room_type_id, start_date, end_date, price in rows:
+        periods[room_type_id].append((start_date, end_date, price))
+
+    return {room_type_id: RoomPriceCalendar(periods[room_type_id]) for room_type_id in set(room_type_ids)}
+
+
+def room_type_total(room_type_id, arrival_date, departure_date):
+    # Стоимость проживания - одна сумма по индексу (room_type, date) календаря цен. Если какой-то ночи
+    # в календаре нет (она за горизонтом или календарь ещё не построен), считаем по периодам истории цен.
+    nights = (departure_date - arrival_date).days
+    if nights <= 0:
+        return 0
+
+    totals = RoomTypeNightlyPrice.objects.filter(
+        room_type_id=room_type_id,
+        date__gte=arrival_date,
+        date__lt=departure_date,
+    ).aggregate(total=Sum('price'), nights=Count('id'))
+    if totals['nights'] == nights:
+        return totals['total']
+
+    return RoomPriceCalendar.for_room_type(room_type_id).total(arrival_date, departure_date)
+
+
+def price_calendar_horizon(today=None):
+    return (today or date.today()) + timedelta(days=settings.HOTEL_PRICE_CALENDAR_DAYS)
+
+
+def nightly_prices(room_type_id, periods, start_date, end_date):
+    for period_start, period_end, price in periods:
+        first_night = max(period_start, start_date)
+        last_night = end_date if period_end is None else min(period_end, end_date)
+        for night in range((last_night - first_night).days + 1):
+            yield RoomTypeNightlyPrice(room_type_id=room_type_id, date=first_night + timedelta(days=night), price=price)
+
+
+def refresh_price_calendar(room_type_id, start_date=None, end_date=None, full=False, horizon=None,
+                           batch_size=PRICE_CALENDAR_BATCH_SIZE):
+    # Пересчитывает ночи с start_date по end_date (end_date=None - до конца календаря) и ночи, на которые
+    # календарь расширился (от начала истории цен до горизонта); full=True - весь календарь.
+    # Возвращает список ошибок в истории цен. При ошибках календарь типа очищается,
+    # и расчёт стоимости отклоняется, пока история не исправлена.
+    horizon = horizon or price_calendar_horizon()
+    periods = list(
+        RoomPriceHistory.objects.filter(room_type_id=room_type_id)
+        .order_by('start_date', 'id')
+        .values_list('start_date', 'end_date', 'price')
+    )
+    problems = price_period_problems(periods)
+
+    calendar_start = calendar_end = None
+    if periods and not problems:
+        calendar_start = periods[0][0]
+        last_end = periods[-1][1]
+        calendar_end = horizon if last_end is None else min(last_end, horizon)
+        if calendar_end < calendar_start:
+            calendar_start = calendar_end = None
+
+    with transaction.atomic():
+        room_type = RoomType.objects.select_for_update().only(
+            'price_calendar_start', 'price_calendar_end'
+        ).filter(id=room_type_id).first()
+        if room_type is None:
+            # Тип номера удаляется вместе с историей цен.
+            return problems
+        nightly = RoomTypeNightlyPrice.objects.filter(room_type_id=room_type_id)
+
+        if calendar_start is None:
+            nightly.delete()
+        else:
+            nightly.exclude(date__gte=calendar_start, date__lte=calendar_end).delete()
+
+            previous_start, previous_end = room_type.price_calendar_start, room_type.price_calendar_end
+            if full or previous_start is None:
+                ranges = [(calendar_start, calendar_end)]
+            else:
+                ranges = [
+                    (calendar_start, previous_start - timedelta(days=1)),
+                    (previous_end + timedelta(days=1), calendar_end),
+                ]
+                if start_date is not None:
+                    ranges.append((start_date, end_date or calendar_end))
+
+            for range_start, range_end in ranges:
+                range_start, range_end = max(range_start, calendar_start), min(range_end, calendar_end)
+                if range_start > range_end:
+                    continue
+                nightly.filter(date__gte=range_start, date__lte=range_end).delete()
+                RoomTypeNightlyPrice.objects.bulk_create(
+                    nightly_prices(room_type_id, periods, range_start, range_end), batch_size=batch_size
+                )
+
+        RoomType.objects.filter(id=room_type_id).update(
+            price_calendar_start=calendar_start,
+            price_calendar_end=calendar_end,
+        )
+    return problems
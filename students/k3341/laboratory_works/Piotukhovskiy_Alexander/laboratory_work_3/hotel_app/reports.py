@@ -0,0 +1,181 @@
+import calendar
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from hotel_drf_app.middleware import metrics
+from .models import Room, RoomDayFact, TableVersion
+from .table_versions import bump_table_versions, increment_versions
+
+OCCUPYING_STATUSES = ['BOOKED', 'CONFIRMED', 'CHECKED_IN', 'CHECKED_OUT']
+PAID_STATUSES = ['PREPAID', 'PAID']
+
+
+def build_reservation_facts(reservation):
+    nights = (reservation.departure_date - reservation.arrival_date).days
+    if nights <= 0:
+        return []
+
+    # Доход распределяется по ночам поровну, остаток от деления приходится на первые ночи,
+    # чтобы сумма по фактам совпадала со стоимостью бронирования.
+    revenue = reservation.price_at_booking if reservation.payment_status in PAID_STATUSES else 0
+    share, remainder = divmod(revenue, nights)
+    occupied = reservation.status in OCCUPYING_STATUSES
+
+    return [
+        RoomDayFact(
+            reservation_id=reservation.id,
+            room_id=reservation.room_id,
+            client_id=reservation.client_id,
+            date=reservation.arrival_date + timedelta(days=night),
+            occupied=occupied,
+            revenue=share + (1 if night < remainder else 0),
+        )
+        for night in range(nights)
+    ]
+
+
+def sync_reservation_facts(reservations, batch_size=2000):
+    reservations = list(reservations)
+    if not reservations:
+        return
+
+    RoomDayFact.objects.filter(reservation_id__in=[reservation.id for reservation in reservations]).delete()
+
+    facts = []
+    for reservation in reservations:
+        facts.extend(build_reservation_facts(reservation))
+        if len(facts) >= batch_size:
+            RoomDayFact.objects.bulk_create(facts, batch_size=batch_size)
+            facts = []
+    RoomDayFact.objects.bulk_create(facts, batch_size=batch_size)
+    bump_table_versions(RoomDayFact)
+
+
+def refresh_reservation_reports(reservations, previous_stays=()):
+    # Сигналы post_save вызывают это для одного бронирования; массовые изменения через bulk_update
+    # сигналы обходят, поэтому должны вызывать это явно.
+    reservations = list(reservations)
+    sync_reservation_facts(reservations)
+
+    stays = [(reservation.arrival_date, reservation.departure_date) for reservation in reservations]
+    stays.extend(previous_stays)
+    transaction.on_commit(lambda: invalidate_reports_for_stays(stays))
+
+
+def quarter_date_range(quarter, year):
+    start_month = (quarter - 1) * 3 + 1
+    end_month = start_month + 2
+
+    start_date = date(year, start_month, 1)
+    last_day = calendar.monthrange(year, end_month)[1]
+    end_date = date(year, end_month, last_day)
+
+    return start_date, end_date
+
+
+def build_occupancy_report(start_date, end_date):
+    facts = RoomDayFact.objects.filter(date__gte=start_date, date__lte=end_date)
+
+    # Число клиентов за период в каждом номере
+    clients_per_room = (
+        facts.filter(occupied=True)
+        .values('room__number')
+        .annotate(client_count=Count('reservation', distinct=True))
+        .order_by('room__number')
+    )
+
+    # Количество номеров на каждом этаже
+    rooms_per_floor = (
+        Room.objects.values('floor')
+        .annotate(room_count=Count('id'))
+        .order_by('floor')
+    )
+
+    # Общая сумма дохода за каждый номер
+    income_per_room = list(
+        facts.filter(revenue__gt=0)
+        .values('room__number')
+        .annotate(total_income=Sum('revenue'))
+        .order_by('room__number')
+    )
+
+    return {
+        "clients_per_room": list(clients_per_room),
+        "rooms_per_floor": list(rooms_per_floor),
+        "income_per_room": income_per_room,
+        "total_income": sum(row['total_income'] for row in income_per_room),
+        "start_date": start_date,
+        "end_date": end_date
+    }
+
+
+metrics.describe('hotel_report_cache_hits_total', 'Количество отчётов, отданных из кэша.')
+metrics.describe('hotel_report_cache_misses_total', 'Количество отчётов, построенных заново.')
+
+REPORT_CACHE_PREFIX = 'hotel-report'
+
+
+def get_report_cache():
+    return caches[getattr(settings, 'HOTEL_REPORT_CACHE', 'default')]
+
+
+# Версии отчётов хранятся в таблице TableVersion, а не в кэше: кэш в памяти у каждого процесса сервера свой,
+# и инвалидация, сделанная одним процессом, не дошла бы до остальных.
+def _period_version_key(kind, year, period):
+    return f'report:{kind}:{year}:{period}'
+
+
+def _global_version_key():
+    return 'report:all'
+
+
+def cached_report(kind, year, period, start_date, end_date):
+    # Ключ отчёта включает версии: общую (меняется при изменении комнат) и версию периода
+    # (меняется при изменении бронирований, пересекающих период). Старые ключи просто перестают читаться.
+    cache = get_report_cache()
+    global_key = _global_version_key()
+    period_key = _period_version_key(kind, year, period)
+    versions = dict(TableVersion.objects.filter(table__in=[global_key, period_key]).values_list('table', 'version'))
+    report_key = (
+        f'{REPORT_CACHE_PREFIX}:{kind}:{year}:{period}:'
+        f'{versions.get(global_key, 0)}:{versions.get(period_key, 0)}'
+    )
+
+    report = cache.get(report_key)
+    if report is not None:
+        metrics.inc('hotel_report_cache_hits_total', report=kind)
+        return report
+
+    metrics.inc('hotel_report_cache_misses_total', report=kind)
+    report = build_occupancy_report(start_date, end_date)
+    cache.set(report_key, report, getattr(settings, 'HOTEL_REPORT_CACHE_TIMEOUT', 24 * 60 * 60))
+    return report
+
+
+def report_periods_for_stay(arrival_date, departure_date):
+    last_night = max(departure_date - timedelta(days=1), arrival_date)
+
+    periods = set()
+    year, month = arrival_date.year, arrival_date.month
+    while (year, month) <= (last_night.year, last_night.month):
+        periods.add(('monthly', year, month))
+        periods.add(('quarterly', year, (month - 1) // 3 + 1))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
+
+def invalidate_reports_for_stays(stays):
+    periods = set()
+    for arrival_date, departure_date in stays:
+        periods |= report_periods_for_stay(arrival_date, departure_date)
+
+    if periods:
+        increment_versions(_period_version_key(kind, year, period) for kind, year, period in periods)
+
+
+def invalidate_all_reports():
+    increment_versions([_global_version_key()])
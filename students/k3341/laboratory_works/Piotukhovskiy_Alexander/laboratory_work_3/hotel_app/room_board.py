@@ -0,0 +1,248 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+
+from .models import Room
+
+ROOM_BOARD_FIELDS = ('id', 'number', 'floor', 'type_id', 'status')
+
+
+class RoomStatusBoard:
+    # Брокер событий в памяти процесса: хранит текущее состояние комнат и кольцевой буфер последних изменений.
+    # Подписчик получает снимок, а затем только изменения после своего последнего события.
+    # Идентификатор события - "<поколение>:<номер>"; поколение меняется при перезапуске процесса,
+    # поэтому клиент со старым идентификатором получает новый снимок, а не чужие изменения.
+    def __init__(self, history=None, resync=None):
+        self.history = history
+        self.resync = resync
+        self.generation = uuid.uuid4().hex[:8]
+        self._condition = threading.Condition()
+        self._async_waiters = set()
+        self._synced_at = None
+        self.rooms = {}
+        self.events = deque()
+        self.sequence = 0
+
+    def get_history(self):
+        if self.history is not None:
+            return self.history
+        return getattr(settings, 'HOTEL_ROOM_BOARD_HISTORY', 1000)
+
+    def get_resync(self):
+        if self.resync is not None:
+            return self.resync
+        return getattr(settings, 'HOTEL_ROOM_BOARD_RESYNC', 60)
+
+    def event_id(self, sequence=None):
+        return f'{self.generation}:{self.sequence if sequence is None else sequence}'
+
+    def _parse_event_id(self, event_id):
+        generation, _, sequence = (event_id or '').partition(':')
+        if generation != self.generation or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def _read_rooms(self, room_ids=None):
+        rooms = Room.objects.order_by('number')
+        if room_ids is not None:
+            rooms = rooms.filter(id__in=room_ids)
+        return {row['id']: row for row in rooms.values(*ROOM_BOARD_FIELDS)}
+
+    def _apply(self, rooms, room_ids):
+        changes = []
+        for room_id in room_ids:
+            current = rooms.get(room_id)
+            if current == self.rooms.get(room_id):
+                continue
+            if current is None:
+                del self.rooms[room_id]
+                changes.append({'id': room_id, 'deleted': True})
+            else:
+                self.rooms[room_id] = current
+                changes.append(current)
+        if changes:
+            self._publish(changes)
+
+    def _publish(self, changes):
+        self.sequence += 1
+        self.events.append((self.sequence, changes))
+        while len(self.events) > self.get_history():
+            self.events.popleft()
+        self._condition.notify_all()
+        for loop, event in self._async_waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def sync(self):
+        # Полная сверка с базой подхватывает изменения из других процессов и сделанные в обход сигналов.
+        # База читается под блокировкой, чтобы более старое чтение не перезаписало более новое.
+        with self._condition:
+            rooms = self._read_rooms()
+            if self._synced_at is None:
+                self.rooms = rooms
+            else:
+                self._apply(rooms, set(rooms) | set(self.rooms))
+            self._synced_at = time.monotonic()
+
+    def ensure_fresh(self):
+        with self._condition:
+            fresh = self._synced_at is not None and time.monotonic() - self._synced_at <= self.get_resync()
+        if not fresh:
+            self.sync()
+
+    def refresh_rooms(self, room_ids):
+        # Пока доску никто не открыл, состояние не хранится и изменения не отслеживаются.
+        room_ids = {room_id for room_id in room_ids if room_id is not None}
+        if self._synced_at is None or not room_ids:
+            return
+        with self._condition:
+            self._apply(self._read_rooms(room_ids), room_ids)
+
+    def snapshot(self):
+        self.ensure_fresh()
+        with self._condition:
+            return self.event_id(), sorted(self.rooms.values(), key=lambda room: room['number'])
+
+    def events_after(self, event_id):
+        # None означает, что изменения после event_id восстановить нельзя и клиенту нужен новый снимок.
+        sequence = self._parse_event_id(event_id)
+        with self._condition:
+            if sequence is None or sequence > self.sequence:
+                return None
+            oldest = self.events[0][0] if self.events else self.sequence + 1
+            if sequence < oldest - 1:
+                return None
+            return [(self.event_id(number), changes) for number, changes in self.events if number > sequence]
+
+    def wait(self, event_id, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: self.event_id() != event_id, timeout)
+
+    async def wait_async(self, event_id, timeout):
+        # Асинхронные подписчики ждут в цикле событий, не занимая поток.
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._condition:
+            if self.event_id() != event_id:
+                return
+            self._async_waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._condition:
+                self._async_waiters.discard(waiter)
+
+
+def sse_frame(event, event_id, data):
+    return f'event: {event}\nid: {event_id}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+def sse_heartbeat():
+    return ': ping\n\n'
+
+
+class RoomBoardStream:
+    # Поток Server-Sent Events: снимок (или пропущенные изменения при переподключении с Last-Event-ID),
+    # затем изменения по мере появления и комментарии-пинги, чтобы прокси не закрывали соединение.
+    # Через lifetime секунд поток завершается: браузерный EventSource переподключится с Last-Event-ID.
+    def __init__(self, board, last_event_id=None, heartbeat=15, lifetime=300, retry_ms=3000):
+        self.board = board
+        self.heartbeat = heartbeat
+        self.lifetime = lifetime
+        self.retry_ms = retry_ms
+        self.opening = self._opening_frames(last_event_id)
+
+    def _opening_frames(self, last_event_id):
+        frames = [f'retry: {self.retry_ms}\n\n']
+        events = self.board.events_after(last_event_id) if last_event_id else None
+        if events is None:
+            event_id, rooms = self.board.snapshot()
+            frames.append(sse_frame('snapshot', event_id, {'rooms': rooms}))
+            self.last_event_id = event_id
+        else:
+            frames.extend(self._change_frames(events))
+            self.last_event_id = events[-1][0] if events else last_event_id
+        return frames
+
+    def _change_frames(self, events):
+        return [sse_frame('rooms', event_id, {'rooms': changes}) for event_id, changes in events]
+
+    def _next_frames(self):
+        events = self.board.events_after(self.last_event_id)
+        if events is None:
+            # Подписчик отстал больше, чем хранит буфер: отправляем новый снимок.
+            event_id, rooms = self.board.snapshot()
+            self.last_event_id = event_id
+            return [sse_frame('snapshot', event_id, {'rooms': rooms})]
+        if not events:
+            return [sse_heartbeat()]
+        self.last_event_id = events[-1][0]
+        return self._change_frames(events)
+
+    def __iter__(self):
+        yield from self.opening
+        deadline = time.monotonic() + self.lifetime
+        while (remaining := deadline - time.monotonic()) > 0:
+            self.board.wait(self.last_event_id, min(self.heartbeat, remaining))
+            self.board.ensure_fresh()
+            yield from self._next_frames()
+
+    async def __aiter__(self):
+        # Для ASGI: ожидание событий не занимает поток, в отдельном потоке выполняется только сверка с базой.
+        from asgiref.sync import sync_to_async
+
+        for frame in self.opening:
+            yield frame
+        deadline = time.monotonic() + self.lifetime
+        while (remaining := deadline - time.monotonic()) > 0:
+            await self.board.wait_async(self.last_event_id, min(self.heartbeat, remaining))
+            await sync_to_async(self.board.ensure_fresh)()
+            for frame in await sync_to_async(self._next_frames)():
+                yield frame
+
+
+
+class SyncStreamSlots:
+    # Без ASGI каждый подписчик занимает поток сервера на всё время жизни потока (HOTEL_ROOM_BOARD_STREAM_LIFETIME),
+    # поэтому число одновременных синхронных потоков в процессе ограничено HOTEL_ROOM_BOARD_SYNC_STREAMS.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.active = 0
+
+    def acquire(self):
+        with self._lock:
+            if self.active >= settings.HOTEL_ROOM_BOARD_SYNC_STREAMS:
+                return False
+            self.active += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+
+
+class SlotStream:
+    # Возвращает место, когда сервер закрывает ответ: после конца потока, обрыва соединения
+    # или если поток так и не начали читать.
+    def __init__(self, stream, slots):
+        self.frames = iter(stream)
+        self.slots = slots
+        self.released = False
+
+    def __iter__(self):
+        return self.frames
+
+    def close(self):
+        if not self.released:
+            self.released = True
+            self.frames.close()
+            self.slots.release()
+
+
+room_board = RoomStatusBoard()
+sync_stream_slots = SyncStreamSlots()
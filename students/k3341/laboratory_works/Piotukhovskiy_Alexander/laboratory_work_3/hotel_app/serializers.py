@@ -1,9 +1,14 @@
-from datetime import datetime
+import calendar
+from datetime import date, datetime
 
 from rest_framework import serializers
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from django.contrib.auth.models import User
-from .models import Client, Room, Employee, EmploymentContract, EmployeePosition, Reservation, CleaningSchedule
+from django.db.models import OuterRef, Prefetch, Subquery
+from .models import Client, Room, Employee, EmploymentContract, EmployeePosition, Reservation, CleaningSchedule, Job
+from .cleaning import active_contracts_for
+from .transitions import RESERVATION_TRANSITIONS
+from .values_serializers import values_reader
 
 
 class CustomUserSerializer(UserSerializer):
@@ -36,20 +41,50 @@ class RoomSerializer(serializers.ModelSerializer):
         model = Room
         fields = ['id', 'number', 'type_id', 'type_name', 'phone', 'status', 'current_client', 'last_cleaner']
 
+    @staticmethod
+    def current_reservations_queryset():
+        return Reservation.objects.filter(
+            status__in=['CONFIRMED', 'CHECKED_IN']
+        ).select_related('client').order_by('-arrival_date', '-id')
+
+    @staticmethod
+    def last_cleanings_queryset():
+        latest_cleaning_id = CleaningSchedule.objects.filter(
+            room=OuterRef('room')
+        ).order_by('-cleaning_date', '-id').values('id')[:1]
+
+        return CleaningSchedule.objects.filter(
+            id=Subquery(latest_cleaning_id)
+        ).select_related('cleaner__employee')
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, prefix=''):
+        # Текущий клиент и последний уборщик для всех комнат загружаются двумя запросами,
+        # независимо от количества комнат. prefix позволяет подключить загрузку через связь (например, 'room__').
+        return queryset.select_related(f'{prefix}type').prefetch_related(
+            Prefetch(f'{prefix}reservation_set', queryset=cls.current_reservations_queryset(),
+                     to_attr='current_reservations'),
+            Prefetch(f'{prefix}cleaningschedule_set', queryset=cls.last_cleanings_queryset(),
+                     to_attr='last_cleanings'),
+        )
+
     def get_current_client(self, obj):
         if obj.status == 'AVAILABLE':
             return None
 
-        reservation = Reservation.objects.filter(
-            room=obj,
-            status__in=['CONFIRMED', 'CHECKED_IN']
-        ).order_by('-arrival_date').first()
+        if hasattr(obj, 'current_reservations'):
+            reservation = obj.current_reservations[0] if obj.current_reservations else None
+        else:
+            reservation = self.current_reservations_queryset().filter(room=obj).first()
 
         if reservation:
             return ClientSerializer(reservation.client).data
 
     def get_last_cleaner(self, obj):
-        last_cleaning = CleaningSchedule.objects.order_by('-cleaning_date').first()
+        if hasattr(obj, 'last_cleanings'):
+            last_cleaning = obj.last_cleanings[0] if obj.last_cleanings else None
+        else:
+            last_cleaning = self.last_cleanings_queryset().filter(room=obj).first()
 
         if last_cleaning:
             cleaner = last_cleaning.cleaner.employee
@@ -63,6 +98,36 @@ class RoomSerializer(serializers.ModelSerializer):
 
         return None
 
+    # Быстрый путь списков (ValuesReader): те же значения, что get_current_client и get_last_cleaner,
+    # одним запросом на все комнаты списка. rooms - представления комнат без этих полей.
+    @classmethod
+    def get_current_client_batch(cls, rooms):
+        reader = values_reader(ClientSerializer, 'client__')
+        room_ids = {room['id'] for room in rooms if room['status'] != 'AVAILABLE'}
+        current = {}
+        for row in cls.current_reservations_queryset().filter(room_id__in=room_ids).values('room_id', *reader.columns):
+            current.setdefault(row['room_id'], row)
+        clients = dict(zip(current, reader.render(current.values())))
+        return [None if room['status'] == 'AVAILABLE' else clients.get(room['id']) for room in rooms]
+
+    @classmethod
+    def get_last_cleaner_batch(cls, rooms):
+        cleanings = cls.last_cleanings_queryset().filter(room_id__in={room['id'] for room in rooms}).values(
+            'room_id', 'cleaning_date', 'cleaner__employee__id', 'cleaner__employee__first_name',
+            'cleaner__employee__last_name', 'cleaner__employee__middle_name'
+        )
+        cleaners = {
+            row['room_id']: {
+                'id': row['cleaner__employee__id'],
+                'first_name': row['cleaner__employee__first_name'],
+                'last_name': row['cleaner__employee__last_name'],
+                'middle_name': row['cleaner__employee__middle_name'],
+                'cleaning_date': row['cleaning_date'],
+            }
+            for row in cleanings
+        }
+        return [cleaners.get(room['id']) for room in rooms]
+
 
 class ClientStayOverlapSerializer(serializers.Serializer):
     client_id = serializers.IntegerField(required=True)
@@ -85,6 +150,26 @@ class CleaningEmployeeSerializer(serializers.ModelSerializer):
         fields = ['id', 'first_name', 'last_name', 'middle_name']
 
 
+class ClientSearchSerializer(serializers.Serializer):
+    q = serializers.CharField(required=False, allow_blank=True, max_length=200)
+    city = serializers.CharField(required=False, allow_blank=True, max_length=50)
+    room = serializers.IntegerField(required=False)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=200, default=20)
+
+    def validate(self, data):
+        if not any(data.get(field) for field in ('q', 'city', 'room', 'start_date', 'end_date')):
+            raise serializers.ValidationError("Укажите хотя бы один параметр поиска: q, city, room, start_date или end_date.")
+
+        start_date = data.get('start_date', None)
+        end_date = data.get('end_date', None)
+        if start_date and end_date and start_date > end_date:
+            raise serializers.ValidationError("Дата окончания не может быть раньше даты начала.")
+
+        return data
+
+
 class ClientRoomCleaningSerializer(serializers.Serializer):
     client_id = serializers.IntegerField(required=True)
     day_of_week = serializers.ChoiceField(choices=[
@@ -128,6 +213,10 @@ class EmploymentContractDetailSerializer(serializers.ModelSerializer):
             'position_name',
         ]
 
+    @classmethod
+    def setup_eager_loading(cls, queryset, prefix=''):
+        return queryset.select_related(f'{prefix}employee', f'{prefix}position')
+
 
 class HireEmployeeSerializer(serializers.Serializer):
     passport_number = serializers.CharField(max_length=10)
@@ -204,6 +293,26 @@ class UpdateEmployeeSerializer(serializers.Serializer):
         return data
 
 
+class BulkHireEmployeesSerializer(serializers.Serializer):
+    # Строки проверяются по отдельности в hire_employees, чтобы ошибка в одной не отклоняла весь список.
+    employees = serializers.ListField(
+        child=serializers.DictField(),
+        required=True,
+        allow_empty=False,
+        max_length=1000
+    )
+
+
+class BulkHireJobSerializer(BulkHireEmployeesSerializer):
+    # Фоновая задача bulk_hire принимает список пачками по IMPORT_BATCH_SIZE, поэтому ограничение больше.
+    employees = serializers.ListField(
+        child=serializers.DictField(),
+        required=True,
+        allow_empty=False,
+        max_length=50000
+    )
+
+
 class FireEmployeeSerializer(serializers.Serializer):
     employee_id = serializers.IntegerField()
     termination_date = serializers.DateField(required=False)
@@ -245,6 +354,34 @@ class UpdateCleaningScheduleSerializer(serializers.Serializer):
         return value
 
 
+class GenerateCleaningScheduleSerializer(serializers.Serializer):
+    floors = serializers.ListField(child=serializers.IntegerField(min_value=0), required=False)
+    room_type_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    room_statuses = serializers.ListField(child=serializers.ChoiceField(choices=Room.STATUS_CHOICES), required=False)
+    start_date = serializers.DateField(required=True)
+    end_date = serializers.DateField(required=True)
+    cleaner_ids = serializers.ListField(child=serializers.IntegerField(), required=True, allow_empty=False)
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if data['end_date'] < data['start_date']:
+            raise serializers.ValidationError({"end_date": "Дата окончания не может быть раньше даты начала."})
+        if (data['end_date'] - data['start_date']).days >= 366:
+            raise serializers.ValidationError({"end_date": "Расписание можно составить не более чем на год."})
+
+        cleaner_ids = list(dict.fromkeys(data['cleaner_ids']))
+        contracts = active_contracts_for(cleaner_ids)
+        missing = [employee_id for employee_id in cleaner_ids if employee_id not in contracts]
+        if missing:
+            raise serializers.ValidationError({
+                "cleaner_ids": f"Сотрудники не найдены или не имеют активного контракта: {', '.join(map(str, missing))}."
+            })
+
+        data['cleaner_ids'] = cleaner_ids
+        data['contract_ids'] = [contracts[employee_id] for employee_id in cleaner_ids]
+        return data
+
+
 class CreateReservationSerializer(serializers.Serializer):
     passport_number = serializers.CharField(max_length=10, required=True)
     first_name = serializers.CharField(max_length=50, required=True)
@@ -277,6 +414,40 @@ class CreateReservationSerializer(serializers.Serializer):
         return data
 
 
+class ReservationQuoteItemSerializer(serializers.Serializer):
+    room_number = serializers.IntegerField(required=True)
+    arrival_date = serializers.DateField(required=True)
+    departure_date = serializers.DateField(required=True)
+
+    def validate(self, data):
+        if data['departure_date'] <= data['arrival_date']:
+            raise serializers.ValidationError({"departure_date": "Дата выезда должна быть позже даты заселения."})
+        return data
+
+
+class ReservationQuoteSerializer(serializers.Serializer):
+    items = serializers.ListField(
+        child=ReservationQuoteItemSerializer(),
+        required=True,
+        allow_empty=False,
+        max_length=1000
+    )
+
+
+class ReservationStatusChangeSerializer(serializers.Serializer):
+    reservation_id = serializers.IntegerField(required=True)
+    status = serializers.ChoiceField(choices=list(RESERVATION_TRANSITIONS), required=True)
+
+
+class BulkReservationStatusSerializer(serializers.Serializer):
+    items = serializers.ListField(
+        child=ReservationStatusChangeSerializer(),
+        required=True,
+        allow_empty=False,
+        max_length=1000
+    )
+
+
 class UpdateReservationSerializer(serializers.Serializer):
     arrival_date = serializers.DateField(required=False)
     departure_date = serializers.DateField(required=False)
@@ -329,6 +500,47 @@ class QuarterlyReportSerializer(serializers.Serializer):
         return data
 
 
+class PeriodReportSerializer(serializers.Serializer):
+    year = serializers.IntegerField(required=False)
+    month = serializers.IntegerField(min_value=1, max_value=12, required=False)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if 'year' in data and 'month' in data:
+            year = data['year']
+            month = data['month']
+            data['start_date'] = date(year, month, 1)
+            data['end_date'] = date(year, month, calendar.monthrange(year, month)[1])
+        elif 'start_date' not in data or 'end_date' not in data:
+            raise serializers.ValidationError("Укажите year и month либо start_date и end_date.")
+
+        if data['start_date'] > data['end_date']:
+            raise serializers.ValidationError("Дата окончания не может быть раньше даты начала.")
+
+        return data
+
+
+class RoomAvailabilitySerializer(serializers.Serializer):
+    type = serializers.IntegerField(required=False)
+
+    def get_fields(self):
+        # from - зарезервированное слово, поэтому поля периода объявляются здесь.
+        fields = super().get_fields()
+        fields['from'] = serializers.DateField(required=True)
+        fields['to'] = serializers.DateField(required=True)
+        return fields
+
+    def validate(self, data):
+        if data['to'] <= data['from']:
+            raise serializers.ValidationError({"to": "Дата выезда должна быть позже даты заселения."})
+        return data
+
+
+class ExportSerializer(serializers.Serializer):
+    output = serializers.ChoiceField(choices=['ndjson', 'csv'], default='ndjson')
+
+
 class ReservationSerializer(serializers.ModelSerializer):
     client = ClientSerializer(read_only=True)
     room = RoomSerializer(read_only=True)
@@ -351,6 +563,10 @@ class ReservationSerializer(serializers.ModelSerializer):
             'updated_by_id'
         ]
 
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        return RoomSerializer.setup_eager_loading(queryset.select_related('client'), prefix='room__')
+
 
 
 class EmployeeSerializer(serializers.ModelSerializer):
@@ -367,8 +583,24 @@ class EmployeeSerializer(serializers.ModelSerializer):
             'position',
         ]
 
+    @staticmethod
+    def active_contracts_queryset():
+        return EmploymentContract.objects.filter(is_active=True).select_related('position').order_by('id')
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, prefix=''):
+        # Активный контракт вместе с должностью для всех сотрудников загружается одним запросом.
+        return queryset.prefetch_related(
+            Prefetch(f'{prefix}employmentcontract_set', queryset=cls.active_contracts_queryset(),
+                     to_attr='active_contracts'),
+        )
+
     def get_position(self, obj):
-        active_contract = EmploymentContract.objects.filter(employee=obj, is_active=True).first()
+        if hasattr(obj, 'active_contracts'):
+            active_contract = obj.active_contracts[0] if obj.active_contracts else None
+        else:
+            active_contract = self.active_contracts_queryset().filter(employee=obj).first()
+
         if active_contract and active_contract.position:
             return {
                 'id': active_contract.position.id,
@@ -396,6 +628,10 @@ class CleaningScheduleSerializer(serializers.ModelSerializer):
         model = CleaningSchedule
         fields = ['id', 'cleaner', 'room', 'cleaning_date', 'status']
 
+    @classmethod
+    def setup_eager_loading(cls, queryset, prefix=''):
+        return queryset.select_related(f'{prefix}cleaner__employee', f'{prefix}room__type')
+
     def get_cleaner(self, obj):
         employee = obj.cleaner.employee
         return {
@@ -411,4 +647,30 @@ class CleaningScheduleSerializer(serializers.ModelSerializer):
             'number': obj.room.number,
             'type_id': obj.room.type.id,
             'type_name': obj.room.type.name,
-        }
\ No newline at end of file
+        }
+
+
+class CreateJobSerializer(serializers.Serializer):
+    kind = serializers.CharField(max_length=50)
+    payload = serializers.DictField(required=False, default=dict)
+    priority = serializers.IntegerField(min_value=-100, max_value=100, required=False)
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            'id',
+            'kind',
+            'status',
+            'priority',
+            'progress',
+            'progress_message',
+            'attempts',
+            'max_attempts',
+            'result',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
@@ -0,0 +1,143 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .client_search import index_clients
+from .models import CleaningSchedule, Client, Employee, EmployeePosition, EmploymentContract, Reservation, Room, \
+    RoomDayFact, RoomPriceHistory, RoomType
+from .pricing import refresh_price_calendar
+from .room_board import room_board
+from .reports import invalidate_all_reports, invalidate_reports_for_stays, refresh_reservation_reports
+from .table_versions import bump_table_versions
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(pre_save, sender=Reservation)
+def remember_previous_stay(sender, instance, raw=False, **kwargs):
+    instance._previous_stay = None
+    instance._previous_room_id = None
+    if not raw and instance.pk:
+        previous = (
+            Reservation.objects.filter(pk=instance.pk)
+            .values_list('arrival_date', 'departure_date', 'room_id')
+            .first()
+        )
+        if previous is not None:
+            instance._previous_stay = previous[:2]
+            instance._previous_room_id = previous[2]
+
+
+@receiver(post_save, sender=Reservation)
+def update_reservation_facts(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous_stay = getattr(instance, '_previous_stay', None)
+    refresh_reservation_reports([instance], [previous_stay] if previous_stay else [])
+
+    room_ids = {instance.room_id, getattr(instance, '_previous_room_id', None)}
+    transaction.on_commit(lambda: room_board.refresh_rooms(room_ids))
+
+
+@receiver(post_delete, sender=Reservation)
+def invalidate_deleted_reservation_reports(sender, instance, **kwargs):
+    # Факты бронирования удаляются каскадом (в том числе при удалении клиента) без сигналов,
+    # поэтому версию RoomDayFact, от которой зависят ETag отчётов, увеличиваем здесь.
+    bump_table_versions(RoomDayFact)
+    stays = [(instance.arrival_date, instance.departure_date)]
+    transaction.on_commit(lambda: invalidate_reports_for_stays(stays))
+
+    room_id = instance.room_id
+    transaction.on_commit(lambda: room_board.refresh_rooms([room_id]))
+
+
+@receiver([post_save, post_delete], sender=Room)
+def invalidate_room_reports(sender, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(invalidate_all_reports)
+
+
+@receiver(post_save, sender=Room)
+def update_room_board(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(lambda: room_board.refresh_rooms([instance.id]))
+
+
+@receiver(post_delete, sender=Room)
+def remove_room_from_board(sender, instance, **kwargs):
+    room_id = instance.id
+    transaction.on_commit(lambda: room_board.refresh_rooms([room_id]))
+
+
+@receiver(post_save, sender=Client)
+def update_client_search_tokens(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_clients([instance])
+
+
+@receiver(pre_save, sender=RoomPriceHistory)
+def remember_previous_price_period(sender, instance, raw=False, **kwargs):
+    instance._previous_period = None
+    if not raw and instance.pk:
+        instance._previous_period = (
+            RoomPriceHistory.objects.filter(pk=instance.pk)
+            .values_list('room_type_id', 'start_date', 'end_date')
+            .first()
+        )
+
+
+def refresh_price_calendars(periods):
+    # Пересчитываются только ночи изменённых периодов; открытый период (без end_date) - до конца календаря.
+    ranges = {}
+    for room_type_id, start_date, end_date in periods:
+        if room_type_id not in ranges:
+            ranges[room_type_id] = (start_date, end_date)
+        else:
+            previous_start, previous_end = ranges[room_type_id]
+            ranges[room_type_id] = (
+                min(previous_start, start_date),
+                None if previous_end is None or end_date is None else max(previous_end, end_date),
+            )
+
+    for room_type_id, (start_date, end_date) in ranges.items():
+        problems = refresh_price_calendar(room_type_id, start_date, end_date)
+        if problems:
+            logger.warning("Календарь цен типа номера %s не построен: %s", room_type_id, "; ".join(problems))
+
+
+@receiver(post_save, sender=RoomPriceHistory)
+def update_price_calendar(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    periods = [(instance.room_type_id, instance.start_date, instance.end_date)]
+    previous_period = getattr(instance, '_previous_period', None)
+    if previous_period is not None:
+        periods.append(previous_period)
+    refresh_price_calendars(periods)
+
+
+@receiver(post_delete, sender=RoomPriceHistory)
+def remove_price_period(sender, instance, **kwargs):
+    refresh_price_calendars([(instance.room_type_id, instance.start_date, instance.end_date)])
+
+
+# RoomDayFact сюда не входит: факты пишутся только через bulk_create в reports.sync_reservation_facts,
+# а обработчик post_delete отключил бы быстрое удаление фактов при каждом сохранении бронирования.
+# Каскадное удаление фактов вместе с бронированием учитывает invalidate_deleted_reservation_reports.
+@receiver([post_save, post_delete], sender=Client)
+@receiver([post_save, post_delete], sender=Room)
+@receiver([post_save, post_delete], sender=RoomType)
+@receiver([post_save, post_delete], sender=Reservation)
+@receiver([post_save, post_delete], sender=Employee)
+@receiver([post_save, post_delete], sender=EmploymentContract)
+@receiver([post_save, post_delete], sender=EmployeePosition)
+@receiver([post_save, post_delete], sender=CleaningSchedule)
+def bump_table_version(sender, raw=False, **kwargs):
+    if raw:
+        return
+    bump_table_versions(sender)
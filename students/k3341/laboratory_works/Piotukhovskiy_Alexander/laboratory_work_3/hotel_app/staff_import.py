@@ -0,0 +1,146 @@
+import csv
+import json
+
+from django.db import IntegrityError, transaction
+
+from .models import Employee, EmployeePosition, EmploymentContract
+from .serializers import HireEmployeeSerializer
+from .table_versions import bump_table_versions
+
+IMPORT_BATCH_SIZE = 500
+
+
+def read_staff_rows(stream, file_format):
+    if file_format == 'csv':
+        for row in csv.DictReader(stream):
+            # Пустые ячейки CSV означают отсутствие значения, а не пустую строку.
+            yield {key: value for key, value in row.items() if key and value not in ('', None)}
+    else:
+        for line in stream:
+            line = line.strip()
+            if line:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield row if isinstance(row, dict) else {'_error': "Строка не является JSON-объектом."}
+
+
+def hire_employees(rows, first_row=1, batch_size=IMPORT_BATCH_SIZE):
+    # Сотрудники, должности и активные контракты проверяются несколькими запросами на всю пачку,
+    # новые записи создаются через bulk_create. Ошибка в строке не мешает остальным строкам.
+    results = []
+    valid = []
+    seen_passports = set()
+
+    for index, row in enumerate(rows):
+        result = {"row": first_row + index, "passport_number": row.get('passport_number')}
+        results.append(result)
+
+        if '_error' in row:
+            result.update(ok=False, errors={"non_field_errors": [row['_error']]})
+            continue
+
+        serializer = HireEmployeeSerializer(data=row)
+        if not serializer.is_valid():
+            result.update(ok=False, errors=serializer.errors)
+            continue
+
+        passport_number = serializer.validated_data['passport_number']
+        if passport_number in seen_passports:
+            result.update(ok=False, errors={"passport_number": ["Паспорт встречается в загрузке несколько раз."]})
+            continue
+        seen_passports.add(passport_number)
+        valid.append((result, serializer.validated_data))
+
+    if not valid:
+        return results
+
+    with transaction.atomic():
+        positions = set(EmployeePosition.objects.filter(
+            id__in={data['position_id'] for _, data in valid}
+        ).values_list('id', flat=True))
+        existing = Employee.objects.in_bulk([data['passport_number'] for _, data in valid], field_name='passport_number')
+        employed = set(EmploymentContract.objects.filter(
+            employee_id__in=[employee.id for employee in existing.values()], is_active=True
+        ).values_list('employee_id', flat=True))
+
+        new_employees = []
+        updated_employees = []
+        hires = []
+        for result, data in valid:
+            if data['position_id'] not in positions:
+                result.update(ok=False, errors={"position_id": [f"Должность с id {data['position_id']} не найдена."]})
+                continue
+
+            employee = existing.get(data['passport_number'])
+            if employee is not None and employee.id in employed:
+                result.update(ok=False, errors={"non_field_errors": ["У сотрудника уже есть активный контракт."]})
+                continue
+
+            if employee is None:
+                employee = Employee(passport_number=data['passport_number'])
+                new_employees.append(employee)
+                result['created'] = True
+            else:
+                updated_employees.append(employee)
+                result['created'] = False
+            employee.first_name = data['first_name']
+            employee.last_name = data['last_name']
+            employee.middle_name = data.get('middle_name', None)
+            hires.append((result, employee, data))
+
+        try:
+            with transaction.atomic():
+                contracts = create_hires(hires, new_employees, updated_employees, batch_size)
+        except IntegrityError:
+            # Проверки выше не видят сотрудников и контрактов, созданных параллельным запросом после них.
+            # Тогда пачка записывается построчно, каждая строка в своей точке сохранения: конфликтующая строка
+            # получает ошибку, остальные принимаются.
+            for employee in new_employees:
+                employee.pk = None
+            contracts = [hire_one(result, employee, data) for result, employee, data in hires]
+        bump_table_versions(Employee, EmploymentContract)
+
+    for (result, employee, _), contract in zip(hires, contracts):
+        if contract is not None:
+            result.update(ok=True, employee_id=employee.id, contract_id=contract.id)
+
+    return results
+
+
+def new_contract(employee, data):
+    return EmploymentContract(
+        employee=employee,
+        position_id=data['position_id'],
+        contract_type=data['contract_type'],
+        start_date=data['start_date'],
+        end_date=data.get('end_date'),
+    )
+
+
+def create_hires(hires, new_employees, updated_employees, batch_size):
+    Employee.objects.bulk_create(new_employees, batch_size=batch_size)
+    Employee.objects.bulk_update(updated_employees, ['first_name', 'last_name', 'middle_name'], batch_size=batch_size)
+    return EmploymentContract.objects.bulk_create(
+        [new_contract(employee, data) for _, employee, data in hires], batch_size=batch_size
+    )
+
+
+def hire_one(result, employee, data):
+    created = employee.pk is None
+    try:
+        with transaction.atomic():
+            employee.save()
+            contract = new_contract(employee, data)
+            contract.save()
+    except IntegrityError:
+        if created:
+            employee.pk = None
+            errors = {"passport_number": ["Сотрудник с таким номером паспорта уже существует."]}
+        else:
+            errors = {"non_field_errors": ["У сотрудника уже есть активный контракт."]}
+        del result['created']
+        result.update(ok=False, errors=errors)
+        return None
+    return contract
@@ -0,0 +1,42 @@
+from django.db.models import Q
+
+from .models import Client, Reservation
+
+
+def merge_stay_intervals(intervals):
+    # Заезды [arrival_date, departure_date) сортируются и склеиваются, если пересекаются,
+    # поэтому частый гость превращается в несколько непересекающихся периодов.
+    merged = []
+    for arrival_date, departure_date in sorted(intervals):
+        if merged and arrival_date < merged[-1][1]:
+            if departure_date > merged[-1][1]:
+                merged[-1][1] = departure_date
+        else:
+            merged.append([arrival_date, departure_date])
+    return [(arrival_date, departure_date) for arrival_date, departure_date in merged]
+
+
+def client_stays(client, start_date=None, end_date=None):
+    stays = Reservation.objects.filter(client=client)
+    if start_date:
+        stays = stays.filter(arrival_date__gte=start_date)
+    if end_date:
+        stays = stays.filter(departure_date__lte=end_date)
+    return stays.values_list('arrival_date', 'departure_date')
+
+
+def clients_overlapping_stays(client, merged_stays):
+    if not merged_stays:
+        return Client.objects.none()
+
+    overlapping_filter = Q()
+    for arrival_date, departure_date in merged_stays:
+        overlapping_filter |= Q(arrival_date__lt=departure_date, departure_date__gt=arrival_date)
+
+    overlapping_client_ids = Reservation.objects.filter(overlapping_filter).exclude(client=client).values('client_id')
+    return Client.objects.filter(id__in=overlapping_client_ids)
+
+
+def find_overlapping_clients(client, start_date=None, end_date=None):
+    merged_stays = merge_stay_intervals(client_stays(client, start_date, end_date))
+    return clients_overlapping_stays(client, merged_stays)
@@ -0,0 +1,115 @@
+import hashlib
+
+from asgiref.local import Local
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import TableVersion
+
+_pending = Local()
+
+
+def table_label(model):
+    return model._meta.label_lower
+
+
+def bump_table_versions(*models):
+    # Сигналы вызывают это для каждой сохранённой или удалённой строки, массовые изменения (bulk_create, update)
+    # сигналы обходят и вызывают это явно. Версия таблицы увеличивается один раз после фиксации транзакции,
+    # сколько бы строк в ней ни изменилось. Если транзакция откатится, таблица получит лишнее увеличение
+    # со следующей фиксацией: это только заставит клиентов один раз перезагрузить данные.
+    tables = getattr(_pending, 'tables', None)
+    if tables is None:
+        tables = _pending.tables = set()
+    tables.update(table_label(model) for model in models)
+    transaction.on_commit(_flush_table_versions)
+
+
+def _flush_table_versions():
+    tables = getattr(_pending, 'tables', None)
+    if not tables:
+        return
+    _pending.tables = set()
+    increment_versions(tables)
+
+
+def increment_versions(tables):
+    # Увеличивает версии сразу, без ожидания фиксации. Строки для новых ключей создаются при первом увеличении.
+    tables = set(tables)
+    now = timezone.now()
+    updated = TableVersion.objects.filter(table__in=tables).update(version=F('version') + 1, updated_at=now)
+    if updated < len(tables):
+        existing = set(TableVersion.objects.filter(table__in=tables).values_list('table', flat=True))
+        TableVersion.objects.bulk_create(
+            [TableVersion(table=table, version=1, updated_at=now) for table in tables - existing],
+            ignore_conflicts=True
+        )
+
+
+def table_versions(models):
+    return {
+        table: (version, updated_at)
+        for table, version, updated_at in TableVersion.objects.filter(
+            table__in=[table_label(model) for model in models]
+        ).values_list('table', 'version', 'updated_at')
+    }
+
+
+class NotModified(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    # ETag и Last-Modified для GET-запросов. Валидаторы строятся по версиям таблиц versioned_models одним
+    # запросом к TableVersion, поэтому ответ 304 отдаётся без чтения данных и сериализации.
+    # В versioned_models перечисляются все таблицы, из которых строится ответ, включая связанные.
+    versioned_models = ()
+    conditional_headers = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.conditional_headers = None
+        if request.method not in ('GET', 'HEAD') or not self.versioned_models:
+            return
+
+        headers, last_modified = self.get_conditional_headers(request)
+        response = get_conditional_response(request, etag=headers['ETag'], last_modified=last_modified, response=headers)
+        if response is not headers:
+            raise NotModified(response)
+        self.conditional_headers = headers
+
+    def get_conditional_headers(self, request):
+        versions = table_versions(self.versioned_models)
+        labels = sorted(table_label(model) for model in self.versioned_models)
+
+        # Ответ зависит от параметров запроса и формата (JSON или страница API в браузере).
+        parts = [f'{label}:{versions.get(label, (0, None))[0]}' for label in labels]
+        parts += [request.get_full_path(), request.accepted_renderer.format]
+        headers = HttpResponse()
+        headers['ETag'] = '"%s"' % hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+        last_modified = None
+        if len(versions) == len(labels):
+            last_modified = int(max(updated_at for _, updated_at in versions.values()).timestamp())
+            headers['Last-Modified'] = http_date(last_modified)
+        # Без no-cache браузер может эвристически считать ответ с Last-Modified свежим и не спрашивать сервер.
+        patch_cache_control(headers, private=True, no_cache=True)
+        return headers, last_modified
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.conditional_headers is not None and response.status_code == 200:
+            for header in ('ETag', 'Last-Modified', 'Cache-Control'):
+                if header in self.conditional_headers:
+                    response.headers.setdefault(header, self.conditional_headers[header])
+        return response
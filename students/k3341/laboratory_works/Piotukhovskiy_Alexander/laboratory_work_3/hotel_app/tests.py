@@ -1,3 +1,1087 @@
-from django.test import TestCase
+import csv
+import json
+from base64 import urlsafe_b64encode
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO
+from uuid import UUID
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from hotel_drf_app.middleware import metrics
+from hotel_drf_app.renderers import FastJSONParser, FastJSONRenderer
+
+from .availability import AvailabilityIndex, availability_index
+from .booking import BookingConflict, book_room
+from .checks import check_price_histories
+from .pricing import PriceCalendarError, RoomPriceCalendar
+from .cleaning import generate_schedule
+from .jobs import JOB_KINDS, JobKind, JobLeaseLost, JobProgress, claim_jobs, enqueue_job, release_expired_jobs, run_job
+from .models import CleaningSchedule, Client, Employee, EmployeePosition, EmploymentContract, Job, Reservation, \
+    Room, RoomDayFact, RoomPriceHistory, RoomType, TableVersion
+from .reports import build_occupancy_report, cached_report, get_report_cache, quarter_date_range
+from .room_board import sync_stream_slots
+from .serializers import ClientSerializer, ReservationSerializer, RoomSerializer
+from .stays import find_overlapping_clients, merge_stay_intervals
+from .table_versions import increment_versions, table_label
+
+
+class HotelTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='admin', is_staff=True)
+        cls.room_type = RoomType.objects.create(name='Стандарт', capacity=2)
+        cls.position = EmployeePosition.objects.create(name='Уборщик', salary=30000)
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def create_cleaner(self):
+        index = Employee.objects.count()
+        employee = Employee.objects.create(passport_number=f'{index:010d}', first_name=f'Имя{index}',
+                                           last_name=f'Фамилия{index}')
+        return EmploymentContract.objects.create(employee=employee, position=self.position,
+                                                 contract_type='PERMANENT', start_date=date(2024, 1, 1))
+
+    def create_client(self):
+        index = Client.objects.count()
+        return Client.objects.create(passport_number=f'{index:010d}', first_name=f'Имя{index}',
+                                     last_name=f'Фамилия{index}', city_from='Москва')
+
+    def create_rooms(self, count):
+        # Каждая вторая комната занята (есть текущий клиент), у каждой комнаты есть уборка со своим уборщиком:
+        # списки комнат загружают и то и другое.
+        first_number = Room.objects.count() + 101
+        rooms = []
+        for number in range(first_number, first_number + count):
+            occupied = number % 2 == 0
+            room = Room.objects.create(number=number, type=self.room_type, phone='0',
+                                       status='OCCUPIED' if occupied else 'AVAILABLE')
+            if occupied:
+                Reservation.objects.create(room=room, client=self.create_client(), admin=self.admin,
+                                           arrival_date=date(2024, 3, 1), departure_date=date(2024, 3, 5),
+                                           status='CHECKED_IN', price_at_booking=4000, final_price=4000)
+            CleaningSchedule.objects.create(cleaner=self.create_cleaner(), room=room,
+                                            cleaning_date=date(2024, 3, 1) + timedelta(days=number % 7))
+            rooms.append(room)
+        return rooms
+
+    # Запрос выполняется на 5 и на 50 комнатах (с уборками и уборщиками): число SQL-запросов не должно меняться.
+    def assert_queries_do_not_grow(self, path, expected):
+        self.create_rooms(5)
+        with self.assertNumQueries(expected):
+            response = self.api.get(path)
+        self.assertEqual(response.status_code, 200)
+
+        self.create_rooms(45)
+        with self.assertNumQueries(expected):
+            response = self.api.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+
+class RoomListQueriesTest(HotelTestCase):
+    # Количество запросов списков комнат не должно расти с количеством комнат (N+1 по клиенту и уборщику).
+    def test_rooms_by_status(self):
+        response = self.assert_queries_do_not_grow('/hotel/rooms', 3)
+        self.assertEqual(response.json()['count'], 50)
+
+    def test_rooms_by_status_filtered(self):
+        response = self.assert_queries_do_not_grow('/hotel/rooms?status=OCCUPIED', 3)
+        rooms = response.json()['rooms']
+        self.assertEqual(len(rooms), 25)
+        self.assertTrue(all(room['current_client'] is not None for room in rooms))
+
+    def test_api_rooms(self):
+        response = self.assert_queries_do_not_grow('/hotel/api/rooms/', 4)
+        rooms = response.json()
+        self.assertEqual(len(rooms), 50)
+        self.assertTrue(all(room['last_cleaner'] is not None for room in rooms))
+
+    def test_api_rooms_page(self):
+        response = self.assert_queries_do_not_grow('/hotel/api/rooms/?page_size=20', 4)
+        self.assertEqual(len(response.json()['results']), 20)
+
+
+class KeysetPaginationTest(HotelTestCase):
+    def setUp(self):
+        super().setUp()
+        # По три бронирования на дату заезда: на границе страниц значения поля порядка совпадают.
+        room = Room.objects.create(number=101, type=self.room_type, phone='0')
+        for index in range(9):
+            arrival_date = date(2024, 3, 1) + timedelta(days=index % 3)
+            Reservation.objects.create(room=room, client=self.create_client(), admin=self.admin,
+                                       arrival_date=arrival_date, departure_date=arrival_date + timedelta(days=1),
+                                       price_at_booking=1000, final_price=1000)
+        self.expected = list(Reservation.objects.order_by('-arrival_date', '-id').values_list('id', flat=True))
+
+    def pages(self, url, params=None, link='next'):
+        pages = []
+        while url:
+            response = self.api.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            pages.append(data)
+            url, params = data[link], None
+        return pages
+
+    def ids(self, pages):
+        return [item['id'] for page in pages for item in page['results']]
+
+    def test_cursor_round_trip(self):
+        pages = self.pages('/hotel/api/reservations/', {'page_size': 2, 'ordering': '-arrival_date'})
+        self.assertEqual([len(page['results']) for page in pages], [2, 2, 2, 2, 1])
+        self.assertEqual(self.ids(pages), self.expected)
+        self.assertIsNone(pages[0]['previous'])
+
+        # С последней страницы назад по ссылкам previous - те же страницы в обратном порядке.
+        backward = self.pages(pages[-1]['previous'], link='previous')
+        self.assertEqual([page['results'] for page in backward], [page['results'] for page in pages[-2::-1]])
+        self.assertEqual(self.api.get(pages[1]['previous']).json()['results'], pages[0]['results'])
+
+    def test_instances_and_count(self):
+        # Список сотрудников строится из экземпляров моделей, а не из строк values().
+        for _ in range(5):
+            self.create_cleaner()
+        pages = self.pages('/hotel/api/employees/', {'page_size': 2, 'with_count': 'true'})
+        self.assertEqual(self.ids(pages), list(Employee.objects.order_by('id').values_list('id', flat=True)))
+        self.assertEqual(pages[0]['count'], 5)
+        self.assertNotIn('with_count', pages[0]['next'])
+        self.assertNotIn('count', pages[1])
+
+    def test_ordering_falls_back_to_id(self):
+        pages = self.pages('/hotel/api/reservations/', {'page_size': 4, 'ordering': '-final_price'})
+        self.assertEqual(self.ids(pages), sorted(self.expected))
+
+    def test_invalid_cursor(self):
+        def cursor(payload):
+            return urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        for ordering, value in (
+            ('id', 'мусор'),
+            ('id', 'e30='),
+            ('id', cursor([1])),
+            ('id', cursor({'v': [1, 2], 'r': 0})),
+            ('id', cursor({'v': ['abc'], 'r': 0})),
+            ('-arrival_date', cursor({'v': ['не дата', 1], 'r': 0})),
+        ):
+            response = self.api.get('/hotel/api/reservations/', {'cursor': value, 'ordering': ordering})
+            self.assertEqual(response.status_code, 404, value)
+            self.assertEqual(response.json(), {'detail': 'Некорректный курсор.'})
+
+
+class ValuesListTest(HotelTestCase):
+    # Быстрый путь списков (ValuesListMixin) должен отдавать тот же JSON, что ModelSerializer,
+    # в том числе пустые значения (отчество, текущий клиент, уборщик, обновивший администратор) и даты.
+    def setUp(self):
+        super().setUp()
+        self.create_rooms(4)
+        Client.objects.filter(id=Client.objects.order_by('id').first().id).update(middle_name='Иванович')
+        # Занятая комната без текущего бронирования и без уборок.
+        room = Room.objects.create(number=999, type=self.room_type, phone='0', status='OCCUPIED')
+        Reservation.objects.create(room=room, client=self.create_client(), admin=self.admin, updated_by=self.admin,
+                                   arrival_date=date(2024, 4, 1), departure_date=date(2024, 4, 3),
+                                   price_at_booking=2000, final_price=2000)
+        # Свободная комната с подтверждённым будущим бронированием: текущего клиента у неё нет.
+        room = Room.objects.filter(status='AVAILABLE').first()
+        Reservation.objects.create(room=room, client=self.create_client(), admin=self.admin, status='CONFIRMED',
+                                   arrival_date=date(2024, 5, 1), departure_date=date(2024, 5, 2),
+                                   price_at_booking=2000, final_price=2000)
+
+    def assert_same_as_serializer(self, path, serializer_class, queryset):
+        expected = json.loads(JSONRenderer().render(serializer_class(queryset.order_by('id'), many=True).data))
+        self.assertEqual(self.api.get(path).json(), expected)
+        self.assertEqual(self.api.get(path, {'page_size': 2}).json()['results'], expected[:2])
+        return expected
+
+    def test_clients(self):
+        clients = self.assert_same_as_serializer('/hotel/api/clients/', ClientSerializer, Client.objects.all())
+        self.assertEqual({client['middle_name'] for client in clients}, {'Иванович', None})
+
+    def test_rooms(self):
+        rooms = self.assert_same_as_serializer('/hotel/api/rooms/', RoomSerializer, Room.objects.all())
+        room = rooms[-1]
+        self.assertEqual((room['status'], room['current_client'], room['last_cleaner']), ('OCCUPIED', None, None))
+        self.assertTrue(all(room['current_client'] is None for room in rooms if room['status'] == 'AVAILABLE'))
+        self.assertTrue(any(room['last_cleaner'] and room['last_cleaner']['cleaning_date'] for room in rooms))
+
+    def test_reservations(self):
+        reservations = self.assert_same_as_serializer('/hotel/api/reservations/', ReservationSerializer,
+                                                      Reservation.objects.all())
+        self.assertEqual({reservation['updated_by_id'] for reservation in reservations}, {None, self.admin.id})
+        self.assertEqual(reservations[-2]['arrival_date'], '2024-04-01')
+
+
+class StaffListQueriesTest(HotelTestCase):
+    # Должность сотрудника берётся из предзагруженных активных контрактов, уборщик и комната уборки - из JOIN.
+    def test_api_employees(self):
+        response = self.assert_queries_do_not_grow('/hotel/api/employees/', 3)
+        employees = response.json()
+        self.assertEqual(len(employees), 50)
+        self.assertTrue(all(employee['position']['name'] == 'Уборщик' for employee in employees))
+
+    def test_api_employment_contracts(self):
+        response = self.assert_queries_do_not_grow('/hotel/api/employment-contracts/', 2)
+        self.assertEqual(len(response.json()), 50)
+
+    def test_api_cleaning_schedules(self):
+        response = self.assert_queries_do_not_grow('/hotel/api/cleaning-schedules/', 2)
+        schedules = response.json()
+        self.assertEqual(len(schedules), 50)
+        self.assertTrue(all(schedule['cleaner']['last_name'] and schedule['room']['type_name'] for schedule in schedules))
+
+
+class GenerateScheduleTest(HotelTestCase):
+    def test_duplicates_keep_started_cleaning(self):
+        room = Room.objects.create(number=101, type=self.room_type, phone='0')
+        assigned, other = self.create_cleaner(), self.create_cleaner()
+        first_day, second_day = date(2024, 3, 1), date(2024, 3, 2)
+
+        # Первой по id идёт ожидающая уборка, за ней - уже завершённая уборка той же комнаты в тот же день.
+        CleaningSchedule.objects.create(cleaner=assigned, room=room, cleaning_date=first_day)
+        completed = CleaningSchedule.objects.create(cleaner=other, room=room, cleaning_date=first_day,
+                                                    status='COMPLETED')
+        # Две ожидающие: остаётся та, что уже назначена нужному уборщику.
+        CleaningSchedule.objects.create(cleaner=other, room=room, cleaning_date=second_day)
+        matching = CleaningSchedule.objects.create(cleaner=assigned, room=room, cleaning_date=second_day)
+
+        stats, _ = generate_schedule([room.id], [assigned.id], first_day, second_day)
+        self.assertEqual(stats, {'created': 0, 'reassigned': 0, 'unchanged': 1, 'removed': 2, 'kept': 1})
+        self.assertEqual(sorted(CleaningSchedule.objects.values_list('id', flat=True)), [completed.id, matching.id])
+
+        # Повторный запуск ничего не меняет.
+        stats, _ = generate_schedule([room.id], [assigned.id], first_day, second_day)
+        self.assertEqual(stats, {'created': 0, 'reassigned': 0, 'unchanged': 1, 'removed': 0, 'kept': 1})
+
+
+@override_settings(HOTEL_ROOM_BOARD_STREAM_LIFETIME=0)
+class RoomStatusStreamTest(HotelTestCase):
+    def test_token_in_query_is_not_accepted(self):
+        token = Token.objects.create(user=self.admin)
+        self.assertEqual(APIClient().get(f'/hotel/rooms/stream?token={token.key}').status_code, 401)
+
+    def test_stream_cookie(self):
+        browser = APIClient()
+        self.assertEqual(browser.post('/hotel/rooms/stream/session').status_code, 401)
+
+        browser.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.admin).key}')
+        self.assertEqual(browser.post('/hotel/rooms/stream/session').status_code, 200)
+        # EventSource не передаёт заголовок Authorization, только cookie.
+        browser.credentials()
+        response = browser.get('/hotel/rooms/stream')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'event: snapshot', b''.join(response.streaming_content))
+
+        browser.cookies['hotel_room_stream'] = 'forged'
+        self.assertEqual(browser.get('/hotel/rooms/stream').status_code, 401)
+
+    @override_settings(HOTEL_ROOM_BOARD_SYNC_STREAMS=1)
+    def test_sync_streams_are_limited(self):
+        first = self.api.get('/hotel/rooms/stream')
+        self.assertEqual(first.status_code, 200)
+        refused = self.api.get('/hotel/rooms/stream')
+        self.assertEqual(refused.status_code, 503)
+        self.assertIn('Retry-After', refused)
+
+        # Место освобождается, когда сервер закрывает ответ, даже если поток не дочитан.
+        first.close()
+        self.assertEqual(sync_stream_slots.active, 0)
+        second = self.api.get('/hotel/rooms/stream')
+        self.assertEqual(second.status_code, 200)
+        second.close()
+
+
+class PriceHistoryCheckTest(HotelTestCase):
+    def test_reports_overlapping_history(self):
+        RoomPriceHistory.objects.create(room_type=self.room_type, start_date=date(2024, 1, 1),
+                                        end_date=date(2024, 5, 31), price=3000)
+        RoomPriceHistory.objects.create(room_type=self.room_type, start_date=date(2024, 6, 1), price=3500)
+        self.assertEqual(check_price_histories(None, databases=['default']), [])
+
+        RoomPriceHistory.objects.create(room_type=self.room_type, start_date=date(2024, 5, 1), price=4000)
+        warnings = check_price_histories(None, databases=['default'])
+        self.assertEqual([warning.id for warning in warnings], ['hotel_app.W001'])
+
+        # Такая история отклоняет бронирования этого типа с ответом 422.
+        Room.objects.create(number=101, type=self.room_type, phone='0')
+        response = self.api.post('/hotel/reservation', {
+            "passport_number": '0000000001', "first_name": 'Иван', "last_name": 'Иванов', "city_from": 'Москва',
+            "room_number": 101, "arrival_date": '2024-05-10', "departure_date": '2024-05-12',
+        }, format='json')
+        self.assertEqual(response.status_code, 422)
+
+
+class PriceCalendarTest(HotelTestCase):
+    def test_problem_blocks_only_affected_stays(self):
+        calendar = RoomPriceCalendar([
+            (date(2024, 1, 1), date(2024, 1, 31), 1000),
+            (date(2024, 2, 11), date(2024, 3, 31), 2000),
+            (date(2024, 3, 20), None, 3000),
+        ])
+        # Пропуск 01.02-10.02 и пересечение с 20.03 до 31.03.
+        self.assertEqual(len(calendar.issues), 2)
+        self.assertEqual(calendar.total(date(2024, 1, 10), date(2024, 1, 13)), 3000)
+        self.assertEqual(calendar.total(date(2024, 2, 11), date(2024, 2, 13)), 4000)
+        self.assertEqual(calendar.total(date(2024, 4, 1), date(2024, 4, 3)), 6000)
+        # Выезд в первый день пропуска: ночей в пропуске нет.
+        self.assertEqual(calendar.total(date(2024, 1, 30), date(2024, 2, 1)), 2000)
+
+        for arrival_date, departure_date in [(date(2024, 1, 30), date(2024, 2, 2)), (date(2024, 2, 5), date(2024, 2, 6)),
+                                             (date(2024, 3, 30), date(2024, 4, 2))]:
+            with self.assertRaises(PriceCalendarError):
+                calendar.total(arrival_date, departure_date)
+
+    def test_reservation_outside_gap(self):
+        RoomPriceHistory.objects.create(room_type=self.room_type, start_date=date(2024, 1, 1),
+                                        end_date=date(2024, 1, 31), price=1000)
+        RoomPriceHistory.objects.create(room_type=self.room_type, start_date=date(2024, 3, 1), price=2000)
+        Room.objects.create(number=101, type=self.room_type, phone='0')
+
+        def reserve(index, arrival_date, departure_date):
+            return self.api.post('/hotel/reservation', {
+                "passport_number": f'{index:010d}', "first_name": 'Иван', "last_name": 'Иванов',
+                "city_from": 'Москва', "room_number": 101, "arrival_date": arrival_date,
+                "departure_date": departure_date,
+            }, format='json')
+
+        response = reserve(1, '2024-02-27', '2024-03-02')
+        self.assertEqual(response.status_code, 422)
+        self.assertIn('нет цены с 2024-02-01 по 2024-02-29', response.json()['detail'])
+
+        response = reserve(2, '2024-03-10', '2024-03-13')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['price_at_booking'], 6000)
+
+
+class RoomCleanerTest(HotelTestCase):
+    def setUp(self):
+        super().setUp()
+        self.room = Room.objects.create(number=101, type=self.room_type, phone='0')
+        self.client_record = self.create_client()
+        Reservation.objects.create(room=self.room, client=self.client_record, admin=self.admin,
+                                   arrival_date=date(2024, 3, 1), departure_date=date(2024, 3, 5),
+                                   status='CHECKED_OUT', price_at_booking=4000, final_price=4000)
+
+    def cleaners(self, day_of_week, queries=1):
+        # Уборщики находятся одним запросом по индексу (room, weekday, ...); только пустой ответ
+        # дополнительно проверяет, есть ли клиент и его бронирования.
+        with self.assertNumQueries(queries):
+            response = self.api.get('/hotel/clients/room-cleaner',
+                                    {'client_id': self.client_record.id, 'day_of_week': day_of_week})
+        self.assertEqual(response.status_code, 200)
+        return [employee['id'] for employee in response.json()['employees']]
+
+    def assert_weekdays(self):
+        schedules = CleaningSchedule.objects.values_list('cleaning_date', 'weekday')
+        self.assertTrue(schedules)
+        self.assertTrue(all(weekday == cleaning_date.isoweekday() for cleaning_date, weekday in schedules))
+
+    def test_weekday_follows_cleaning_date(self):
+        # 2024-03-04 - понедельник, 2024-03-05 - вторник.
+        created = CleaningSchedule.objects.create(cleaner=self.create_cleaner(), room=self.room,
+                                                  cleaning_date=date(2024, 3, 4))
+        self.assert_weekdays()
+        self.assertEqual(self.cleaners('MONDAY'), [created.cleaner.employee_id])
+
+        response = self.api.patch(f'/hotel/api/cleaning-schedules/{created.id}/',
+                                  {'cleaning_date': '2024-03-05'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assert_weekdays()
+        self.assertEqual(self.cleaners('MONDAY', queries=3), [])
+        self.assertEqual(self.cleaners('TUESDAY'), [created.cleaner.employee_id])
+
+        manual = self.create_cleaner()
+        response = self.api.patch('/hotel/cleaning-schedules/manage', {
+            'cleaner_id': manual.employee_id, 'room_ids': [101], 'cleaning_dates': ['2024-03-06', '2024-03-09'],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assert_weekdays()
+        self.assertEqual(self.cleaners('WEDNESDAY'), [manual.employee_id])
+        self.assertEqual(self.cleaners('SATURDAY'), [manual.employee_id])
+
+        generated = self.create_cleaner()
+        response = self.api.post('/hotel/cleaning-schedules/generate', {
+            'start_date': '2024-03-10', 'end_date': '2024-03-16', 'cleaner_ids': [generated.employee_id],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 7)
+        self.assert_weekdays()
+        self.assertEqual(self.cleaners('SUNDAY'), [generated.employee_id])
+        self.assertEqual(self.cleaners('WEDNESDAY'), [manual.employee_id, generated.employee_id])
+
+
+class ConditionalGetTest(HotelTestCase):
+    def setUp(self):
+        super().setUp()
+        get_report_cache().clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room = Room.objects.create(number=101, type=self.room_type, phone='0')
+            self.book(date(2024, 2, 1))
+
+    def book(self, arrival_date):
+        Reservation.objects.create(room=self.room, client=self.create_client(), admin=self.admin,
+                                   arrival_date=arrival_date, departure_date=arrival_date + timedelta(days=3),
+                                   status='CHECKED_OUT', payment_status='PAID', price_at_booking=3000,
+                                   final_price=3000)
+
+    def assert_not_modified(self, path):
+        response = self.api.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+        # Повторный опрос с If-None-Match: только чтение версий таблиц, без данных и сериализации.
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            cached = self.api.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], etag)
+        return response
+
+    def assert_modified(self, path, previous):
+        response = self.api.get(path, HTTP_IF_NONE_MATCH=previous['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], previous['ETag'])
+        return response
+
+    def test_viewset(self):
+        path = '/hotel/api/rooms/'
+        previous = self.assert_not_modified(path)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api.patch(f'{path}{self.room.id}/', {'phone': '123'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.assert_modified(path, previous)
+        self.assertEqual(response.json()[0]['phone'], '123')
+
+    def test_report(self):
+        path = '/hotel/reports/period?start_date=2024-01-01&end_date=2024-03-31'
+        previous = self.assert_not_modified(path)
+        self.assertEqual(previous.json()['total_income'], 3000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book(date(2024, 3, 1))
+
+        response = self.assert_modified(path, previous)
+        self.assertEqual(response.json()['total_income'], 6000)
+
+    def test_report_after_delete(self):
+        # Факты удаляются каскадом вместе с бронированием и клиентом, ETag отчёта всё равно меняется.
+        path = '/hotel/reports/period?start_date=2024-01-01&end_date=2024-03-31'
+        previous = self.assert_not_modified(path)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.get().delete()
+        previous = self.assert_modified(path, previous)
+        self.assertEqual(previous.json()['total_income'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book(date(2024, 3, 1))
+        previous = self.assert_modified(path, previous)
+        with self.captureOnCommitCallbacks(execute=True):
+            Client.objects.get(reservation__isnull=False).delete()
+        response = self.assert_modified(path, previous)
+        self.assertEqual(response.json()['total_income'], 0)
+
+
+class ExportTest(HotelTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_rooms(6)
+        Client.objects.filter(id=Client.objects.order_by('id').first().id).update(middle_name='Иванович')
+
+    def test_ndjson(self):
+        response = self.api.get('/hotel/export/clients', {'output': 'ndjson'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], list(Client.objects.order_by('id').values_list('id', flat=True)))
+        self.assertEqual(rows[0]['middle_name'], 'Иванович')
+        self.assertIsNone(rows[1]['middle_name'])
+
+    def test_csv(self):
+        response = self.api.get('/hotel/export/reservations', {'output': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="reservations.csv"')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0][:3], ['id', 'room_id', 'room__number'])
+        self.assertEqual(len(rows), 1 + Reservation.objects.count())
+        self.assertEqual(rows[1][rows[0].index('arrival_date')], '2024-03-01')
+
+    async def test_asgi_streams_asynchronously(self):
+        # Под ASGI выгрузка отдаётся асинхронным итератором, а не читается целиком в список.
+        token = await Token.objects.acreate(user=self.admin)
+        response = await AsyncClient().get('/hotel/export/clients', {'output': 'ndjson'},
+                                           headers={'Authorization': f'Token {token.key}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        lines = b''.join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual(len(lines), await Client.objects.acount())
+
+
+class ClientsListTest(HotelTestCase):
+    def test_city_filter_matches_substring(self):
+        for city in ('Санкт-Петербург', 'Екатеринбург', 'Петрозаводск', 'Москва'):
+            Client.objects.create(passport_number=f'{Client.objects.count():010d}', first_name='Имя',
+                                  last_name='Фамилия', city_from=city)
+
+        def cities(query):
+            response = self.api.get('/hotel/clients', {'city': query})
+            if response.status_code == 404:
+                return []
+            self.assertEqual(response.status_code, 200)
+            return sorted(client['city_from'] for client in response.json()['clients'])
+
+        # Вхождение подстроки, как до появления индекса слов, а не только начало слова.
+        self.assertEqual(cities('бург'), ['Екатеринбург', 'Санкт-Петербург'])
+        self.assertEqual(cities('петер'), ['Санкт-Петербург'])
+        self.assertEqual(cities('ПЕТР'), ['Петрозаводск'])
+        self.assertEqual(cities('санкт-петербург'), ['Санкт-Петербург'])
+        self.assertEqual(cities('Казань'), [])
+
+
+class AvailabilityTest(HotelTestCase):
+    def setUp(self):
+        super().setUp()
+        # Индекс живёт дольше тестовой транзакции: версии таблиц после отката могут совпасть с прежними.
+        availability_index.invalidate()
+        self.suite = RoomType.objects.create(name='Люкс', capacity=2)
+        self.rooms = {
+            number: Room.objects.create(number=number, type=room_type, phone='0')
+            for number, room_type in ((101, self.room_type), (102, self.room_type), (201, self.suite))
+        }
+
+    def reserve(self, number, arrival_date, departure_date, status='BOOKED'):
+        return Reservation(room=self.rooms[number], client=self.create_client(), admin=self.admin, status=status,
+                           arrival_date=arrival_date, departure_date=departure_date,
+                           price_at_booking=1000, final_price=1000)
+
+    def test_free_rooms(self):
+        Reservation.objects.bulk_create([
+            self.reserve(101, date(2030, 12, 10), date(2030, 12, 12)),
+            self.reserve(102, date(2030, 12, 10), date(2030, 12, 12), status='CANCELLED'),
+        ])
+        index = AvailabilityIndex(ttl=3600)
+        self.assertEqual(index.free_rooms(date(2030, 12, 11), date(2030, 12, 12)), [102, 201])
+        self.assertEqual(index.free_rooms(date(2030, 12, 1), date(2030, 12, 31), self.room_type.id), [102])
+        # День выезда свободен для следующего гостя.
+        self.assertEqual(index.free_rooms(date(2030, 12, 12), date(2030, 12, 15)), [101, 102, 201])
+        self.assertEqual(index.free_rooms(date(2030, 12, 8), date(2030, 12, 10), self.room_type.id), [101, 102])
+
+    def test_booking_from_other_process(self):
+        index = AvailabilityIndex(ttl=3600)
+        self.assertEqual(index.free_rooms(date(2030, 12, 10), date(2030, 12, 11)), [101, 102, 201])
+
+        # Другой воркер: строки пишутся без сигналов этого процесса, видна только новая версия таблицы.
+        Reservation.objects.bulk_create([self.reserve(102, date(2030, 12, 10), date(2030, 12, 11))])
+        self.assertEqual(index.free_rooms(date(2030, 12, 10), date(2030, 12, 11)), [101, 102, 201])
+        increment_versions([table_label(Reservation)])
+        self.assertEqual(index.free_rooms(date(2030, 12, 10), date(2030, 12, 11)), [101, 201])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Room.objects.create(number=202, type=self.suite, phone='0')
+        self.assertEqual(index.free_rooms(date(2030, 12, 10), date(2030, 12, 11)), [101, 201, 202])
+
+    def test_endpoint(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reserve(101, date(2030, 12, 10), date(2030, 12, 12)).save()
+        response = self.api.get('/hotel/rooms/availability',
+                                {'type': self.room_type.id, 'from': '2030-12-11', 'to': '2030-12-14'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'type': self.room_type.id, 'from': '2030-12-11', 'to': '2030-12-14',
+                                           'count': 1, 'rooms': [102]})
+
+        response = self.api.get('/hotel/rooms/availability', {'from': '2030-12-12', 'to': '2030-12-13'})
+        self.assertEqual(response.json()['rooms'], [101, 102, 201])
+
+        # Бронирование появляется в ответе сразу, без ожидания TTL.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reserve(201, date(2030, 12, 12), date(2030, 12, 13), status='CONFIRMED').save()
+        response = self.api.get('/hotel/rooms/availability', {'from': '2030-12-12', 'to': '2030-12-13'})
+        self.assertEqual(response.json()['rooms'], [101, 102])
+
+    def test_endpoint_validation(self):
+        response = self.api.get('/hotel/rooms/availability', {'from': '2030-12-12', 'to': '2030-12-12'})
+        self.assertEqual(response.status_code, 422)
+        self.assertIn('to', response.json())
+        response = self.api.get('/hotel/rooms/availability', {'to': '2030-12-12'})
+        self.assertEqual(response.status_code, 422)
+        self.assertIn('from', response.json())
+
+
+class JobQueueTest(HotelTestCase):
+    def setUp(self):
+        super().setUp()
+        self.runs = []
+        JOB_KINDS['test_job'] = JobKind(self.run_test_job, serializers.Serializer)
+        self.addCleanup(JOB_KINDS.pop, 'test_job')
+
+    def run_test_job(self, data, progress):
+        action = self.runs.pop(0)
+        return action(progress)
+
+    def claim(self):
+        claimed = claim_jobs('worker', 1)
+        self.assertEqual(len(claimed), 1)
+        return claimed[0]
+
+    def test_claim_by_priority(self):
+        low = enqueue_job('test_job', {}, priority=-10)
+        first, second = enqueue_job('test_job', {}), enqueue_job('test_job', {})
+        high = enqueue_job('test_job', {}, priority=10)
+        later = enqueue_job('test_job', {}, priority=20)
+        Job.objects.filter(id=later.id).update(run_after=timezone.now() + timedelta(minutes=1))
+
+        self.assertEqual([job_id for job_id, _ in claim_jobs('worker', 3)], [high.id, first.id, second.id])
+        self.assertEqual([job_id for job_id, _ in claim_jobs('worker', 3)], [low.id])
+        self.assertEqual(claim_jobs('worker', 3), [])
+        job = Job.objects.get(id=high.id)
+        self.assertEqual((job.status, job.attempts), ('RUNNING', 1))
+        self.assertTrue(job.locked_by.startswith('worker:'))
+
+    def test_expired_lease(self):
+        retried, exhausted, alive = (enqueue_job('test_job', {}) for _ in range(3))
+        claim_jobs('worker', 3)
+        now = timezone.now()
+        Job.objects.filter(id=exhausted.id).update(attempts=3)
+        Job.objects.filter(id__in=[retried.id, exhausted.id]).update(locked_until=now - timedelta(seconds=1))
+
+        release_expired_jobs(now)
+        retried, exhausted, alive = (Job.objects.get(id=job.id) for job in (retried, exhausted, alive))
+        self.assertEqual((retried.status, retried.locked_by, retried.run_after), ('PENDING', None, now))
+        self.assertEqual((exhausted.status, exhausted.locked_by, exhausted.finished_at), ('FAILED', None, now))
+        self.assertEqual(alive.status, 'RUNNING')
+        # Возвращённая задача берётся снова и тратит следующую попытку.
+        self.assertEqual(self.claim()[0], retried.id)
+        self.assertEqual(Job.objects.get(id=retried.id).attempts, 2)
+
+    @override_settings(HOTEL_JOB_RETRY_DELAY=30)
+    def test_retry_delay(self):
+        def fail(progress):
+            raise RuntimeError('сбой')
+
+        job = enqueue_job('test_job', {})
+        Job.objects.filter(id=job.id).update(max_attempts=4)
+        for attempt, delay in ((1, 30), (2, 60), (3, 120)):
+            self.runs.append(fail)
+            job_id, token = self.claim()
+            before = timezone.now()
+            with self.assertLogs('hotel_app.jobs', 'ERROR'):
+                self.assertEqual(run_job(job_id, token), 'PENDING')
+            job.refresh_from_db()
+            self.assertEqual((job.attempts, job.locked_by, job.error), (attempt, None, 'RuntimeError: сбой'))
+            self.assertGreaterEqual(job.run_after, before + timedelta(seconds=delay))
+            self.assertLessEqual(job.run_after, timezone.now() + timedelta(seconds=delay))
+            self.assertEqual(claim_jobs('worker', 1), [])
+            Job.objects.filter(id=job.id).update(run_after=timezone.now())
+
+        self.runs.append(fail)
+        with self.assertLogs('hotel_app.jobs', 'ERROR'):
+            self.assertEqual(run_job(*self.claim()), 'FAILED')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('FAILED', 4))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_lease_lost(self):
+        # Пока задача выполнялась, её аренда истекла и задачу взял другой обработчик.
+        def take_over(job_id):
+            Job.objects.filter(id=job_id).update(locked_by='other:1')
+
+        def report_progress(progress):
+            take_over(job_id)
+            progress(1, 2)
+
+        def finish(progress):
+            take_over(job_id)
+            return {'rows': 1}
+
+        job = enqueue_job('test_job', {})
+        job_id, token = self.claim()
+        self.runs.append(report_progress)
+        with self.assertLogs('hotel_app.jobs', 'WARNING') as logs:
+            self.assertEqual(run_job(job_id, token), 'LOST')
+        self.assertEqual(logs.output, [f'WARNING:hotel_app.jobs:Аренда задачи {job_id} истекла во время выполнения.'])
+        with self.assertRaises(JobLeaseLost):
+            JobProgress(job_id, token)(1, 2)
+
+        # Обработка завершилась, но результат записывать уже нельзя.
+        Job.objects.filter(id=job_id).update(status='PENDING', locked_by=None)
+        job_id, token = self.claim()
+        self.runs.append(finish)
+        self.assertEqual(run_job(job_id, token), 'LOST')
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.result, job.progress), ('RUNNING', 'other:1', None, 0))
+
+
+class BulkHireTest(HotelTestCase):
+    def setUp(self):
+        super().setUp()
+        self.free = Employee.objects.create(passport_number='1000000001', first_name='Пётр', last_name='Свободный')
+        self.busy = self.create_cleaner().employee
+
+    def row(self, passport_number, **changes):
+        return {'passport_number': passport_number, 'first_name': 'Имя', 'last_name': 'Фамилия',
+                'position_id': self.position.id, 'contract_type': 'PERMANENT', 'start_date': '2024-06-01', **changes}
+
+    def hire(self, rows):
+        response = self.api.post('/hotel/employees/bulk-hire', {'employees': rows}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_bulk_hire(self):
+        data = self.hire([
+            self.row('2000000001'),
+            self.row(self.free.passport_number, first_name='Пётр'),
+            self.row(self.busy.passport_number),
+            self.row('2000000002', position_id=0),
+            self.row('2000000001'),
+            self.row('2000000003', contract_type='FIXED_TERM'),
+        ])
+        self.assertEqual((data['hired'], data['failed']), (2, 4))
+        results = data['results']
+        self.assertEqual([result['row'] for result in results], [1, 2, 3, 4, 5, 6])
+        self.assertEqual([result['ok'] for result in results], [True, True, False, False, False, False])
+        self.assertEqual([result.get('created') for result in results[:2]], [True, False])
+        self.assertEqual(list(results[2]['errors']), ['non_field_errors'])
+        self.assertEqual(list(results[3]['errors']), ['position_id'])
+        self.assertEqual(list(results[4]['errors']), ['passport_number'])
+        self.assertEqual(list(results[5]['errors']), ['end_date'])
+        self.assertEqual(EmploymentContract.objects.get(id=results[1]['contract_id']).employee_id, self.free.id)
+        self.assertEqual(EmploymentContract.objects.filter(is_active=True).count(), 3)
+
+    def test_parallel_hire(self):
+        # Параллельный запрос успевает нанять того же сотрудника и создать сотрудника с тем же паспортом
+        # после проверок пачки: триггеры вставляют конфликтующие строки прямо перед строками загрузки.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TRIGGER parallel_contract BEFORE INSERT ON hotel_app_employmentcontract "
+                "WHEN NEW.employee_id = %s BEGIN "
+                "INSERT INTO hotel_app_employmentcontract (employee_id, position_id, contract_type, start_date, "
+                "is_active) VALUES (NEW.employee_id, NEW.position_id, 'PERMANENT', '2024-01-01', 1); END" % self.free.id
+            )
+            cursor.execute(
+                "CREATE TRIGGER parallel_employee BEFORE INSERT ON hotel_app_employee "
+                "WHEN NEW.passport_number = '2000000002' BEGIN "
+                "INSERT INTO hotel_app_employee (passport_number, first_name, last_name) "
+                "VALUES (NEW.passport_number, 'Другой', 'Сотрудник'); END"
+            )
+
+        data = self.hire([
+            self.row('2000000001'),
+            self.row(self.free.passport_number),
+            self.row('2000000002'),
+            self.row('2000000003'),
+        ])
+        self.assertEqual((data['hired'], data['failed']), (2, 2))
+        results = data['results']
+        self.assertEqual([result['ok'] for result in results], [True, False, False, True])
+        self.assertEqual(results[1]['errors'], {'non_field_errors': ['У сотрудника уже есть активный контракт.']})
+        self.assertEqual(results[2]['errors'],
+                         {'passport_number': ['Сотрудник с таким номером паспорта уже существует.']})
+        self.assertNotIn('created', results[1])
+        hired = Employee.objects.filter(passport_number__in=['2000000001', '2000000003'])
+        self.assertEqual(sorted(hired.values_list('id', flat=True)),
+                         sorted(result['employee_id'] for result in (results[0], results[3])))
+        self.assertEqual(EmploymentContract.objects.filter(employee__in=hired, is_active=True).count(), 2)
+
+
+class StayOverlapTest(HotelTestCase):
+    def test_merge_stay_intervals(self):
+        def day(number):
+            return date(2024, 3, number)
+
+        # Выезд в день следующего заезда - два разных проживания, вложенное проживание поглощается.
+        self.assertEqual(merge_stay_intervals([(day(5), day(8)), (day(1), day(5))]),
+                         [(day(1), day(5)), (day(5), day(8))])
+        self.assertEqual(merge_stay_intervals([(day(1), day(10)), (day(3), day(4)), (day(9), day(12))]),
+                         [(day(1), day(12))])
+        self.assertEqual(merge_stay_intervals([(day(2), day(3)), (day(1), day(6)), (day(2), day(3))]),
+                         [(day(1), day(6))])
+        self.assertEqual(merge_stay_intervals([]), [])
+
+    def test_find_overlapping_clients(self):
+        room = Room.objects.create(number=101, type=self.room_type, phone='0')
+
+        def stay(client, arrival_day, departure_day):
+            Reservation.objects.create(room=room, client=client, admin=self.admin,
+                                       arrival_date=date(2024, 3, arrival_day), departure_date=date(2024, 3, departure_day),
+                                       price_at_booking=1000, final_price=1000)
+
+        target, before, after, nested, overlapping, later = (self.create_client() for _ in range(6))
+        stay(target, 5, 10)
+        stay(target, 7, 12)
+        stay(before, 1, 5)
+        stay(after, 12, 14)
+        stay(nested, 8, 9)
+        stay(overlapping, 11, 13)
+        stay(overlapping, 9, 11)
+        stay(later, 20, 22)
+
+        self.assertEqual(set(find_overlapping_clients(target)), {nested, overlapping})
+        self.assertEqual(find_overlapping_clients(target).count(), 2)
+        # Учитываются только проживания клиента внутри периода: остаётся заезд 5-10.
+        self.assertEqual(set(find_overlapping_clients(target, end_date=date(2024, 3, 10))), {nested, overlapping})
+        self.assertEqual(set(find_overlapping_clients(target, start_date=date(2024, 3, 6))), {nested, overlapping})
+        self.assertEqual(set(find_overlapping_clients(nested)), {target})
+        self.assertFalse(find_overlapping_clients(target, start_date=date(2024, 3, 15)).exists())
+
+
+class FastJSONTest(TestCase):
+    # Ответы и разбор запросов на orjson должны совпадать с JSONRenderer и JSONParser из DRF побайтно.
+    def assert_same_render(self, data, accepted_media_type='application/json'):
+        expected = JSONRenderer().render(data, accepted_media_type)
+        self.assertEqual(FastJSONRenderer().render(data, accepted_media_type), expected)
+
+    def test_render(self):
+        moment = datetime(2024, 3, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc)
+        self.assert_same_render({
+            'aware': moment,
+            'moscow': moment.astimezone(dt_timezone(timedelta(hours=3))),
+            'naive': datetime(2024, 3, 1, 12, 30),
+            'date': date(2024, 3, 1),
+            'time': time(9, 15, 0, 500),
+            'duration': timedelta(days=1, seconds=5),
+            'prices': [Decimal('1500.50'), Decimal('0.10'), Decimal('1E+2')],
+            'uuid': UUID('12345678-1234-5678-1234-567812345678'),
+            'text': 'Санкт-Петербург \u2028 \u2029 "кавычки"',
+            'nested': {'ids': (1, 2), 'empty': None, 'flag': True, 'float': 0.1},
+        })
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_render_fallback(self):
+        # orjson не кодирует целые больше 64 бит, с отступами работает обычный JSONRenderer.
+        self.assert_same_render({'big': 2 ** 70, 'date': date(2024, 3, 1)})
+        self.assert_same_render({'ids': [1, 2], 'date': date(2024, 3, 1)}, 'application/json; indent=2')
+        with self.assertRaises(TypeError):
+            FastJSONRenderer().render({'unknown': object()})
+
+    def test_parse(self):
+        body = json.dumps({'city': 'Москва', 'price': 1500.5, 'ids': [1, 2], 'none': None}, ensure_ascii=False)
+        for encoding in ('utf-8', 'cp1251'):
+            context = {'encoding': encoding}
+            self.assertEqual(FastJSONParser().parse(BytesIO(body.encode(encoding)), parser_context=context),
+                             JSONParser().parse(BytesIO(body.encode(encoding)), parser_context=context))
+
+        for body in (b'{"city": ', b'\xff\xfe', b'[1, 2,]'):
+            with self.assertRaises(ParseError):
+                FastJSONParser().parse(BytesIO(body))
+            with self.assertRaises(ParseError):
+                JSONParser().parse(BytesIO(body))
+
+
+class MetricsViewTest(HotelTestCase):
+    def test_requires_staff(self):
+        self.assertEqual(APIClient().get('/metrics').status_code, 401)
+
+        user = User.objects.create_user('user', password='user')
+        api = APIClient()
+        api.force_authenticate(user)
+        self.assertEqual(api.get('/metrics').status_code, 403)
+
+        response = self.api.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'hotel_http_requests_total', response.content)
+
+    @override_settings(HOTEL_REQUEST_BUDGETS={'export': {'queries': 0}})
+    def test_streaming_queries(self):
+        # Запросы выгрузки выполняются при чтении потока, после того как middleware вернул ответ.
+        self.create_rooms(4)
+        labels = {'route': 'hotel/export/<str:dataset>', 'method': 'GET'}
+        queries_before = metrics.value('hotel_http_db_queries_total', **labels)
+        bytes_before = metrics.value('hotel_http_response_bytes_total', **labels)
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.api.get('/hotel/export/reservations', {'output': 'csv'})
+            self.assertIn('desc="0 queries"', response['Server-Timing'])
+            self.assertEqual(metrics.value('hotel_http_db_queries_total', **labels), queries_before)
+            with self.assertLogs('hotel_drf_app.middleware', 'WARNING') as logs:
+                body = b''.join(response.streaming_content)
+                response.close()
+
+        self.assertGreaterEqual(len(captured), 1)
+        self.assertEqual(metrics.value('hotel_http_db_queries_total', **labels) - queries_before, len(captured))
+        self.assertEqual(metrics.value('hotel_http_response_bytes_total', **labels) - bytes_before, len(body))
+        self.assertIn(f'queries = {len(captured)}, лимит 0', logs.output[0])
+
+    async def test_async_streaming_queries(self):
+        labels = {'route': 'hotel/export/<str:dataset>', 'method': 'GET'}
+        queries_before = metrics.value('hotel_http_db_queries_total', **labels)
+        token = await Token.objects.acreate(user=self.admin)
+        response = await AsyncClient().get('/hotel/export/clients', {'output': 'ndjson'},
+                                           headers={'Authorization': f'Token {token.key}'})
+        self.assertEqual(metrics.value('hotel_http_db_queries_total', **labels), queries_before)
+        b''.join([chunk async for chunk in response.streaming_content])
+        # Токен и выгрузка клиентов: запросы потока учтены вместе с запросом аутентификации.
+        self.assertGreaterEqual(metrics.value('hotel_http_db_queries_total', **labels) - queries_before, 2)
+
+
+class RoomDayFactTest(HotelTestCase):
+    def legacy_report(self, start_date, end_date):
+        # Прежний отчёт агрегировал бронирования целиком, если они полностью попадали в период.
+        stays = Reservation.objects.filter(arrival_date__gte=start_date, departure_date__lte=end_date)
+        paid = stays.filter(payment_status__in=['PREPAID', 'PAID'])
+        return {
+            "clients_per_room": list(
+                stays.filter(status__in=['BOOKED', 'CONFIRMED', 'CHECKED_IN', 'CHECKED_OUT'])
+                .values('room__number').annotate(client_count=Count('id')).order_by('room__number')
+            ),
+            "income_per_room": list(
+                paid.values('room__number').annotate(total_income=Sum('price_at_booking')).order_by('room__number')
+            ),
+            "total_income": paid.aggregate(total=Sum('price_at_booking'))['total'] or 0,
+        }
+
+    def test_facts_match_legacy_report(self):
+        first, second = (Room.objects.create(number=number, type=self.room_type, phone='0') for number in (101, 102))
+        # Стоимость не делится на число ночей нацело: остаток распределяется по первым ночам.
+        for room, arrival_date, nights, price, status, payment_status in [
+            (first, date(2024, 1, 10), 3, 10000, 'CHECKED_OUT', 'PAID'),
+            (first, date(2024, 2, 1), 7, 20001, 'CONFIRMED', 'PREPAID'),
+            (first, date(2024, 3, 1), 2, 5000, 'BOOKED', 'UNPAID'),
+            (second, date(2024, 1, 5), 5, 9999, 'CHECKED_IN', 'PAID'),
+            (second, date(2024, 2, 20), 4, 8000, 'CANCELLED', 'PAID'),
+        ]:
+            reservation = Reservation.objects.create(
+                room=room, client=self.create_client(), admin=self.admin, arrival_date=arrival_date,
+                departure_date=arrival_date + timedelta(days=nights), status=status,
+                payment_status=payment_status, price_at_booking=price, final_price=price,
+            )
+            self.assertEqual(RoomDayFact.objects.filter(reservation=reservation).count(), nights)
+
+        start_date, end_date = quarter_date_range(1, 2024)
+        report = build_occupancy_report(start_date, end_date)
+        legacy = self.legacy_report(start_date, end_date)
+        for key in ('clients_per_room', 'income_per_room', 'total_income'):
+            self.assertEqual(report[key], legacy[key])
+        self.assertEqual(report['total_income'], 10000 + 20001 + 9999 + 8000)
+
+
+class ReportCacheTest(HotelTestCase):
+    def setUp(self):
+        super().setUp()
+        get_report_cache().clear()
+        self.room = Room.objects.create(number=101, type=self.room_type, phone='0')
+
+    def book(self, arrival_date, departure_date):
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.create(room=self.room, client=self.create_client(), admin=self.admin,
+                                       arrival_date=arrival_date, departure_date=departure_date,
+                                       status='CHECKED_OUT', payment_status='PAID',
+                                       price_at_booking=3000, final_price=3000)
+
+    def quarterly_total(self):
+        start_date, end_date = quarter_date_range(1, 2024)
+        return cached_report('quarterly', 2024, 1, start_date, end_date)['total_income']
+
+    def test_booking_invalidates_report(self):
+        self.book(date(2024, 2, 1), date(2024, 2, 4))
+        self.assertEqual(self.quarterly_total(), 3000)
+
+        self.book(date(2024, 3, 1), date(2024, 3, 4))
+        self.assertEqual(self.quarterly_total(), 6000)
+
+        # Бронирование в другом квартале не сбрасывает отчёт за первый.
+        self.book(date(2024, 5, 1), date(2024, 5, 4))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.quarterly_total(), 6000)
+
+    def test_version_in_database_is_shared_between_processes(self):
+        self.book(date(2024, 2, 1), date(2024, 2, 4))
+        self.assertEqual(self.quarterly_total(), 3000)
+
+        # Другой процесс сервера изменил факты и увеличил версию периода в базе, не трогая кэш этого процесса.
+        RoomDayFact.objects.update(revenue=2000)
+        TableVersion.objects.filter(table='report:quarterly:2024:1').update(version=F('version') + 1)
+        self.assertEqual(self.quarterly_total(), 6000)
+
+
+class BulkStatusTest(HotelTestCase):
+    def setUp(self):
+        super().setUp()
+        self.room = Room.objects.create(number=101, type=self.room_type, phone='0', status='OCCUPIED')
+
+    def reserve(self, status, arrival_date):
+        return Reservation.objects.create(room=self.room, client=self.create_client(), admin=self.admin,
+                                          arrival_date=arrival_date, departure_date=arrival_date + timedelta(days=3),
+                                          status=status, price_at_booking=4000, final_price=4000)
+
+    def change_statuses(self, items):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api.post('/hotel/reservation/status', {"items": items}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_room_status_does_not_depend_on_item_order(self):
+        # Выезд одного гостя и заезд следующего в одном запросе: комната занята при любом порядке элементов.
+        for order in (1, -1):
+            Room.objects.filter(id=self.room.id).update(status='OCCUPIED')
+            leaving = self.reserve('CHECKED_IN', date(2024, 3, 1))
+            arriving = self.reserve('CONFIRMED', date(2024, 3, 4))
+            results = self.change_statuses([
+                {"reservation_id": leaving.id, "status": "CHECKED_OUT"},
+                {"reservation_id": arriving.id, "status": "CHECKED_IN"},
+            ][::order])
+            self.assertTrue(all(result['ok'] for result in results))
+            self.assertEqual({result['room_status'] for result in results}, {'OCCUPIED'})
+            self.room.refresh_from_db()
+            self.assertEqual(self.room.status, 'OCCUPIED')
+
+    def test_cancel_keeps_checked_in_guest(self):
+        self.reserve('CHECKED_IN', date(2024, 3, 1))
+        future = self.reserve('CONFIRMED', date(2024, 3, 10))
+        results = self.change_statuses([{"reservation_id": future.id, "status": "CANCELLED"}])
+        self.assertEqual(results[0]['room_status'], 'OCCUPIED')
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.status, 'OCCUPIED')
+
+
+class BookRoomTest(HotelTestCase):
+    def test_stale_room_is_not_booked_twice(self):
+        # Оба запроса прочитали свободную комнату в сериализаторе; второй не должен занять её после первого.
+        Room.objects.create(number=101, type=self.room_type, phone='0')
+        first, second = Room.objects.get(number=101), Room.objects.get(number=101)
+
+        def reserve(room, arrival_date):
+            return lambda: Reservation.objects.create(
+                room=room, client=self.create_client(), admin=self.admin, status='CONFIRMED',
+                arrival_date=arrival_date, departure_date=arrival_date + timedelta(days=2),
+                price_at_booking=0, final_price=0,
+            )
+
+        book_room(first, date(2030, 1, 1), date(2030, 1, 3), reserve(first, date(2030, 1, 1)))
+        with self.assertRaises(BookingConflict):
+            book_room(second, date(2030, 2, 1), date(2030, 2, 3), reserve(second, date(2030, 2, 1)))
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_stale_room_save_keeps_version_growing(self):
+        room = Room.objects.create(number=101, type=self.room_type, phone='0')
+        self.assertEqual(room.version, 1)
+        first, stale = Room.objects.get(id=room.id), Room.objects.get(id=room.id)
+
+        first.status = 'MAINTENANCE'
+        first.save()
+        self.assertEqual(first.version, 2)
+        # Экземпляр, прочитанный до изменения, не возвращает версию назад.
+        stale.phone = '123'
+        stale.save(update_fields=['phone'])
+        self.assertEqual(stale.version, 3)
+        self.assertEqual(Room.objects.get(id=room.id).version, 3)
+
+        # Бронирование по версии, прочитанной до этих сохранений, видит изменение и перечитывает комнату.
+        Room.objects.filter(id=room.id).update(status='AVAILABLE')
+        book_room(room, date(2030, 1, 1), date(2030, 1, 3), lambda: None)
+        self.assertEqual(Room.objects.get(id=room.id).version, 4)
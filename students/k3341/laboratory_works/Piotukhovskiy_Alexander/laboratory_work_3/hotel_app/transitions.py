@@ -0,0 +1,110 @@
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Reservation, Room
+from .reports import refresh_reservation_reports
+from .room_board import room_board
+from .table_versions import bump_table_versions
+
+# Целевой статус -> статусы, из которых в него можно перейти массовой операцией.
+RESERVATION_TRANSITIONS = {
+    'CHECKED_IN': ('BOOKED', 'CONFIRMED'),
+    'CHECKED_OUT': ('CHECKED_IN',),
+    'CANCELLED': ('BOOKED', 'CONFIRMED'),
+}
+
+
+def room_status_after(previous_status, new_status):
+    # Статус комнаты после смены статуса бронирования; None - комнату не трогаем.
+    if new_status == 'CANCELLED' and previous_status != 'CHECKED_IN':
+        return 'AVAILABLE'
+    if new_status == 'CHECKED_OUT' and previous_status == 'CHECKED_IN':
+        return 'REQUIRES_CLEANING'
+    if new_status == 'CHECKED_IN':
+        return 'OCCUPIED'
+    return None
+
+
+# Если в одном запросе меняются несколько бронирований одной комнаты, побеждает более «занятый» статус.
+ROOM_STATUS_PRIORITY = ('OCCUPIED', 'REQUIRES_CLEANING', 'AVAILABLE')
+
+
+def apply_status_transitions(items, user):
+    # Все бронирования и их комнаты блокируются одним запросом, изменения пишутся через bulk_update,
+    # поэтому число запросов не зависит от размера пачки.
+    results = []
+    changed_reservations = []
+    changed_rooms = {}
+    room_statuses = {}
+    room_results = []
+
+    with transaction.atomic():
+        reservations = (
+            Reservation.objects.select_for_update()
+            .select_related('room')
+            .in_bulk([item['reservation_id'] for item in items])
+        )
+        now = timezone.now()
+        seen = set()
+
+        for item in items:
+            reservation_id = item['reservation_id']
+            new_status = item['status']
+            result = {"reservation_id": reservation_id, "status": new_status}
+            results.append(result)
+
+            reservation = reservations.get(reservation_id)
+            if reservation_id in seen:
+                result.update(ok=False, detail="Бронирование указано в запросе несколько раз.")
+                continue
+            seen.add(reservation_id)
+
+            if reservation is None:
+                result.update(ok=False, detail="Бронирование с указанным ID не найдено.")
+                continue
+
+            previous_status = reservation.status
+            if previous_status not in RESERVATION_TRANSITIONS[new_status]:
+                result.update(
+                    ok=False, previous_status=previous_status,
+                    detail=f"Переход из статуса {previous_status} в {new_status} недопустим."
+                )
+                continue
+
+            reservation.status = new_status
+            reservation.updated_by = user
+            reservation.last_updated_date = now
+            changed_reservations.append(reservation)
+
+            room = reservation.room
+            room_status = room_status_after(previous_status, new_status)
+            if room_status is not None:
+                room_statuses.setdefault(room.id, set()).add(room_status)
+                changed_rooms[room.id] = room
+
+            result.update(ok=True, previous_status=previous_status, room_number=room.number, room_status=room.status)
+            room_results.append((result, room))
+
+        Reservation.objects.bulk_update(changed_reservations, ['status', 'updated_by', 'last_updated_date'])
+
+        # Статус комнаты считается по всем её бронированиям после обновления, а не по последнему элементу запроса:
+        # комната с заселённым гостем остаётся занятой.
+        occupied = set(
+            Reservation.objects.filter(room_id__in=changed_rooms, status='CHECKED_IN').values_list('room_id', flat=True)
+        )
+        for room_id, room in changed_rooms.items():
+            if room_id in occupied:
+                room_statuses[room_id].add('OCCUPIED')
+            room.status = min(room_statuses[room_id], key=ROOM_STATUS_PRIORITY.index)
+            room.version = F('version') + 1
+        for result, room in room_results:
+            result['room_status'] = room.status
+
+        Room.objects.bulk_update(changed_rooms.values(), ['status', 'version'])
+        bump_table_versions(Reservation, Room)
+        refresh_reservation_reports(changed_reservations)
+
+        transaction.on_commit(lambda: room_board.refresh_rooms(changed_rooms))
+
+    return results
@@ -1,22 +1,45 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
 
+from hotel_app.async_views import AsyncClientsListView, AsyncRoomsByStatusView, AsyncClientStayOverlapView, \
+    AsyncClientRoomCleaningView, AsyncQuarterlyReportView
 from hotel_app.views import ClientsListView, RoomsByStatusView, ClientStayOverlapView, ClientRoomCleaningView, \
     EmployeeManagementView, CleaningScheduleManagementView, ReservationManagementView, QuarterlyReportView, \
     ClientViewSet, RoomViewSet, ReservationViewSet, EmployeeViewSet, CleaningScheduleViewSet, PublicEndpoint, \
-    EmployeePositionsViewSet, EmploymentContractViewSet
+    EmployeePositionsViewSet, EmploymentContractViewSet, ReservationQuoteView, \
+    PeriodReportView, ExportView, ReservationBulkStatusView, RoomAvailabilityView, EmployeeBulkHireView, \
+    CleaningScheduleGenerateView, RoomStatusStreamView, RoomStatusStreamSessionView, \
+    ClientSearchView, JobCreateView, JobDetailView
 
 urlpatterns = [
     path('clients', ClientsListView.as_view(), name='clients-list'),
+    path('clients/search', ClientSearchView.as_view(), name='client-search'),
     path('rooms', RoomsByStatusView.as_view(), name='available-rooms-count'),
+    path('rooms/availability', RoomAvailabilityView.as_view(), name='room-availability'),
+    path('rooms/stream', RoomStatusStreamView.as_view(), name='room-status-stream'),
+    path('rooms/stream/session', RoomStatusStreamSessionView.as_view(), name='room-status-stream-session'),
     path('clients/stay-overlap', ClientStayOverlapView.as_view(), name='client-stay-overlap'),
     path('clients/room-cleaner', ClientRoomCleaningView.as_view(), name='client-room-cleaning'),
     path('employees/manage', EmployeeManagementView.as_view(), name='employee-management'),
+    path('employees/bulk-hire', EmployeeBulkHireView.as_view(), name='employee-bulk-hire'),
     path('cleaning-schedules/manage', CleaningScheduleManagementView.as_view(), name='update-cleaning-schedule'),
+    path('cleaning-schedules/generate', CleaningScheduleGenerateView.as_view(), name='generate-cleaning-schedule'),
     path('reservation', ReservationManagementView.as_view(), name='create-reservation'),
+    path('reservation/quote', ReservationQuoteView.as_view(), name='reservation-quote'),
+    path('reservation/status', ReservationBulkStatusView.as_view(), name='reservation-bulk-status'),
     path('reservation/<int:reservation_id>', ReservationManagementView.as_view(), name='update-reservation'),
     path('reports/quarterly', QuarterlyReportView.as_view(), name='quarterly-report'),
-    path("health", PublicEndpoint.as_view(), name='hello-world')
+    path('reports/period', PeriodReportView.as_view(), name='period-report'),
+    path('export/<str:dataset>', ExportView.as_view(), name='export'),
+    path('jobs', JobCreateView.as_view(), name='job-create'),
+    path('jobs/<int:job_id>', JobDetailView.as_view(), name='job-detail'),
+    path("health", PublicEndpoint.as_view(), name='hello-world'),
+    # Асинхронные версии представлений только для чтения, для запуска через ASGI
+    path('async/clients', AsyncClientsListView.as_view(), name='async-clients-list'),
+    path('async/rooms', AsyncRoomsByStatusView.as_view(), name='async-rooms-by-status'),
+    path('async/clients/stay-overlap', AsyncClientStayOverlapView.as_view(), name='async-client-stay-overlap'),
+    path('async/clients/room-cleaner', AsyncClientRoomCleaningView.as_view(), name='async-client-room-cleaning'),
+    path('async/reports/quarterly', AsyncQuarterlyReportView.as_view(), name='async-quarterly-report'),
 ]
 
 router = DefaultRouter()
@@ -0,0 +1,108 @@
+from functools import lru_cache
+from operator import itemgetter
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.response import Response
+
+# Поля, у которых to_representation возвращает значение из базы без изменений: int, str, id связанной записи.
+PLAIN_FIELDS = (serializers.IntegerField, serializers.CharField, serializers.ChoiceField, serializers.ReadOnlyField)
+
+
+def _placeholder(row):
+    return None
+
+
+class ValuesReader:
+    # Строит представление списка из строк queryset.values(), не создавая экземпляров моделей и сериализатора
+    # на каждую запись. Результат совпадает с serializer_class(many=True).data: те же поля, порядок и значения.
+    # Для каждого поля заранее выбирается функция "строка -> значение"; вложенные сериализаторы читаются
+    # из той же строки через соединения, а SerializerMethodField - методом сериализатора get_<поле>_batch,
+    # который получает представления всех записей сразу.
+    def __init__(self, serializer_class, prefix=''):
+        self.columns = []
+        self.extractors = []
+        self.method_fields = []
+        self.nested = []
+
+        for name, field in serializer_class().fields.items():
+            if not field.write_only:
+                self.extractors.append((name, self.compile_field(serializer_class, name, field, prefix)))
+
+    def compile_field(self, serializer_class, name, field, prefix):
+        if isinstance(field, serializers.SerializerMethodField):
+            batch = getattr(serializer_class, f'{field.method_name}_batch', None)
+            if batch is None:
+                raise ImproperlyConfigured(
+                    f"{serializer_class.__name__}.{name}: для быстрого списка нужен метод {field.method_name}_batch."
+                )
+            self.method_fields.append((name, batch))
+            return _placeholder
+
+        if field.source == '*' or isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField)):
+            raise ImproperlyConfigured(f"{serializer_class.__name__}.{name}: поле не поддерживается быстрым списком.")
+
+        column = prefix + field.source.replace('.', '__')
+        self.columns.append(column)
+
+        if isinstance(field, serializers.BaseSerializer):
+            reader = values_reader(type(field), f'{column}__')
+            self.columns.extend(reader.columns)
+            self.nested.append((name, reader))
+            build = reader.build
+            return lambda row: None if row[column] is None else build(row)
+
+        if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+            # values() возвращает id связанной записи, как to_representation(obj.pk).
+            return itemgetter(column)
+        if isinstance(field, serializers.RelatedField):
+            raise ImproperlyConfigured(f"{serializer_class.__name__}.{name}: поле не поддерживается быстрым списком.")
+
+        if type(field) in PLAIN_FIELDS:
+            return itemgetter(column)
+
+        convert = field.to_representation
+
+        def extract(row):
+            value = row[column]
+            return None if value is None else convert(value)
+        return extract
+
+    def build(self, row):
+        return {name: extract(row) for name, extract in self.extractors}
+
+    def fill(self, data):
+        for name, batch in self.method_fields:
+            for item, value in zip(data, batch(data)):
+                item[name] = value
+        for name, reader in self.nested:
+            reader.fill([item[name] for item in data if item[name] is not None])
+
+    def render(self, rows):
+        data = [self.build(row) for row in rows]
+        self.fill(data)
+        return data
+
+
+@lru_cache(maxsize=None)
+def values_reader(serializer_class, prefix=''):
+    return ValuesReader(serializer_class, prefix)
+
+
+class ValuesListMixin:
+    # Список для ModelViewSet через ValuesReader: один запрос values() с соединениями вместо select_related
+    # и prefetch_related, без экземпляров моделей. Остальные действия работают через сериализатор как обычно.
+    def list(self, request, *args, **kwargs):
+        reader = values_reader(self.get_serializer_class())
+        queryset = self.filter_queryset(self.get_queryset()).select_related(None).prefetch_related(None)
+        if not queryset.ordered:
+            queryset = queryset.order_by('pk')
+
+        # Поля порядка нужны KeysetPagination для курсоров следующей и предыдущей страниц.
+        ordering_fields = ('id', *getattr(self, 'keyset_ordering_fields', ()))
+        rows = queryset.values(*dict.fromkeys([*reader.columns, *ordering_fields]))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(reader.render(page))
+        return Response(reader.render(rows))
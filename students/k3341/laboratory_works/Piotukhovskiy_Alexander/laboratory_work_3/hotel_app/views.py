@@ -1,24 +1,45 @@
-import calendar
-from datetime import datetime, timedelta
+from datetime import datetime
 
+from django.conf import settings
 from django.core.exceptions import ValidationError as DRFValidationError
-from django.db import transaction
-from django.db.models import Q, Sum, Count, F, ExpressionWrapper, IntegerField
-from django.db.models.functions import Cast, Substr
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Subquery
+from django.http import StreamingHttpResponse
+from django.urls import reverse
 from django.utils import timezone
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import generics, viewsets
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
+from .authentication import StreamCookieAuthentication, set_stream_cookie
 from .models import Reservation, Client, Room, CleaningSchedule, Employee, EmployeePosition, EmploymentContract, \
-    RoomPriceHistory
+    RoomDayFact, RoomType, Job
+from .availability import BLOCKING_STATUSES, availability_index
+from .booking import BookingConflict, book_room, ensure_room_free
+from .cleaning import active_contracts_for, generate_schedule_summary
+from .client_search import filter_by_stays, search_clients
+from .exports import EXPORTS, EXPORT_OUTPUTS, aiter_export, stream_export
+from .jobs import JOB_KINDS, enqueue_job
+from .pagination import KeysetPagination
+from .pricing import PriceCalendarError, load_price_calendars, room_type_total
+from .reports import build_occupancy_report, cached_report, quarter_date_range
+from .room_board import RoomBoardStream, SlotStream, room_board, sync_stream_slots
+from .staff_import import hire_employees
+from .stays import find_overlapping_clients
+from .table_versions import ConditionalGetMixin, bump_table_versions
+from .transitions import apply_status_transitions, room_status_after
+from .values_serializers import ValuesListMixin
 from .serializers import ClientSerializer, RoomSerializer, ClientStayOverlapSerializer, CleaningEmployeeSerializer, \
     ClientRoomCleaningSerializer, HireEmployeeSerializer, FireEmployeeSerializer, EmploymentContractDetailSerializer, \
     UpdateEmployeeSerializer, UpdateCleaningScheduleSerializer, CreateReservationSerializer, \
     UpdateReservationSerializer, QuarterlyReportSerializer, ReservationSerializer, EmployeeSerializer, \
-    CleaningScheduleSerializer, EmployeePositionSerializer
+    CleaningScheduleSerializer, EmployeePositionSerializer, ReservationQuoteSerializer, PeriodReportSerializer, \
+    ExportSerializer, BulkReservationStatusSerializer, RoomAvailabilitySerializer, BulkHireEmployeesSerializer, \
+    GenerateCleaningScheduleSerializer, ClientSearchSerializer, CreateJobSerializer, JobSerializer
 
 
 class PublicEndpoint(generics.GenericAPIView):
@@ -31,79 +52,108 @@ class PublicEndpoint(generics.GenericAPIView):
         return Response({"message": "Hello POST world!"})
 
 
-class ClientViewSet(viewsets.ModelViewSet):
+class ClientViewSet(ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Client.objects.all()
+    versioned_models = (Client,)
     serializer_class = ClientSerializer
+    pagination_class = KeysetPagination
 
 
-class RoomViewSet(viewsets.ModelViewSet):
+class RoomViewSet(ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Room.objects.all()
+    # Текущий клиент и последний уборщик занятых комнат берутся из бронирований и расписания уборок.
+    versioned_models = (Room, RoomType, Reservation, Client, CleaningSchedule, EmploymentContract, Employee)
     serializer_class = RoomSerializer
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return RoomSerializer.setup_eager_loading(super().get_queryset())
 
 
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Reservation.objects.all()
+    versioned_models = (Reservation, Client, Room, RoomType, CleaningSchedule, EmploymentContract, Employee)
     serializer_class = ReservationSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering_fields = ('arrival_date',)
+
+    def get_queryset(self):
+        return ReservationSerializer.setup_eager_loading(super().get_queryset())
 
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+class EmployeeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Employee.objects.all()
+    versioned_models = (Employee, EmploymentContract, EmployeePosition)
     serializer_class = EmployeeSerializer
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return EmployeeSerializer.setup_eager_loading(super().get_queryset())
 
 
-class EmploymentContractViewSet(viewsets.ModelViewSet):
+class EmploymentContractViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = EmploymentContract.objects.all()
+    versioned_models = (EmploymentContract, Employee, EmployeePosition)
     serializer_class = EmploymentContractDetailSerializer
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return EmploymentContractDetailSerializer.setup_eager_loading(super().get_queryset())
 
 
-class EmployeePositionsViewSet(viewsets.ModelViewSet):
+class EmployeePositionsViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = EmployeePosition.objects.all()
+    versioned_models = (EmployeePosition,)
     serializer_class = EmployeePositionSerializer
+    pagination_class = KeysetPagination
 
 
-class CleaningScheduleViewSet(viewsets.ModelViewSet):
+class CleaningScheduleViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = CleaningSchedule.objects.all()
+    versioned_models = (CleaningSchedule, EmploymentContract, Employee, Room, RoomType)
     serializer_class = CleaningScheduleSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering_fields = ('cleaning_date',)
+
+    def get_queryset(self):
+        return CleaningScheduleSerializer.setup_eager_loading(super().get_queryset())
 
 
 class ClientsListView(generics.ListAPIView):
     serializer_class = ClientSerializer
 
     def get_queryset(self):
-        room_number = self.request.query_params.get('room', None)
-        start_date = self.request.query_params.get('start_date', None)
-        end_date = self.request.query_params.get('end_date', None)
-        city_name = self.request.query_params.get('city', None)
+        return self.filter_clients(self.request.query_params)
 
+    @staticmethod
+    def filter_clients(query_params):
+        room_number = query_params.get('room', None)
+        start_date = query_params.get('start_date', None)
+        end_date = query_params.get('end_date', None)
+        city_name = query_params.get('city', None)
+
+        # Фильтры выполняются соединениями с бронированиями и индексом слов, а не вложенными списками id.
+        # Номер комнаты и даты проверяются независимо: клиент жил в комнате и проживал в гостинице в этот период.
         queryset = Client.objects.all()
+        joined = bool(room_number or start_date or end_date or city_name)
 
         if room_number:
-            try:
-                room_number = Room.objects.get(number=room_number)
-            except Room.DoesNotExist:
-                return Client.objects.none()
-
-            reservations = Reservation.objects.filter(room=room_number)
-            client_ids = reservations.values_list('client_id', flat=True)
-            queryset = queryset.filter(id__in=client_ids)
+            queryset = filter_by_stays(queryset, room_number=room_number)
 
         if start_date or end_date:
-            date_filter = Q()
-
-            if start_date:
-                date_filter &= Q(departure_date__gte=start_date)
-
-            if end_date:
-                date_filter &= Q(arrival_date__lte=end_date)
-
-            reservations = Reservation.objects.filter(date_filter)
-            client_ids = reservations.values_list('client_id', flat=True)
-            queryset = queryset.filter(id__in=client_ids)
+            queryset = filter_by_stays(queryset, start_date=start_date, end_date=end_date)
 
         if city_name:
-            queryset = queryset.filter(city_from__icontains=city_name)
+            # Как и раньше, ищется вхождение подстроки ("бург" найдёт Санкт-Петербург), а не начало слова,
+            # как в /clients/search. Сравнение идёт с нормализованным городом, поэтому регистр кириллицы
+            # и буква "ё" не влияют, чего не давал icontains в SQLite.
+            normalized_city = Client.normalize_search_text(city_name)
+            if normalized_city:
+                queryset = queryset.filter(search_city__contains=normalized_city)
+            else:
+                queryset = queryset.filter(city_from__icontains=city_name)
 
-        return queryset
+        return queryset.distinct().order_by('id') if joined else queryset
 
     @swagger_auto_schema(
         operation_description="Получить список клиентов с возможностью фильтрации по номеру комнаты, датам проживания и городу.",
@@ -197,6 +247,122 @@ class ClientsListView(generics.ListAPIView):
             }, status=404)
 
 
+class ClientSearchView(generics.GenericAPIView):
+    serializer_class = ClientSearchSerializer
+
+    @swagger_auto_schema(
+        operation_description="Поиск клиентов по ФИО или номеру паспорта с учётом города, номера комнаты и дат "
+                              "проживания. Слова запроса ищутся по началу слов без учёта регистра и буквы \"ё\", "
+                              "результаты упорядочены по релевантности: совпадение в фамилии важнее совпадения в имени, "
+                              "совпадение слова целиком важнее совпадения по началу.",
+        manual_parameters=[
+            openapi.Parameter(
+                'q',
+                openapi.IN_QUERY,
+                description="Начала слов фамилии, имени, отчества или номера паспорта, например \"иванов петр\".",
+                type=openapi.TYPE_STRING,
+                required=False,
+            ),
+            openapi.Parameter(
+                'city',
+                openapi.IN_QUERY,
+                description="Начало названия города, например \"петерб\".",
+                type=openapi.TYPE_STRING,
+                required=False,
+            ),
+            openapi.Parameter(
+                'room',
+                openapi.IN_QUERY,
+                description="Номер комнаты, в которой проживал клиент.",
+                type=openapi.TYPE_INTEGER,
+                required=False,
+            ),
+            openapi.Parameter(
+                'start_date',
+                openapi.IN_QUERY,
+                description="Клиент проживал после этой даты (формат YYYY-MM-DD). Вместе с room относится к тому же бронированию.",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=False,
+            ),
+            openapi.Parameter(
+                'end_date',
+                openapi.IN_QUERY,
+                description="Клиент проживал до этой даты (формат YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=False,
+            ),
+            openapi.Parameter(
+                'limit',
+                openapi.IN_QUERY,
+                description="Максимальное количество результатов (от 1 до 200, по умолчанию 20).",
+                type=openapi.TYPE_INTEGER,
+                required=False,
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Найденные клиенты в порядке убывания релевантности.",
+                examples={
+                    "application/json": {
+                        "count": 2,
+                        "clients": [
+                            {
+                                "id": 1,
+                                "passport_number": "1234567890",
+                                "first_name": "Пётр",
+                                "last_name": "Иванов",
+                                "middle_name": "Сергеевич",
+                                "city_from": "Санкт-Петербург",
+                                "score": 14
+                            },
+                            {
+                                "id": 7,
+                                "passport_number": "1111111111",
+                                "first_name": "Петр",
+                                "last_name": "Ивановский",
+                                "middle_name": None,
+                                "city_from": "Санкт-Петербург",
+                                "score": 10
+                            }
+                        ]
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации. Например, не указан ни один параметр поиска.",
+                examples={
+                    "application/json": {
+                        "non_field_errors": [
+                            "Укажите хотя бы один параметр поиска: q, city, room, start_date или end_date."
+                        ]
+                    }
+                },
+            ),
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        validated_data = serializer.validated_data
+        results = search_clients(
+            query=validated_data.get('q'),
+            city=validated_data.get('city'),
+            room_number=validated_data.get('room'),
+            start_date=validated_data.get('start_date'),
+            end_date=validated_data.get('end_date'),
+            limit=validated_data['limit'],
+        )
+
+        return Response({
+            "count": len(results),
+            "clients": [{**ClientSerializer(client).data, "score": score} for client, score in results]
+        })
+
+
 class RoomsByStatusView(generics.GenericAPIView):
 
     @swagger_auto_schema(
@@ -263,25 +429,193 @@ class RoomsByStatusView(generics.GenericAPIView):
     )
     def get(self, request, *args, **kwargs):
         statuses = request.query_params.get('status', None)
-        rooms_queryset = Room.objects.all()
+        rooms_queryset = RoomSerializer.setup_eager_loading(Room.objects.all())
         if statuses:
-            status_list = [status.strip().upper() for status in statuses.split(',') if status.strip()]
-            valid_statuses = [choice[0] for choice in Room.STATUS_CHOICES]
-            invalid_statuses = [status for status in status_list if status not in valid_statuses]
-            if invalid_statuses:
-                return Response(
-                    {"detail": f"Недопустимые статусы: {invalid_statuses}. Доступные статусы: {valid_statuses}"},
-                    status=422
-                )
+            status_list, error = self.parse_statuses(statuses)
+            if error:
+                return Response({"detail": error}, status=422)
             rooms_queryset = rooms_queryset.filter(status__in=status_list)
-        rooms_count = rooms_queryset.count()
         rooms_data = RoomSerializer(rooms_queryset, many=True).data
 
         return Response({
-            "count": rooms_count,
+            "count": len(rooms_data),
             "rooms": rooms_data
         })
 
+    @staticmethod
+    def parse_statuses(statuses):
+        status_list = [status.strip().upper() for status in statuses.split(',') if status.strip()]
+        valid_statuses = [choice[0] for choice in Room.STATUS_CHOICES]
+        invalid_statuses = [status for status in status_list if status not in valid_statuses]
+        if invalid_statuses:
+            return status_list, f"Недопустимые статусы: {invalid_statuses}. Доступные статусы: {valid_statuses}"
+        return status_list, None
+
+
+class RoomStatusStreamSessionView(generics.GenericAPIView):
+    @swagger_auto_schema(
+        operation_description="Выдать cookie для GET /rooms/stream. Браузерный EventSource не передаёт заголовок "
+                              "Authorization, поэтому поток авторизуется подписанной HttpOnly cookie, которую этот "
+                              "эндпоинт выдаёт по обычному токену. Токен в адресе потока не принимается: "
+                              "он попадал бы в логи сервера и прокси.",
+        responses={
+            200: openapi.Response(
+                description="Cookie установлена.",
+                examples={
+                    "application/json": {
+                        "expires_in": 3600
+                    }
+                },
+            ),
+        },
+    )
+    def post(self, request, *args, **kwargs):
+        response = Response({"expires_in": settings.HOTEL_ROOM_BOARD_STREAM_COOKIE_AGE}, status=200)
+        set_stream_cookie(response, request.user, reverse('room-status-stream'))
+        return response
+
+
+class RoomStatusStreamView(generics.GenericAPIView):
+    authentication_classes = [*api_settings.DEFAULT_AUTHENTICATION_CLASSES, StreamCookieAuthentication]
+
+    @swagger_auto_schema(
+        operation_description="Поток Server-Sent Events со статусами комнат вместо периодического опроса GET /rooms. "
+                              "Первым приходит событие snapshot со всеми комнатами, затем события rooms только с "
+                              "изменившимися комнатами. При переподключении с заголовком Last-Event-ID (EventSource "
+                              "передаёт его сам) присылаются только пропущенные изменения. Если клиент не может "
+                              "передать заголовок Authorization, он авторизуется cookie из POST /rooms/stream/session. "
+                              "Без ASGI число одновременных потоков в процессе ограничено, сверх него возвращается 503.",
+        manual_parameters=[
+            openapi.Parameter(
+                'last_event_id',
+                openapi.IN_QUERY,
+                description="ID последнего полученного события, если нельзя передать заголовок Last-Event-ID.",
+                type=openapi.TYPE_STRING,
+                required=False,
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Поток событий (text/event-stream).",
+                examples={
+                    "text/event-stream": "event: snapshot\nid: 3f2a9c1e:41\n"
+                                         "data: {\"rooms\": [{\"id\": 1, \"number\": 101, \"floor\": 1, "
+                                         "\"type_id\": 1, \"status\": \"AVAILABLE\"}]}\n\n"
+                                         "event: rooms\nid: 3f2a9c1e:42\n"
+                                         "data: {\"rooms\": [{\"id\": 1, \"number\": 101, \"floor\": 1, "
+                                         "\"type_id\": 1, \"status\": \"OCCUPIED\"}]}\n\n"
+                },
+            ),
+            503: openapi.Response(
+                description="Сервер запущен без ASGI, и все места для потоков заняты.",
+                examples={
+                    "application/json": {
+                        "detail": "Слишком много открытых потоков. Повторите позже или подключитесь к серверу ASGI."
+                    }
+                },
+            ),
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        last_event_id = request.headers.get('Last-Event-ID') or request.query_params.get('last_event_id')
+        # Под ASGI поток читается асинхронно и не занимает поток на каждого подписчика.
+        asynchronous = isinstance(request._request, ASGIRequest)
+        if not asynchronous and not sync_stream_slots.acquire():
+            return Response(
+                {"detail": "Слишком много открытых потоков. Повторите позже или подключитесь к серверу ASGI."},
+                status=503,
+                headers={'Retry-After': str(settings.HOTEL_ROOM_BOARD_HEARTBEAT)},
+            )
+
+        try:
+            stream = RoomBoardStream(
+                room_board,
+                last_event_id=last_event_id,
+                heartbeat=settings.HOTEL_ROOM_BOARD_HEARTBEAT,
+                lifetime=settings.HOTEL_ROOM_BOARD_STREAM_LIFETIME,
+            )
+        except Exception:
+            if not asynchronous:
+                sync_stream_slots.release()
+            raise
+
+        content = aiter(stream) if asynchronous else SlotStream(stream, sync_stream_slots)
+        response = StreamingHttpResponse(content, content_type='text/event-stream; charset=utf-8')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class RoomAvailabilityView(generics.GenericAPIView):
+    serializer_class = RoomAvailabilitySerializer
+
+    @swagger_auto_schema(
+        operation_description="Получить номера, свободные на все ночи указанного периода. Ответ строится по индексу "
+                              "занятости в памяти, без просмотра бронирований в базе данных.",
+        manual_parameters=[
+            openapi.Parameter(
+                'type',
+                openapi.IN_QUERY,
+                description="ID типа комнаты. Если не указан, проверяются все комнаты.",
+                type=openapi.TYPE_INTEGER,
+                required=False,
+            ),
+            openapi.Parameter(
+                'from',
+                openapi.IN_QUERY,
+                description="Дата заселения (формат YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=True,
+            ),
+            openapi.Parameter(
+                'to',
+                openapi.IN_QUERY,
+                description="Дата выезда (формат YYYY-MM-DD). Ночь перед выездом входит в период.",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=True,
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Номера комнат, свободных на весь период.",
+                examples={
+                    "application/json": {
+                        "type": 1,
+                        "from": "2024-12-10",
+                        "to": "2024-12-15",
+                        "count": 3,
+                        "rooms": [101, 103, 204]
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, дата выезда раньше даты заселения.",
+                examples={
+                    "application/json": {
+                        "to": ["Дата выезда должна быть позже даты заселения."]
+                    }
+                },
+            ),
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        validated_data = serializer.validated_data
+        type_id = validated_data.get('type')
+        rooms = availability_index.free_rooms(validated_data['from'], validated_data['to'], type_id)
+        return Response({
+            "type": type_id,
+            "from": validated_data['from'],
+            "to": validated_data['to'],
+            "count": len(rooms),
+            "rooms": rooms,
+        })
+
 
 class ClientStayOverlapView(generics.GenericAPIView):
     serializer_class = ClientStayOverlapSerializer
@@ -378,33 +712,11 @@ class ClientStayOverlapView(generics.GenericAPIView):
                 status=404
             )
 
-        client_reservations = Reservation.objects.filter(client=target_client)
-
-        date_filter = Q()
-        if start_date:
-            date_filter &= Q(arrival_date__gte=start_date)
-        if end_date:
-            date_filter &= Q(departure_date__lte=end_date)
-
-        if date_filter:
-            client_reservations = client_reservations.filter(date_filter)
-
-        overlapping_filter = Q()
-        for reservation in client_reservations:
-            overlapping_filter |= Q(arrival_date__lt=reservation.departure_date) & Q(
-                departure_date__gt=reservation.arrival_date)
-
-        if overlapping_filter:
-            overlapping_reservations = Reservation.objects.filter(overlapping_filter).exclude(client=target_client)
-            overlapping_clients_ids = overlapping_reservations.values_list('client_id', flat=True).distinct()
-            overlapping_clients = Client.objects.filter(id__in=overlapping_clients_ids)
-        else:
-            overlapping_clients = Client.objects.none()
-
+        overlapping_clients = find_overlapping_clients(target_client, start_date, end_date)
         clients_data = ClientSerializer(overlapping_clients, many=True).data
 
         return Response({
-            "count": overlapping_clients.count(),
+            "count": len(clients_data),
             "clients": clients_data
         })
 
@@ -484,29 +796,20 @@ class ClientRoomCleaningView(generics.GenericAPIView):
         client_id = validated_data['client_id']
         day_of_week = validated_data['day_of_week']
 
-        try:
-            target_client = Client.objects.get(id=client_id)
-        except Client.DoesNotExist:
-            return Response(
-                {"detail": f"Клиент с id {client_id} не найден."},
-                status=404
-            )
-
-        try:
-            reservation = Reservation.objects.filter(client=target_client).latest('departure_date')
-            room = reservation.room
-        except Reservation.DoesNotExist:
-            return Response(
-                {"detail": f"Нет активных или завершённых бронирований для клиента с id {client_id}."},
-                status=404
-            )
-
-        cleaning_schedules = CleaningSchedule.objects.filter(
-            room=room,
-            cleaning_date__week_day=self.get_day_number(day_of_week)
-        )
+        employees = list(self.get_cleaners(client_id, self.get_day_number(day_of_week)))
+        # Пустой ответ - редкий случай, только тогда выясняем, есть ли клиент и его бронирования.
+        if not employees:
+            if not Client.objects.filter(id=client_id).exists():
+                return Response(
+                    {"detail": f"Клиент с id {client_id} не найден."},
+                    status=404
+                )
+            if not Reservation.objects.filter(client_id=client_id).exists():
+                return Response(
+                    {"detail": f"Нет активных или завершённых бронирований для клиента с id {client_id}."},
+                    status=404
+                )
 
-        employees = [schedule.cleaner.employee for schedule in cleaning_schedules]
         employees_data = CleaningEmployeeSerializer(employees, many=True).data
 
         return Response({
@@ -514,15 +817,30 @@ class ClientRoomCleaningView(generics.GenericAPIView):
             "employees": employees_data
         })
 
-    def get_day_number(self, day_of_week):
+    @staticmethod
+    def get_cleaners(client_id, weekday):
+        # Один запрос: комната последнего бронирования клиента - подзапрос по индексу (client, departure_date),
+        # уборки этой комнаты в день недели - по индексу (room, weekday, cleaning_date, cleaner), уже в нужном порядке.
+        room_id = Reservation.objects.filter(client_id=client_id).order_by('-departure_date').values('room_id')[:1]
+        return Employee.objects.filter(
+            employmentcontract__cleaningschedule__room_id=Subquery(room_id),
+            employmentcontract__cleaningschedule__weekday=weekday,
+        ).order_by(
+            'employmentcontract__cleaningschedule__cleaning_date',
+            'employmentcontract__cleaningschedule__cleaner',
+            'employmentcontract__cleaningschedule__id',
+        )
+
+    @staticmethod
+    def get_day_number(day_of_week):
         days = {
-            'MONDAY': 2,
-            'TUESDAY': 3,
-            'WEDNESDAY': 4,
-            'THURSDAY': 5,
-            'FRIDAY': 6,
-            'SATURDAY': 7,
-            'SUNDAY': 1,
+            'MONDAY': 1,
+            'TUESDAY': 2,
+            'WEDNESDAY': 3,
+            'THURSDAY': 4,
+            'FRIDAY': 5,
+            'SATURDAY': 6,
+            'SUNDAY': 7,
         }
         return days.get(day_of_week.upper(), None)
 
@@ -637,13 +955,21 @@ class EmployeeManagementView(generics.GenericAPIView):
                     status=422
                 )
             position = EmployeePosition.objects.get(id=validated_data['position_id'])
-            contract = EmploymentContract.objects.create(
-                employee=employee,
-                position=position,
-                contract_type=validated_data['contract_type'],
-                start_date=validated_data['start_date'],
-                end_date=validated_data.get('end_date')
-            )
+            try:
+                with transaction.atomic():
+                    contract = EmploymentContract.objects.create(
+                        employee=employee,
+                        position=position,
+                        contract_type=validated_data['contract_type'],
+                        start_date=validated_data['start_date'],
+                        end_date=validated_data.get('end_date')
+                    )
+            except IntegrityError:
+                # Параллельный запрос успел нанять этого сотрудника: активный контракт может быть только один.
+                return Response(
+                    {"detail": "У сотрудника уже есть активный контракт."},
+                    status=422
+                )
 
             contract_serializer = EmploymentContractDetailSerializer(contract)
             return Response(contract_serializer.data, status=201)
@@ -840,59 +1166,148 @@ class EmployeeManagementView(generics.GenericAPIView):
         return Response(serializer.errors, status=422)
 
 
-class CleaningScheduleManagementView(generics.GenericAPIView):
-    serializer_class = UpdateCleaningScheduleSerializer
+class EmployeeBulkHireView(generics.GenericAPIView):
+    serializer_class = BulkHireEmployeesSerializer
 
     @swagger_auto_schema(
-        operation_description="Обновить расписание уборок для сотрудника.",
+        operation_description="Принять на работу сразу список сотрудников. Каждая строка проверяется отдельно: "
+                              "строки с ошибками пропускаются, остальные сотрудники и контракты создаются.",
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             properties={
-                'cleaner_id': openapi.Schema(
-                    type=openapi.TYPE_INTEGER,
-                    description="ID сотрудника (уборщика), для которого обновляется расписание.",
-                ),
-                'cleaning_dates': openapi.Schema(
-                    type=openapi.TYPE_ARRAY,
-                    items=openapi.Items(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
-                    description="Список дат уборки (формат YYYY-MM-DD).",
-                ),
-                'room_ids': openapi.Schema(
+                'employees': openapi.Schema(
                     type=openapi.TYPE_ARRAY,
-                    items=openapi.Items(type=openapi.TYPE_INTEGER),
-                    description="Список ID комнат, которые сотрудник будет убирать.",
+                    description="Список сотрудников (не более 1000) в том же формате, что и при найме одного сотрудника.",
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'passport_number': openapi.Schema(type=openapi.TYPE_STRING),
+                            'first_name': openapi.Schema(type=openapi.TYPE_STRING),
+                            'last_name': openapi.Schema(type=openapi.TYPE_STRING),
+                            'middle_name': openapi.Schema(type=openapi.TYPE_STRING, nullable=True),
+                            'position_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                            'contract_type': openapi.Schema(
+                                type=openapi.TYPE_STRING,
+                                enum=['FIXED_TERM', 'PERMANENT', 'CIVIL_CONTRACT'],
+                            ),
+                            'start_date': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+                            'end_date': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE,
+                                                       nullable=True),
+                        },
+                        required=['passport_number', 'first_name', 'last_name', 'position_id', 'contract_type',
+                                  'start_date'],
+                    ),
                 ),
             },
-            required=['cleaner_id', 'cleaning_dates', 'room_ids'],
+            required=['employees'],
         ),
         responses={
             200: openapi.Response(
-                description="Расписание уборок успешно обновлено.",
+                description="Результат для каждой строки в порядке запроса.",
                 examples={
                     "application/json": {
-                        "detail": "Расписание успешно обновлено."
+                        "hired": 1,
+                        "failed": 1,
+                        "results": [
+                            {
+                                "row": 1,
+                                "passport_number": "1234567890",
+                                "ok": True,
+                                "created": True,
+                                "employee_id": 10,
+                                "contract_id": 15
+                            },
+                            {
+                                "row": 2,
+                                "passport_number": "0987654321",
+                                "ok": False,
+                                "errors": {"position_id": ["Должность с id 99 не найдена."]}
+                            }
+                        ]
                     }
                 },
             ),
             422: openapi.Response(
-                description="Ошибки валидации данных. Например, указаны недопустимые комнаты, отсутствующий сотрудник или некорректные даты.",
+                description="Ошибки валидации данных. Например, пустой список.",
                 examples={
                     "application/json": {
-                        "detail": "Указанный служащий не найден или не имеет активного контракта.",
-                        "missing_rooms": "Следующие номера комнат не найдены: 101, 102."
+                        "employees": ["This list may not be empty."]
                     }
                 },
             ),
         },
     )
-    def patch(self, request, *args, **kwargs):
+    def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
-        if serializer.is_valid():
-            validated_data = serializer.validated_data
-
-            cleaner_id = validated_data['cleaner_id']
-            cleaning_dates = validated_data['cleaning_dates']
-            room_numbers = validated_data['room_ids']
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        results = hire_employees(serializer.validated_data['employees'])
+        hired = sum(1 for result in results if result['ok'])
+        return Response(
+            {
+                "hired": hired,
+                "failed": len(results) - hired,
+                "results": results,
+            },
+            status=200
+        )
+
+
+class CleaningScheduleManagementView(generics.GenericAPIView):
+    serializer_class = UpdateCleaningScheduleSerializer
+
+    @swagger_auto_schema(
+        operation_description="Обновить расписание уборок для сотрудника.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'cleaner_id': openapi.Schema(
+                    type=openapi.TYPE_INTEGER,
+                    description="ID сотрудника (уборщика), для которого обновляется расписание.",
+                ),
+                'cleaning_dates': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Items(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+                    description="Список дат уборки (формат YYYY-MM-DD).",
+                ),
+                'room_ids': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Items(type=openapi.TYPE_INTEGER),
+                    description="Список ID комнат, которые сотрудник будет убирать.",
+                ),
+            },
+            required=['cleaner_id', 'cleaning_dates', 'room_ids'],
+        ),
+        responses={
+            200: openapi.Response(
+                description="Расписание уборок успешно обновлено.",
+                examples={
+                    "application/json": {
+                        "detail": "Расписание успешно обновлено."
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, указаны недопустимые комнаты, отсутствующий сотрудник или некорректные даты.",
+                examples={
+                    "application/json": {
+                        "detail": "Указанный служащий не найден или не имеет активного контракта.",
+                        "missing_rooms": "Следующие номера комнат не найдены: 101, 102."
+                    }
+                },
+            ),
+        },
+    )
+    def patch(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if serializer.is_valid():
+            validated_data = serializer.validated_data
+
+            # cleaner_id - ID сотрудника, а в расписании хранится его активный контракт.
+            cleaner_id = active_contracts_for([validated_data['cleaner_id']])[validated_data['cleaner_id']]
+            cleaning_dates = validated_data['cleaning_dates']
+            room_numbers = validated_data['room_ids']
 
             with transaction.atomic():
                 rooms = Room.objects.filter(number__in=room_numbers)
@@ -907,18 +1322,111 @@ class CleaningScheduleManagementView(generics.GenericAPIView):
                     CleaningSchedule(
                         cleaner_id=cleaner_id,
                         room=room,
-                        cleaning_date=cleaning_date
+                        cleaning_date=cleaning_date,
+                        weekday=CleaningSchedule.weekday_for_date(cleaning_date)
                     )
                     for cleaning_date in cleaning_dates
                     for room in rooms
                 ]
                 CleaningSchedule.objects.bulk_create(schedules)
+                bump_table_versions(CleaningSchedule)
 
             return Response({"detail": "Расписание успешно обновлено."})
 
         return Response(serializer.errors, status=422)
 
 
+class CleaningScheduleGenerateView(generics.GenericAPIView):
+    serializer_class = GenerateCleaningScheduleSerializer
+
+    @swagger_auto_schema(
+        operation_description="Составить расписание уборок для комнат, выбранных по этажам, типам или статусам, "
+                              "на каждый день периода. Комнаты поровну делятся между уборщиками. Уже существующие "
+                              "совпадающие записи не перезаписываются, начатые и завершённые уборки не изменяются.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'floors': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                    description="Этажи (необязательно).",
+                ),
+                'room_type_ids': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                    description="ID типов комнат (необязательно).",
+                ),
+                'room_statuses': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_STRING,
+                        enum=['AVAILABLE', 'OCCUPIED', 'REQUIRES_CLEANING', 'CLEANING_IN_PROGRESS', 'MAINTENANCE'],
+                    ),
+                    description="Статусы комнат (необязательно).",
+                ),
+                'start_date': openapi.Schema(
+                    type=openapi.TYPE_STRING,
+                    format=openapi.FORMAT_DATE,
+                    description="Первый день расписания (формат YYYY-MM-DD).",
+                ),
+                'end_date': openapi.Schema(
+                    type=openapi.TYPE_STRING,
+                    format=openapi.FORMAT_DATE,
+                    description="Последний день расписания включительно (формат YYYY-MM-DD).",
+                ),
+                'cleaner_ids': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                    description="ID сотрудников-уборщиков с активным контрактом.",
+                ),
+                'dry_run': openapi.Schema(
+                    type=openapi.TYPE_BOOLEAN,
+                    description="Только посчитать изменения, ничего не записывая.",
+                ),
+            },
+            required=['start_date', 'end_date', 'cleaner_ids'],
+        ),
+        responses={
+            200: openapi.Response(
+                description="Расписание составлено.",
+                examples={
+                    "application/json": {
+                        "rooms": 20,
+                        "days": 30,
+                        "created": 540,
+                        "reassigned": 30,
+                        "unchanged": 25,
+                        "removed": 0,
+                        "kept": 5,
+                        "dry_run": False,
+                        "cleaners": [
+                            {"employee_id": 5, "rooms": 10},
+                            {"employee_id": 7, "rooms": 10}
+                        ]
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, у сотрудника нет активного контракта или не найдено комнат.",
+                examples={
+                    "application/json": {
+                        "cleaner_ids": "Сотрудники не найдены или не имеют активного контракта: 12."
+                    }
+                },
+            ),
+        },
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        summary = generate_schedule_summary(serializer.validated_data)
+        if summary is None:
+            return Response({"detail": "Не найдено ни одной комнаты по указанным условиям."}, status=422)
+        return Response(summary)
+
+
 class ReservationManagementView(generics.GenericAPIView):
     serializer_classes = {
         'post': CreateReservationSerializer,
@@ -1026,7 +1534,7 @@ class ReservationManagementView(generics.GenericAPIView):
             status = request.data.get('status', None)
             payment_status = request.data.get('payment_status', None)
 
-            with transaction.atomic():
+            def create_reservation():
                 client, created = Client.objects.get_or_create(
                     passport_number=passport_number,
                     defaults={
@@ -1046,7 +1554,7 @@ class ReservationManagementView(generics.GenericAPIView):
 
                 total_price = self.calculate_total_price(room, arrival_date, departure_date)
 
-                reservation = Reservation.objects.create(
+                return Reservation.objects.create(
                     client=client,
                     room=room,
                     admin=request.user,
@@ -1059,8 +1567,14 @@ class ReservationManagementView(generics.GenericAPIView):
                     final_price=total_price,
                 )
 
-                room.status = 'OCCUPIED'
-                room.save()
+            try:
+                # Комната помечается занятой в той же транзакции, что и вставка бронирования.
+                reservation = book_room(room, arrival_date, departure_date, create_reservation)
+            except BookingConflict as error:
+                return Response({"room_number": str(error)}, status=422)
+            except PriceCalendarError as error:
+                return Response({"detail": str(error)}, status=422)
+            client = reservation.client
 
             return Response(
                 {
@@ -1152,19 +1666,20 @@ class ReservationManagementView(generics.GenericAPIView):
     def patch(self, request, *args, **kwargs):
         reservation_id = kwargs.get('reservation_id')
 
-        try:
-            reservation = Reservation.objects.select_for_update().get(id=reservation_id)
-        except Reservation.DoesNotExist:
-            return Response(
-                {"detail": "Бронирование с указанным ID не найдено."},
-                status=404
-            )
-
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             validated_data = serializer.validated_data
 
             with transaction.atomic():
+                try:
+                    reservation = Reservation.objects.select_for_update().select_related('room', 'client').get(
+                        id=reservation_id)
+                except Reservation.DoesNotExist:
+                    return Response(
+                        {"detail": "Бронирование с указанным ID не найдено."},
+                        status=404
+                    )
+
                 if 'arrival_date' in validated_data:
                     reservation.arrival_date = validated_data['arrival_date']
                 if 'departure_date' in validated_data:
@@ -1174,11 +1689,9 @@ class ReservationManagementView(generics.GenericAPIView):
                 if 'status' in validated_data:
                     reservation.status = validated_data['status']
 
-                    if validated_data['status'] in ['CANCELED', 'CHECKED_OUT']:
-                        if validated_data['status'] == 'CANCELED' and previous_status != 'CHECKED_IN':
-                            reservation.room.status = 'AVAILABLE'
-                        elif validated_data['status'] == 'CHECKED_OUT' and previous_status == 'CHECKED_IN':
-                            reservation.room.status = 'REQUIRES_CLEANING'
+                    room_status = room_status_after(previous_status, validated_data['status'])
+                    if room_status is not None:
+                        reservation.room.status = room_status
                         reservation.room.save()
 
                 if 'payment_status' in validated_data:
@@ -1190,12 +1703,25 @@ class ReservationManagementView(generics.GenericAPIView):
                     reservation.room.status = 'OCCUPIED'
                     reservation.room.save()
 
+                dates_changed = 'arrival_date' in validated_data or 'departure_date' in validated_data
+                if (dates_changed or 'room' in validated_data) and reservation.status in BLOCKING_STATUSES:
+                    try:
+                        ensure_room_free(reservation.room_id, reservation.arrival_date, reservation.departure_date,
+                                         exclude_reservation_id=reservation.id)
+                    except BookingConflict as error:
+                        transaction.set_rollback(True)
+                        return Response({"room_number": str(error)}, status=422)
+
                 if 'arrival_date' in validated_data or 'departure_date' in validated_data or 'room' in validated_data:
-                    reservation.price_at_booking = self.calculate_total_price(
-                        reservation.room,
-                        reservation.arrival_date,
-                        reservation.departure_date
-                    )
+                    try:
+                        reservation.price_at_booking = self.calculate_total_price(
+                            reservation.room,
+                            reservation.arrival_date,
+                            reservation.departure_date
+                        )
+                    except PriceCalendarError as error:
+                        transaction.set_rollback(True)
+                        return Response({"detail": str(error)}, status=422)
 
                 reservation.updated_by = request.user
                 reservation.last_updated_date = timezone.now()
@@ -1218,25 +1744,191 @@ class ReservationManagementView(generics.GenericAPIView):
         return Response(serializer.errors, status=422)
 
     def calculate_total_price(self, room, arrival_date, departure_date):
-        total_price = 0
-        current_date = arrival_date
+        return room_type_total(room.type_id, arrival_date, departure_date)
 
-        price_history = RoomPriceHistory.objects.filter(
-            room_type=room.type
-        ).order_by('start_date')
 
-        while current_date < departure_date:
-            for price_period in price_history:
-                if price_period.start_date <= current_date and (
-                        price_period.end_date is None or price_period.end_date >= current_date):
-                    total_price += price_period.price
-                    break
+class ReservationBulkStatusView(generics.GenericAPIView):
+    serializer_class = BulkReservationStatusSerializer
 
-            current_date += timedelta(days=1)
-        return total_price
+    @swagger_auto_schema(
+        operation_description="Массово заселить, выселить или отменить бронирования. Все бронирования и их комнаты "
+                              "блокируются и обновляются в одной транзакции; результат возвращается для каждого "
+                              "элемента отдельно, ошибочные элементы не мешают остальным.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'items': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    description="Список изменений статуса (не более 1000).",
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'reservation_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                            'status': openapi.Schema(
+                                type=openapi.TYPE_STRING,
+                                enum=['CHECKED_IN', 'CHECKED_OUT', 'CANCELLED'],
+                            ),
+                        },
+                        required=['reservation_id', 'status'],
+                    ),
+                ),
+            },
+            required=['items'],
+        ),
+        responses={
+            200: openapi.Response(
+                description="Результат для каждого элемента в порядке запроса.",
+                examples={
+                    "application/json": {
+                        "updated": 1,
+                        "failed": 1,
+                        "results": [
+                            {
+                                "reservation_id": 1,
+                                "status": "CHECKED_IN",
+                                "ok": True,
+                                "previous_status": "CONFIRMED",
+                                "room_number": 101,
+                                "room_status": "OCCUPIED"
+                            },
+                            {
+                                "reservation_id": 2,
+                                "status": "CHECKED_OUT",
+                                "ok": False,
+                                "previous_status": "BOOKED",
+                                "detail": "Переход из статуса BOOKED в CHECKED_OUT недопустим."
+                            }
+                        ]
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, пустой список или неизвестный статус.",
+                examples={
+                    "application/json": {
+                        "items": {"0": {"status": ["\"BOOKED\" is not a valid choice."]}}
+                    }
+                },
+            ),
+        },
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        results = apply_status_transitions(serializer.validated_data['items'], request.user)
+        updated = sum(1 for result in results if result['ok'])
+        return Response(
+            {
+                "updated": updated,
+                "failed": len(results) - updated,
+                "results": results,
+            },
+            status=200
+        )
 
 
-class QuarterlyReportView(generics.GenericAPIView):
+class ReservationQuoteView(generics.GenericAPIView):
+    serializer_class = ReservationQuoteSerializer
+
+    @swagger_auto_schema(
+        operation_description="Рассчитать стоимость проживания сразу для набора комнат и периодов без создания бронирований.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'items': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    description="Список комбинаций номер комнаты / даты проживания (не более 1000).",
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'room_number': openapi.Schema(type=openapi.TYPE_INTEGER),
+                            'arrival_date': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+                            'departure_date': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+                        },
+                        required=['room_number', 'arrival_date', 'departure_date'],
+                    ),
+                ),
+            },
+            required=['items'],
+        ),
+        responses={
+            200: openapi.Response(
+                description="Стоимость для каждой комбинации в порядке запроса.",
+                examples={
+                    "application/json": {
+                        "count": 2,
+                        "quotes": [
+                            {
+                                "room_number": 101,
+                                "arrival_date": "2024-12-10",
+                                "departure_date": "2024-12-15",
+                                "nights": 5,
+                                "total_price": 25000
+                            },
+                            {
+                                "room_number": 999,
+                                "arrival_date": "2024-12-10",
+                                "departure_date": "2024-12-12",
+                                "nights": 2,
+                                "total_price": None,
+                                "detail": "Комната с номером 999 не найдена."
+                            }
+                        ]
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, пустой список или некорректные даты.",
+                examples={
+                    "application/json": {
+                        "items": {"0": {"departure_date": ["Дата выезда должна быть позже даты заселения."]}}
+                    }
+                },
+            ),
+        },
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        items = serializer.validated_data['items']
+
+        room_types = dict(
+            Room.objects.filter(number__in={item['room_number'] for item in items}).values_list('number', 'type_id')
+        )
+        calendars = load_price_calendars(room_types.values())
+
+        quotes = [self.build_quote(item, room_types, calendars) for item in items]
+        return Response({"count": len(quotes), "quotes": quotes}, status=200)
+
+    @staticmethod
+    def build_quote(item, room_types, calendars):
+        room_number = item['room_number']
+        arrival_date = item['arrival_date']
+        departure_date = item['departure_date']
+
+        quote = {
+            "room_number": room_number,
+            "arrival_date": arrival_date,
+            "departure_date": departure_date,
+            "nights": (departure_date - arrival_date).days,
+            "total_price": None,
+        }
+        if room_number not in room_types:
+            quote["detail"] = f"Комната с номером {room_number} не найдена."
+        else:
+            try:
+                quote["total_price"] = calendars[room_types[room_number]].total(arrival_date, departure_date)
+            except PriceCalendarError as error:
+                quote["detail"] = str(error)
+        return quote
+
+
+class QuarterlyReportView(ConditionalGetMixin, generics.GenericAPIView):
+    versioned_models = (RoomDayFact, Room)
 
     @swagger_auto_schema(
         operation_description="Сформировать отчет о работе гостиницы за указанный квартал текущего или прошлого года.",
@@ -1298,71 +1990,256 @@ class QuarterlyReportView(generics.GenericAPIView):
         year = serializer.validated_data['year']
 
         start_date, end_date = self.get_quarter_date_range(quarter, year)
+        report = cached_report('quarterly', year, quarter, start_date, end_date)
 
-        # Число клиентов за период в каждом номере
-        clients_per_room = (
-            Reservation.objects.filter(
-                arrival_date__gte=start_date,
-                departure_date__lte=end_date,
-                status__in=['BOOKED', 'CONFIRMED', 'CHECKED_IN', 'CHECKED_OUT']
-            )
-            .values('room__number')
-            .annotate(client_count=Count('id'))
-            .order_by('room__number')
-        )
+        return Response(report, status=200)
 
-        # Количество номеров на каждом этаже
-        rooms_per_floor = (
-            Room.objects.annotate(
-                floor=ExpressionWrapper(
-                    Substr(F('number'), 1, 1),
-                    output_field=IntegerField()
-                )
-            )
-            .values('floor')
-            .annotate(room_count=Count('id'))
-            .order_by('floor')
-        )
+    @staticmethod
+    def get_quarter_date_range(quarter, year):
+        return quarter_date_range(quarter, year)
 
-        # Общая сумма дохода за каждый номер
-        income_per_room = (
-            Reservation.objects.filter(
-                arrival_date__gte=start_date,
-                departure_date__lte=end_date,
-                payment_status__in=['PREPAID', 'PAID'],
-            )
-            .values('room__number')
-            .annotate(total_income=Sum('price_at_booking'))
-            .order_by('room__number')
-        )
 
-        # Суммарный доход по всей гостинице
-        total_income = (
-                           Reservation.objects.filter(
-                               arrival_date__gte=start_date,
-                               departure_date__lte=end_date,
-                               payment_status__in=['PREPAID', 'PAID']
-                           )
-                           .aggregate(total_income=Sum('price_at_booking'))['total_income']
-                       ) or 0
-
-        report = {
-            "clients_per_room": list(clients_per_room),
-            "rooms_per_floor": list(rooms_per_floor),
-            "income_per_room": list(income_per_room),
-            "total_income": total_income,
-            "start_date": start_date,
-            "end_date": end_date
-        }
+class PeriodReportView(ConditionalGetMixin, generics.GenericAPIView):
+    serializer_class = PeriodReportSerializer
+    versioned_models = (RoomDayFact, Room)
 
+    @swagger_auto_schema(
+        operation_description="Сформировать отчет о работе гостиницы за месяц или произвольный период.",
+        manual_parameters=[
+            openapi.Parameter(
+                'year',
+                openapi.IN_QUERY,
+                description="Год отчета. Указывается вместе с параметром month.",
+                type=openapi.TYPE_INTEGER,
+                required=False,
+            ),
+            openapi.Parameter(
+                'month',
+                openapi.IN_QUERY,
+                description="Номер месяца (1-12). Указывается вместе с параметром year.",
+                type=openapi.TYPE_INTEGER,
+                required=False,
+            ),
+            openapi.Parameter(
+                'start_date',
+                openapi.IN_QUERY,
+                description="Начало периода (формат YYYY-MM-DD). Указывается вместе с end_date вместо year и month.",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=False,
+            ),
+            openapi.Parameter(
+                'end_date',
+                openapi.IN_QUERY,
+                description="Конец периода включительно (формат YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=False,
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Успешно сформированный отчет за период. Формат совпадает с квартальным отчетом.",
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, не указан период или конец раньше начала.",
+                examples={
+                    "application/json": {
+                        "non_field_errors": ["Укажите year и month либо start_date и end_date."]
+                    }
+                },
+            ),
+        },
+    )
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        validated_data = serializer.validated_data
+        if 'month' in validated_data and 'year' in validated_data:
+            report = cached_report('monthly', validated_data['year'], validated_data['month'],
+                                   validated_data['start_date'], validated_data['end_date'])
+        else:
+            report = build_occupancy_report(validated_data['start_date'], validated_data['end_date'])
         return Response(report, status=200)
 
-    def get_quarter_date_range(self, quarter, year):
-        start_month = (quarter - 1) * 3 + 1
-        end_month = start_month + 2
 
-        start_date = datetime(year, start_month, 1)
-        last_day = calendar.monthrange(year, end_month)[1]
-        end_date = datetime(year, end_month, last_day)
+class ExportView(generics.GenericAPIView):
+    serializer_class = ExportSerializer
+
+    @swagger_auto_schema(
+        operation_description="Выгрузить все бронирования или всех клиентов потоком в формате NDJSON или CSV. "
+                              "Ответ формируется по частям, поэтому потребление памяти не зависит от размера таблицы.",
+        manual_parameters=[
+            openapi.Parameter(
+                'dataset',
+                openapi.IN_PATH,
+                description="Что выгрузить: reservations или clients.",
+                type=openapi.TYPE_STRING,
+                enum=list(EXPORTS),
+                required=True,
+            ),
+            openapi.Parameter(
+                'output',
+                openapi.IN_QUERY,
+                description="Формат выгрузки: ndjson (по умолчанию) или csv.",
+                type=openapi.TYPE_STRING,
+                enum=list(EXPORT_OUTPUTS),
+                required=False,
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Выгрузка: по одному JSON-объекту на строку (NDJSON) либо CSV с заголовком.",
+                examples={
+                    "application/x-ndjson": '{"id":1,"passport_number":"1234567890","first_name":"Иван",'
+                                            '"last_name":"Иванов","middle_name":null,"city_from":"Москва"}',
+                },
+            ),
+            404: openapi.Response(
+                description="Неизвестный набор данных.",
+                examples={"application/json": {"detail": "Выгрузка 'rooms' не поддерживается."}},
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных.",
+                examples={"application/json": {"output": ["Значения xml нет среди допустимых вариантов."]}},
+            ),
+        },
+    )
+    def get(self, request, dataset, *args, **kwargs):
+        if dataset not in EXPORTS:
+            return Response({"detail": f"Выгрузка '{dataset}' не поддерживается."}, status=404)
+
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        output = serializer.validated_data['output']
+        content = stream_export(dataset, output)
+        # Под ASGI порции читаются асинхронно, как в RoomStatusStreamView.
+        if isinstance(request._request, ASGIRequest):
+            content = aiter_export(content)
+        response = StreamingHttpResponse(content, content_type=EXPORT_OUTPUTS[output])
+        response['Content-Disposition'] = f'attachment; filename="{dataset}.{output}"'
+        return response
+
+
+class JobCreateView(generics.GenericAPIView):
+    serializer_class = CreateJobSerializer
+
+    @swagger_auto_schema(
+        operation_description="Поставить долгую операцию в очередь фоновых задач. Задачу выполняет команда "
+                              "run_hotel_worker, состояние и результат доступны по GET /jobs/<id>. Параметры "
+                              "задачи совпадают с параметрами синхронного эндпоинта: quarterly_report - "
+                              "/reports/quarterly, period_report - /reports/period, generate_cleaning_schedule - "
+                              "/cleaning-schedules/generate, bulk_hire - /employees/bulk-hire (до 50000 строк).",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'kind': openapi.Schema(type=openapi.TYPE_STRING, enum=list(JOB_KINDS), description="Тип задачи."),
+                'payload': openapi.Schema(type=openapi.TYPE_OBJECT, description="Параметры задачи."),
+                'priority': openapi.Schema(
+                    type=openapi.TYPE_INTEGER,
+                    description="Приоритет от -100 до 100, задачи с большим приоритетом выполняются раньше. "
+                                "По умолчанию зависит от типа задачи.",
+                ),
+            },
+            required=['kind'],
+        ),
+        responses={
+            202: openapi.Response(
+                description="Задача поставлена в очередь. Адрес для опроса - в заголовке Location.",
+                examples={
+                    "application/json": {
+                        "id": 42,
+                        "kind": "quarterly_report",
+                        "status": "PENDING",
+                        "priority": 10,
+                        "progress": 0,
+                        "progress_message": "",
+                        "attempts": 0,
+                        "max_attempts": 3,
+                        "result": None,
+                        "error": None,
+                        "created_at": "2024-04-02T10:15:00Z",
+                        "started_at": None,
+                        "finished_at": None
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Неизвестный тип задачи или ошибки в параметрах.",
+                examples={
+                    "application/json": {
+                        "payload": {"quarter": ["Ensure this value is less than or equal to 4."]}
+                    }
+                },
+            ),
+        },
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        validated_data = serializer.validated_data
+        kind = validated_data['kind']
+        if kind not in JOB_KINDS:
+            return Response(
+                {"kind": [f"Неизвестный тип задачи '{kind}'. Доступны: {', '.join(JOB_KINDS)}."]},
+                status=422
+            )
+
+        # Параметры проверяются сразу, чтобы ошибка пришла в ответе, а не в задаче. Обработчик проверит их
+        # ещё раз перед запуском: к тому времени данные могут измениться.
+        payload_serializer = JOB_KINDS[kind].serializer_class(data=validated_data['payload'])
+        if not payload_serializer.is_valid():
+            return Response({"payload": payload_serializer.errors}, status=422)
+
+        job = enqueue_job(kind, validated_data['payload'], validated_data.get('priority'), request.user)
+        response = Response(JobSerializer(job).data, status=202)
+        response['Location'] = request.build_absolute_uri(reverse('job-detail', args=[job.id]))
+        return response
+
+
+class JobDetailView(generics.GenericAPIView):
+    serializer_class = JobSerializer
 
-        return start_date, end_date
+    @swagger_auto_schema(
+        operation_description="Состояние фоновой задачи: статус (PENDING, RUNNING, SUCCEEDED, FAILED), процент "
+                              "выполнения, число попыток и результат. Пользователь видит только свои задачи, "
+                              "сотрудник с is_staff - все.",
+        responses={
+            200: openapi.Response(
+                description="Состояние задачи. У выполненной задачи result совпадает с ответом синхронного эндпоинта.",
+                examples={
+                    "application/json": {
+                        "id": 43,
+                        "kind": "bulk_hire",
+                        "status": "RUNNING",
+                        "priority": -10,
+                        "progress": 40,
+                        "progress_message": "Обработано строк: 2000 из 5000.",
+                        "attempts": 1,
+                        "max_attempts": 1,
+                        "result": None,
+                        "error": None,
+                        "created_at": "2024-04-02T10:15:00Z",
+                        "started_at": "2024-04-02T10:15:01Z",
+                        "finished_at": None
+                    }
+                },
+            ),
+            404: openapi.Response(
+                description="Задача не найдена.",
+                examples={"application/json": {"detail": "Задача с id 99 не найдена."}},
+            ),
+        },
+    )
+    def get(self, request, job_id, *args, **kwargs):
+        jobs = Job.objects.all() if request.user.is_staff else Job.objects.filter(created_by=request.user)
+        job = jobs.filter(id=job_id).first()
+        if job is None:
+            return Response({"detail": f"Задача с id {job_id} не найдена."}, status=404)
+        return Response(JobSerializer(job).data)
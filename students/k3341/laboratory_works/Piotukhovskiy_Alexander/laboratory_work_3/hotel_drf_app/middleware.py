@@ -0,0 +1,290 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in sorted(labels.items())) + '}'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._help = {}
+        self._histograms = {}
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(DURATION_BUCKETS) + 1), 0.0]
+            histogram[0][bisect_left(DURATION_BUCKETS, value)] += 1
+            histogram[1] += value
+
+    def value(self, name, **labels):
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(buckets), total)) for key, (buckets, total) in self._histograms.items())
+
+        lines = []
+        described = set()
+        for (name, labels), value in counters:
+            if name not in described:
+                described.add(name)
+                lines.append(f'# HELP {name} {self._help.get(name, name)}')
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{_format_labels(dict(labels))} {value:g}')
+
+        for (name, labels), (buckets, total) in histograms:
+            if name not in described:
+                described.add(name)
+                lines.append(f'# HELP {name} {self._help.get(name, name)}')
+                lines.append(f'# TYPE {name} histogram')
+            labels = dict(labels)
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS + ('+Inf',), buckets):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels({**labels, "le": bound})} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {total:g}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+metrics.describe('hotel_http_requests_total', 'Количество обработанных запросов.')
+metrics.describe('hotel_http_db_queries_total', 'Количество SQL-запросов.')
+metrics.describe('hotel_http_db_seconds_total', 'Время, проведённое в базе данных.')
+metrics.describe('hotel_http_app_seconds_total', 'Время работы представлений и сериализаторов без учёта базы данных.')
+metrics.describe('hotel_http_render_seconds_total', 'Время рендеринга ответа.')
+metrics.describe('hotel_http_response_bytes_total', 'Размер тел ответов.')
+metrics.describe('hotel_http_budget_violations_total', 'Количество превышений бюджета запроса.')
+metrics.describe('hotel_http_request_duration_seconds', 'Полное время обработки запроса.')
+
+
+class RequestTiming:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_started = None
+        self.render_time = 0.0
+
+    def track_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def finish_render(self, response):
+        if self.render_started is not None:
+            self.render_time = time.perf_counter() - self.render_started
+
+
+# Замеры текущего запроса. Переменная контекста видна и в потоках, где async-представления выполняют запросы
+# к базе через sync_to_async, поэтому запросы учитываются и при работе через ASGI.
+current_timing = ContextVar('hotel_request_timing', default=None)
+
+
+def track_query(execute, sql, params, many, context):
+    timing = current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    return timing.track_query(execute, sql, params, many, context)
+
+
+def install_query_tracking(connection, **kwargs):
+    if track_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_query)
+
+
+connection_created.connect(install_query_tracking)
+
+
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def start(self, request):
+        # Соединения, открытые до загрузки middleware, не получили сигнал connection_created.
+        for connection in connections.all(initialized_only=True):
+            install_query_tracking(connection)
+        timing = RequestTiming()
+        request.request_timing = timing
+        return timing, current_timing.set(timing)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timing, token = self.start(request)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        return self.finish(request, response, timing, started)
+
+    async def __acall__(self, request):
+        timing, token = self.start(request)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        return self.finish(request, response, timing, started)
+
+    def process_template_response(self, request, response):
+        timing = getattr(request, 'request_timing', None)
+        if timing is not None:
+            timing.render_started = time.perf_counter()
+            response.add_post_render_callback(timing.finish_render)
+        return response
+
+    def finish(self, request, response, timing, started):
+        total_time = time.perf_counter() - started
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timing.db_time * 1000:.2f};desc="{timing.queries} queries"',
+            f'app;dur={self.app_time(timing, total_time) * 1000:.2f}',
+            f'render;dur={timing.render_time * 1000:.2f}',
+            f'total;dur={total_time * 1000:.2f}',
+        ])
+        if not response.streaming:
+            self.record(request, response, timing, total_time, len(response.content))
+            return response
+
+        # Тело StreamingHttpResponse (экспорт, доска комнат) строится уже после отправки заголовков, и его запросы
+        # к базе выполняются вне этого вызова. Поэтому Server-Timing описывает только время до начала потока,
+        # а метрики и бюджет записываются, когда поток прочитан или закрыт, и учитывают весь поток.
+        track = self.track_async_stream if response.is_async else self.track_stream
+        response.streaming_content = track(response.streaming_content, request, response, timing, started)
+        return response
+
+    def track_stream(self, content, request, response, timing, started):
+        iterator = iter(content)
+        size = 0
+        try:
+            while True:
+                token = current_timing.set(timing)
+                try:
+                    chunk = next(iterator, None)
+                finally:
+                    current_timing.reset(token)
+                if chunk is None:
+                    break
+                size += len(chunk)
+                yield chunk
+        finally:
+            self.record(request, response, timing, time.perf_counter() - started, size)
+
+    async def track_async_stream(self, content, request, response, timing, started):
+        iterator = aiter(content)
+        size = 0
+        try:
+            while True:
+                token = current_timing.set(timing)
+                try:
+                    chunk = await anext(iterator, None)
+                finally:
+                    current_timing.reset(token)
+                if chunk is None:
+                    break
+                size += len(chunk)
+                yield chunk
+        finally:
+            self.record(request, response, timing, time.perf_counter() - started, size)
+
+    @staticmethod
+    def app_time(timing, total_time):
+        return max(total_time - timing.db_time - timing.render_time, 0.0)
+
+    def record(self, request, response, timing, total_time, size):
+        match = request.resolver_match
+        route = match.route if match else 'unmatched'
+        route_name = match.url_name if match else None
+        app_time = self.app_time(timing, total_time)
+
+        labels = {'route': route, 'method': request.method}
+        metrics.inc('hotel_http_requests_total', status=response.status_code, **labels)
+        metrics.inc('hotel_http_db_queries_total', timing.queries, **labels)
+        metrics.inc('hotel_http_db_seconds_total', timing.db_time, **labels)
+        metrics.inc('hotel_http_app_seconds_total', app_time, **labels)
+        metrics.inc('hotel_http_render_seconds_total', timing.render_time, **labels)
+        metrics.inc('hotel_http_response_bytes_total', size, **labels)
+        metrics.observe('hotel_http_request_duration_seconds', total_time, **labels)
+
+        self.check_budget(route, route_name, request, timing, total_time, size)
+
+    def check_budget(self, route, route_name, request, timing, total_time, size):
+        budgets = getattr(settings, 'HOTEL_REQUEST_BUDGETS', {})
+        budget = {**budgets.get('default', {}), **budgets.get(route_name, {})}
+
+        actual = {
+            'queries': timing.queries,
+            'db_ms': timing.db_time * 1000,
+            'total_ms': total_time * 1000,
+            'response_bytes': size,
+        }
+        for kind, limit in budget.items():
+            value = actual.get(kind)
+            if value is None or limit is None or value <= limit:
+                continue
+
+            metrics.inc('hotel_http_budget_violations_total', route=route, kind=kind)
+            logger.warning(
+                "Превышен бюджет запроса %s %s (%s): %s = %s, лимит %s",
+                request.method, request.path, route_name or route, kind, round(value, 2), limit
+            )
+
+
+# Метрики раскрывают маршруты, число запросов к базе и время ответа, поэтому доступны только администраторам
+# (is_staff) с теми же способами входа, что и API: токен или Basic-аутентификация.
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,54 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Даты и время отдаются в default, чтобы формат совпадал с JSONEncoder из DRF (миллисекунды, "Z" для UTC).
+ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+class FastJSONRenderer(JSONRenderer):
+    # JSONRenderer на orjson. Ответ совпадает с JSONRenderer из DRF: компактный JSON в UTF-8, даты и Decimal
+    # преобразуются тем же JSONEncoder. Без orjson, с отступами (indent в заголовке Accept) или при
+    # нестандартных настройках UNICODE_JSON / COMPACT_JSON работает обычный JSONRenderer.
+    # Отличия от stdlib json: числа с порядком пишутся как 1e16, а не 1e+16; NaN и бесконечность - как null.
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if orjson is None or self.ensure_ascii or not self.compact or \
+                self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Например, целые больше 64 бит: их stdlib json кодирует, а orjson нет.
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Как в JSONRenderer: U+2028 и U+2029 экранируются, чтобы ответ оставался корректным JavaScript.
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            data = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                data = data.decode(encoding)
+            return orjson.loads(data)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -50,6 +50,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # JSON через orjson, если он установлен; отдельным представлениям можно задать renderer_classes / parser_classes.
+    'DEFAULT_RENDERER_CLASSES': [
+        'hotel_drf_app.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'hotel_drf_app.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 DJOSER = {
@@ -60,6 +70,7 @@ DJOSER = {
 }
 
 MIDDLEWARE = [
+    'hotel_drf_app.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -69,6 +80,19 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Бюджеты запросов: 'default' действует для всех маршрутов, остальные ключи — имена маршрутов (url_name).
+# Доступные ограничения: queries, db_ms, total_ms, response_bytes; None снимает ограничение маршрута по умолчанию.
+# Превышения пишутся в лог и в /metrics. Для потоковых ответов учитывается весь поток до его закрытия.
+HOTEL_REQUEST_BUDGETS = {
+    'default': {'queries': 50, 'total_ms': 1000},
+    # Поток событий доски комнат открыт, пока клиент не отключится.
+    'room-status-stream': {'total_ms': None},
+    'available-rooms-count': {'queries': 5},
+    'room-list': {'queries': 5},
+    'reservation-list': {'queries': 5},
+    'quarterly-report': {'queries': 10, 'total_ms': 500},
+}
+
 ROOT_URLCONF = 'hotel_drf_app.urls'
 
 TEMPLATES = [
@@ -97,9 +121,69 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # IMMEDIATE берёт блокировку на запись в начале транзакции, а не при первой записи:
+        # иначе параллельные транзакции падают с "database is locked" вместо ожидания.
+        # Режим общий, а не только для бронирования: все блоки transaction.atomic в проекте читают и затем пишут,
+        # а select_for_update в SQLite ничего не блокирует, поэтому смена статусов, увольнение и перевод
+        # сотрудника, изменение бронирования и календарь цен опираются на эту же блокировку. Запросы вне
+        # транзакций (все чтения API) режим не затрагивает.
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Кэш в памяти у каждого процесса свой. Для отчётов это безопасно: версии, по которым строится ключ отчёта,
+# хранятся в базе (TableVersion), поэтому изменение, сделанное в одном процессе, видно всем.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'hotel',
+    },
+    'reports': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'hotel-reports',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+HOTEL_REPORT_CACHE = 'reports'
+HOTEL_REPORT_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Индекс свободных номеров хранится в памяти процесса и пересобирается из базы при изменении версий таблиц комнат
+# и бронирований, а также не реже чем раз в указанное число секунд (для изменений в обход сигналов).
+HOTEL_AVAILABILITY_TTL = 5 * 60
+
+# Доска статусов комнат (GET /hotel/rooms/stream) хранит состояние в памяти процесса: сколько последних изменений
+# помнить для переподключения по Last-Event-ID, раз в сколько секунд сверяться с базой, как часто слать пинг
+# и через сколько секунд закрывать поток (клиент переподключается автоматически).
+HOTEL_ROOM_BOARD_HISTORY = 1000
+HOTEL_ROOM_BOARD_RESYNC = 60
+HOTEL_ROOM_BOARD_HEARTBEAT = 15
+HOTEL_ROOM_BOARD_STREAM_LIFETIME = 5 * 60
+# Поток авторизуется cookie, которую выдаёт POST /hotel/rooms/stream/session; срок её действия в секундах.
+HOTEL_ROOM_BOARD_STREAM_COOKIE_AGE = 60 * 60
+# Сколько потоков один процесс может держать без ASGI (каждый занимает поток сервера); 0 - только через ASGI.
+HOTEL_ROOM_BOARD_SYNC_STREAMS = 8
+
+# Календарь цен по ночам (RoomTypeNightlyPrice) строится на столько дней вперёд от текущей даты.
+# Команда rebuild_price_calendar сдвигает горизонт, её стоит запускать раз в сутки; дальше горизонта
+# стоимость считается по периодам истории цен.
+HOTEL_PRICE_CALENDAR_DAYS = 2 * 365
+
+# Фоновые задачи (POST /hotel/jobs, команда run_hotel_worker). Обработчик проверяет очередь раз в
+# HOTEL_JOB_POLL_INTERVAL секунд. Задача, от которой HOTEL_JOB_LEASE секунд нет вестей о прогрессе, считается
+# брошенной и возвращается в очередь. Повтор после ошибки - через HOTEL_JOB_RETRY_DELAY секунд, задержка удваивается
+# с каждой попыткой. Завершённые задачи удаляются через HOTEL_JOB_KEEP_DAYS дней.
+HOTEL_JOB_POLL_INTERVAL = 1.0
+HOTEL_JOB_LEASE = 10 * 60
+HOTEL_JOB_RETRY_DELAY = 30
+HOTEL_JOB_KEEP_DAYS = 7
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 